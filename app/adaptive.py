@@ -0,0 +1,45 @@
+"""
+Adaptive k: choose how many retrieved chunks go into the prompt from their relevance scores.
+
+Up to ADAPTIVE_MAX_K candidates are fetched with relevance scores (higher is better, as
+returned by the vector store's relevance function). A chunk is kept when it clears
+MIN_RELEVANCE and is within RELEVANCE_MARGIN of the best chunk. A confident search (one clear
+winner) therefore sends a single chunk, and a flat score distribution sends up to the maximum.
+If nothing clears MIN_RELEVANCE, the question is answered with DONT_KNOW_ANSWER and the LLM is
+not called.
+
+Enabled with get_qa_chain(adaptive=True), or RAG_ADAPTIVE_K=1 for the API and UI.
+Scores depend on the embedding model, so the thresholds are tunable via env
+(RAG_MIN_RELEVANCE, RAG_RELEVANCE_MARGIN) and can be calibrated with
+`python -m scripts.benchmark_retrieval --adaptive`.
+"""
+
+import os
+
+ADAPTIVE_ENABLED = os.getenv("RAG_ADAPTIVE_K", "0") == "1"
+ADAPTIVE_MIN_K = 1
+ADAPTIVE_MAX_K = int(os.getenv("RAG_ADAPTIVE_MAX_K", "6"))
+MIN_RELEVANCE = float(os.getenv("RAG_MIN_RELEVANCE", "0.15"))
+RELEVANCE_MARGIN = float(os.getenv("RAG_RELEVANCE_MARGIN", "0.1"))
+
+DONT_KNOW_ANSWER = "I don't know. I couldn't find information about that in the Nortal content I have."
+
+
+def select_adaptive(scored_docs, min_k: int = ADAPTIVE_MIN_K, max_k: int = ADAPTIVE_MAX_K,
+                    min_relevance: float = MIN_RELEVANCE, margin: float = RELEVANCE_MARGIN) -> list:
+    """
+    Pick documents from (document, relevance) pairs sorted best-first. Returns [] when no
+    document clears `min_relevance`; otherwise between min_k and max_k documents.
+    """
+    candidates = [(doc, score) for doc, score in scored_docs[:max_k] if score >= min_relevance]
+    if not candidates:
+        return []
+    cutoff = candidates[0][1] - margin
+    return [doc for i, (doc, score) in enumerate(candidates) if i < min_k or score >= cutoff]
+
+
+def search_with_relevance(vectorstore, query_vector, k: int, filter: dict | None = None) -> list[tuple]:
+    """(document, relevance) pairs for a precomputed query vector, best first."""
+    relevance = vectorstore._select_relevance_score_fn()
+    results = vectorstore.similarity_search_by_vector_with_relevance_scores(query_vector, k=k, filter=filter)
+    return [(doc, relevance(distance)) for doc, distance in results]
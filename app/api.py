@@ -1,7 +1,15 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
+from app.filters import MAX_PATH_DEPTH, prefix_depth
 from app.rag import get_qa_chain
+from app.sessions import ConversationMemory, conversational, create_session_store
+from app.metrics import REGISTRY, API_REQUESTS, API_SECONDS
+from app.resilience import StageTimeout, deadline_scope
+from app.profiling import MAX_PROFILE_REQUESTS, PROFILER, SLOW_REQUEST_MS, check_profile_token, span, trace
+import logging
+import time
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -13,13 +21,28 @@ app = FastAPI(title="Nortal RAG API")
 
 # Initialize RAG chain
 try:
-    qa_func = get_qa_chain()
+    qa_func = conversational(get_qa_chain(), ConversationMemory(create_session_store()))
 except Exception as e:
     print(f"Error initializing RAG chain: {e}")
     qa_func = None
 
+class SearchFilters(BaseModel):
+    source_type: Optional[Literal["html", "pdf"]] = None
+    url_prefix: Optional[str] = None  # e.g. "/industries/"
+    topics: Optional[List[str]] = None  # matches chunks tagged with any of these digest topics
+
+    @field_validator("url_prefix")
+    @classmethod
+    def check_prefix_depth(cls, value):
+        if value and prefix_depth(value) > MAX_PATH_DEPTH:
+            raise ValueError(f"url_prefix can have at most {MAX_PATH_DEPTH} path segments")
+        return value
+
 class QuestionRequest(BaseModel):
     question: str
+    session_id: Optional[str] = None  # omit to start a new conversation
+    filters: Optional[SearchFilters] = None
+    deadline_seconds: Optional[float] = Field(None, gt=0, le=120)  # default RAG_DEADLINE_SECONDS
 
 class SourceDocument(BaseModel):
     page_content: str
@@ -28,31 +51,89 @@ class SourceDocument(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     source_documents: List[SourceDocument]
+    session_id: Optional[str] = None
+    standalone_question: Optional[str] = None
+    degraded: bool = False  # True when the answer timed out and only sources are returned
+    spans: Optional[dict] = None  # stage timings, only on responses slower than RAG_SLOW_REQUEST_MS
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "rag_ready": qa_func is not None}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the in-process metrics registry."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def require_profile_token(token: Optional[str]):
+    allowed = check_profile_token(token)
+    if allowed is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set RAG_PROFILE_TOKEN)")
+    if not allowed:
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+@app.post("/debug/profile")
+async def start_profile(requests: int = Query(10, ge=1, le=MAX_PROFILE_REQUESTS),
+                        x_profile_token: Optional[str] = Header(None)):
+    """Sample the next `requests` /chat requests; fetch the result with GET /debug/profile."""
+    require_profile_token(x_profile_token)
+    PROFILER.arm(requests)
+    return {"armed": requests}
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def get_profile(x_profile_token: Optional[str] = Header(None)):
+    """Collapsed stacks of the last finished profile (flamegraph.pl / speedscope input)."""
+    require_profile_token(x_profile_token)
+    if PROFILER.in_progress:
+        raise HTTPException(status_code=409, detail=f"Profiling in progress: {PROFILER.remaining} requests to go")
+    if PROFILER.last_profile is None:
+        raise HTTPException(status_code=404, detail="No profile recorded")
+    return PlainTextResponse(PROFILER.last_profile)
+
+# A plain `def`: FastAPI runs it in its thread pool, so the blocking RAG pipeline never stalls
+# the event loop and concurrent requests are served in parallel
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: QuestionRequest):
-    if not qa_func:
-        raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
-    
+def chat(request: QuestionRequest):
+    start = time.perf_counter()
+    status = 200
     try:
-        result = qa_func(request.question)
-        
-        # Transform LangChain documents to our Pydantic model
-        source_docs = [
-            SourceDocument(page_content=doc.page_content, metadata=doc.metadata)
-            for doc in result['source_documents']
-        ]
-        
-        return ChatResponse(
-            answer=result['answer'],
-            source_documents=source_docs
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        if not qa_func:
+            status = 503
+            raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
+
+        try:
+            filters = request.filters.model_dump(exclude_none=True) if request.filters else None
+            with PROFILER.request(), trace("/chat", enabled=SLOW_REQUEST_MS > 0) as root:
+                with deadline_scope(request.deadline_seconds):
+                    result = qa_func(request.question, request.session_id, filters)
+
+                # Transform LangChain documents to our Pydantic model
+                with span("serialize"):
+                    source_docs = [
+                        SourceDocument(page_content=doc.page_content, metadata=doc.metadata)
+                        for doc in result['source_documents']
+                    ]
+
+            response = ChatResponse(
+                answer=result['answer'],
+                source_documents=source_docs,
+                session_id=result.get('session_id'),
+                standalone_question=result.get('standalone_question'),
+                degraded=result.get('degraded', False)
+            )
+            if root is not None and root.ms > SLOW_REQUEST_MS:
+                logging.warning(f"Slow /chat request ({root.ms:.0f}ms):\n{root.render()}")
+                response.spans = root.to_dict()
+            return response
+        except StageTimeout as e:
+            status = 504
+            raise HTTPException(status_code=504, detail=str(e))
+        except Exception as e:
+            status = 500
+            raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        API_REQUESTS.inc(endpoint="/chat", status=str(status))
+        API_SECONDS.observe(time.perf_counter() - start, endpoint="/chat")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
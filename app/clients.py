@@ -0,0 +1,132 @@
+"""
+Shared OpenAI clients.
+
+By default every OpenAIEmbeddings / ChatOpenAI instance opens its own HTTP connection pool.
+Here one tuned httpx pool (keep-alive, bounded connections) per process is shared by the
+embedding and chat clients and reused across requests and chain rebuilds.
+Pool size and timeouts can be tuned with OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE,
+OPENAI_KEEPALIVE_EXPIRY and OPENAI_TIMEOUT; OPENAI_MAX_RETRIES bounds the SDK's retries.
+The timeout is also passed per request, since the OpenAI SDK otherwise applies its own
+600 s default over the http client's.
+Inside call_with_deadline (app/resilience.py) the per-request timeout is further capped to
+the stage's remaining budget, and a request is not sent (or retried) once that budget is
+spent; StageTimeout is raised instead, which the SDK does not retry.
+Async connections belong to the event loop that opened them, so the async client keeps one
+pool per running loop; separate asyncio.run calls (e.g. two sharded ingests) never reuse a
+connection from a closed loop.
+"""
+
+import asyncio
+import os
+import weakref
+from functools import lru_cache
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from app.resilience import StageTimeout, stage_budget
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "32")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "16")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "60")), connect=5.0)
+
+
+def _apply_stage_budget(request: httpx.Request) -> tuple[str, float] | None:
+    """Cap the request's timeouts to the current stage budget; raise if it is already spent."""
+    budget = stage_budget()
+    if budget is None:
+        return None
+    stage, remaining = budget
+    if remaining <= 0:
+        raise StageTimeout(stage, 0.0)
+    timeouts = request.extensions.get("timeout", {})
+    request.extensions["timeout"] = {
+        key: remaining if timeouts.get(key) is None else min(timeouts[key], remaining)
+        for key in ("connect", "read", "write", "pool")
+    }
+    return budget
+
+
+def _budget_spent(budget, error: Exception):
+    """A timeout that used up the stage budget becomes StageTimeout, so the SDK gives up instead of retrying."""
+    if budget is not None and stage_budget()[1] <= 0:
+        raise StageTimeout(budget[0], budget[1]) from error
+
+
+class _StageBudgetTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        budget = _apply_stage_budget(request)
+        try:
+            return self._transport.handle_request(request)
+        except httpx.TimeoutException as e:
+            _budget_spent(budget, e)
+            raise
+
+    def close(self):
+        self._transport.close()
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    return httpx.Client(transport=_StageBudgetTransport(httpx.HTTPTransport(limits=_limits())), timeout=_timeout())
+
+
+class _PerLoopTransport(httpx.AsyncBaseTransport):
+    """One connection pool per running event loop; a pool goes away with its loop."""
+
+    def __init__(self):
+        self._transports = weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=_limits())
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        budget = _apply_stage_budget(request)
+        try:
+            return await self._transport().handle_async_request(request)
+        except httpx.TimeoutException as e:
+            _budget_spent(budget, e)
+            raise
+
+    async def aclose(self):
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=_PerLoopTransport(), timeout=_timeout())
+
+
+def _request_options(kwargs: dict) -> dict:
+    kwargs.setdefault("timeout", float(os.getenv("OPENAI_TIMEOUT", "60")))
+    kwargs.setdefault("max_retries", int(os.getenv("OPENAI_MAX_RETRIES", "2")))
+    return kwargs
+
+
+def make_embeddings(**kwargs) -> OpenAIEmbeddings:
+    """OpenAIEmbeddings on the shared connection pool."""
+    _request_options(kwargs)
+    return OpenAIEmbeddings(http_client=get_http_client(), http_async_client=get_async_http_client(), **kwargs)
+
+
+def make_chat_model(model: str = "gpt-4o", **kwargs) -> ChatOpenAI:
+    """ChatOpenAI on the shared connection pool."""
+    _request_options(kwargs)
+    return ChatOpenAI(model=model, http_client=get_http_client(), http_async_client=get_async_http_client(), **kwargs)
@@ -0,0 +1,295 @@
+"""
+Content-addressed, compressed store for versioned scrapes and digests.
+
+Layout under `root` (default data/corpus):
+    objects/<ab>/<sha256>    one compressed object per distinct page/chunk/PDF
+    dictionaries/<id>        trained compression dictionaries (objects record which one they use)
+    manifests/<name>.json    one lightweight manifest per scrape or digest version
+
+A page is stored without its URL, so identical content is kept once no matter how many
+versions or URLs refer to it; a manifest only lists (url, object hash) pairs plus any files
+(e.g. scraped PDFs). Disk usage therefore grows with changed content, not with the number of
+versions, and a single page is read by URL without touching the rest of the version.
+
+Compression is zstd with a dictionary trained on the corpus when `zstandard` is installed,
+otherwise zlib with a preset dictionary built from the most repeated text segments.
+
+Usage:
+    python -m app.corpus_store import v4 legacy_experiments/data/scrapings/v4/scraped_data.json \
+        --pdf-dir legacy_experiments/data/scrapings/v4/scraped_pdfs
+    python -m app.corpus_store export v4 data/
+    python -m app.corpus_store list
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from collections import Counter
+
+try:
+    import zstandard
+    ZSTD_SUPPORT = True
+except ImportError:
+    ZSTD_SUPPORT = False
+
+CORPUS_ROOT = "data/corpus"
+DICT_SIZE = 112 * 1024  # zstd; zlib can only use the last 32 KB of a preset dictionary
+ZLIB_DICT_SIZE = 32 * 1024
+ZSTD_LEVEL = 19
+NO_DICT = "0" * 16
+
+# One-byte codec tag at the start of every stored object, followed by the 16-char dictionary id
+CODEC_ZSTD, CODEC_ZLIB = b"z", b"d"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def canonical_json(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_zlib_dictionary(samples: list[bytes], size: int = ZLIB_DICT_SIZE) -> bytes:
+    """Most repeated lines/sentences across samples; zlib matches best against the end, so most frequent go last."""
+    counts = Counter()
+    for sample in samples:
+        segments = {s.strip() for s in sample.replace(b". ", b".\n").split(b"\n")}
+        counts.update(s for s in segments if len(s) >= 16)
+    ranked = sorted((s for s, n in counts.items() if n > 1), key=lambda s: counts[s] * len(s))
+    output, total = [], 0
+    for segment in reversed(ranked):
+        if total + len(segment) + 1 > size:
+            break
+        output.append(segment)
+        total += len(segment) + 1
+    return b"\n".join(reversed(output))
+
+
+class CorpusStore:
+    def __init__(self, root: str = CORPUS_ROOT):
+        self.root = root
+        self._dictionaries = {}
+        self._current_dict = None
+        current = os.path.join(root, "dictionaries", "current")
+        if os.path.exists(current):
+            with open(current, "r", encoding="utf-8") as f:
+                self._current_dict = f.read().strip() or None
+
+    # --- dictionaries -------------------------------------------------------------------
+
+    def _dictionary(self, dict_id: str) -> bytes:
+        if dict_id not in self._dictionaries:
+            with open(os.path.join(self.root, "dictionaries", dict_id), "rb") as f:
+                self._dictionaries[dict_id] = f.read()
+        return self._dictionaries[dict_id]
+
+    def train_dictionary(self, samples: list[bytes]) -> str | None:
+        """Train and activate a dictionary for new objects. Returns its id (None if too few samples)."""
+        if ZSTD_SUPPORT:
+            try:
+                data = zstandard.train_dictionary(DICT_SIZE, samples).as_bytes()
+            except zstandard.ZstdError as e:
+                logging.warning(f"Dictionary training failed, compressing without one: {e}")
+                return None
+        else:
+            data = build_zlib_dictionary(samples)
+        if not data:
+            return None
+        dict_id = content_hash(data)[:16]
+        _write_atomic(os.path.join(self.root, "dictionaries", dict_id), data)
+        _write_atomic(os.path.join(self.root, "dictionaries", "current"), dict_id.encode("utf-8"))
+        self._dictionaries[dict_id] = data
+        self._current_dict = dict_id
+        return dict_id
+
+    # --- objects ------------------------------------------------------------------------
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _compress(self, data: bytes, use_dictionary: bool) -> bytes:
+        dict_id = self._current_dict if use_dictionary and self._current_dict else NO_DICT
+        zdict = self._dictionary(dict_id) if dict_id != NO_DICT else None
+        if ZSTD_SUPPORT:
+            params = {"dict_data": zstandard.ZstdCompressionDict(zdict)} if zdict else {}
+            return CODEC_ZSTD + dict_id.encode() + zstandard.ZstdCompressor(level=ZSTD_LEVEL, **params).compress(data)
+        compressor = zlib.compressobj(9, zdict=zdict) if zdict else zlib.compressobj(9)
+        return CODEC_ZLIB + dict_id.encode() + compressor.compress(data) + compressor.flush()
+
+    def _decompress(self, blob: bytes) -> bytes:
+        codec, dict_id, payload = blob[:1], blob[1:17].decode(), blob[17:]
+        zdict = self._dictionary(dict_id) if dict_id != NO_DICT else None
+        if codec == CODEC_ZSTD:
+            if not ZSTD_SUPPORT:
+                raise RuntimeError("Object was written with zstd; install 'zstandard' to read it")
+            params = {"dict_data": zstandard.ZstdCompressionDict(zdict)} if zdict else {}
+            return zstandard.ZstdDecompressor(**params).decompress(payload)
+        decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        return decompressor.decompress(payload) + decompressor.flush()
+
+    def put(self, data: bytes, use_dictionary: bool = True) -> tuple[str, bool]:
+        """Store bytes under their hash. Returns (hash, whether a new object was written)."""
+        digest = content_hash(data)
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, False
+        _write_atomic(path, self._compress(data, use_dictionary))
+        return digest, True
+
+    def get(self, digest: str) -> bytes:
+        with open(self._object_path(digest), "rb") as f:
+            return self._decompress(f.read())
+
+    # --- versions -----------------------------------------------------------------------
+
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.root, "manifests", f"{name}.json")
+
+    def save_version(self, name: str, entries: list[dict], kind: str = "scrape", files: dict | None = None,
+                     meta: dict | None = None) -> dict:
+        """
+        Store a scrape/digest version. `files` maps relative paths (e.g. scraped_pdfs/x.pdf) to
+        local files. Returns the manifest, whose `stats` show how much content was new.
+        """
+        payloads = [canonical_json({k: v for k, v in e.items() if k != "url"}) for e in entries]
+        if self._current_dict is None and payloads:
+            self.train_dictionary(payloads[:2000])
+
+        stats = {"objects": 0, "new_objects": 0, "raw_bytes": 0}
+        manifest_entries = []
+        for entry, payload in zip(entries, payloads):
+            digest, new = self.put(payload)
+            manifest_entries.append({"url": entry.get("url", ""), "object": digest})
+            stats["objects"] += 1
+            stats["new_objects"] += new
+            stats["raw_bytes"] += len(payload)
+
+        manifest_files = {}
+        for rel_path, local_path in (files or {}).items():
+            with open(local_path, "rb") as f:
+                data = f.read()
+            # Binary formats like PDF are already compressed internally; no text dictionary
+            digest, new = self.put(data, use_dictionary=False)
+            manifest_files[rel_path] = digest
+            stats["objects"] += 1
+            stats["new_objects"] += new
+            stats["raw_bytes"] += len(data)
+
+        manifest = {
+            "name": name, "kind": kind, "created_at": time.time(), "meta": meta or {},
+            "entries": manifest_entries, "files": manifest_files, "stats": stats,
+        }
+        _write_atomic(self._manifest_path(name), json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+        return manifest
+
+    def versions(self) -> list[str]:
+        directory = os.path.join(self.root, "manifests")
+        if not os.path.isdir(directory):
+            return []
+        return sorted(f[:-5] for f in os.listdir(directory) if f.endswith(".json"))
+
+    def open_version(self, name: str) -> "CorpusVersion":
+        with open(self._manifest_path(name), "r", encoding="utf-8") as f:
+            return CorpusVersion(self, json.load(f))
+
+    def load_version(self, name: str) -> list[dict]:
+        return list(self.open_version(name))
+
+    def disk_usage(self) -> int:
+        return sum(os.path.getsize(os.path.join(r, f)) for r, _, files in os.walk(self.root) for f in files)
+
+
+class CorpusVersion:
+    """A manifest with random access by URL; entries are decompressed on demand."""
+
+    def __init__(self, store: CorpusStore, manifest: dict):
+        self.store = store
+        self.manifest = manifest
+        self._by_url = {}
+        for position, item in enumerate(manifest["entries"]):
+            self._by_url.setdefault(item["url"], []).append(position)
+
+    def _entry(self, item: dict) -> dict:
+        return {"url": item["url"], **json.loads(self.store.get(item["object"]))}
+
+    def __len__(self):
+        return len(self.manifest["entries"])
+
+    def __iter__(self):
+        return (self._entry(item) for item in self.manifest["entries"])
+
+    def urls(self) -> list[str]:
+        return list(self._by_url)
+
+    def get(self, url: str) -> dict | None:
+        """First entry for `url` (the page, for scrapes)."""
+        positions = self._by_url.get(url)
+        return self._entry(self.manifest["entries"][positions[0]]) if positions else None
+
+    def entries_for(self, url: str) -> list[dict]:
+        """All entries for `url` (e.g. every digested chunk of a page)."""
+        return [self._entry(self.manifest["entries"][p]) for p in self._by_url.get(url, [])]
+
+    def export(self, output_dir: str, filename: str = "scraped_data.json"):
+        """Write the version back out as a JSON file plus its files (e.g. scraped_pdfs/)."""
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, filename), "w", encoding="utf-8") as f:
+            json.dump(list(self), f, ensure_ascii=False, indent=2)
+        for rel_path, digest in self.manifest["files"].items():
+            _write_atomic(os.path.join(output_dir, rel_path), self.store.get(digest))
+
+
+def import_json(store: CorpusStore, name: str, json_path: str, pdf_dir: str | None = None,
+                kind: str = "scrape", meta: dict | None = None) -> dict:
+    with open(json_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    files = {}
+    if pdf_dir and os.path.isdir(pdf_dir):
+        base = os.path.basename(os.path.normpath(pdf_dir))
+        files = {f"{base}/{n}": os.path.join(pdf_dir, n) for n in sorted(os.listdir(pdf_dir))}
+    return store.save_version(name, entries, kind, files, meta)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Versioned, deduplicated corpus store.")
+    parser.add_argument("--root", default=CORPUS_ROOT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    p_import = commands.add_parser("import", help="Store a scraped/digested JSON file as a version")
+    p_import.add_argument("name")
+    p_import.add_argument("json_path")
+    p_import.add_argument("--pdf-dir", default=None)
+    p_import.add_argument("--kind", choices=["scrape", "digest"], default="scrape")
+    p_export = commands.add_parser("export", help="Write a version back to a directory")
+    p_export.add_argument("name")
+    p_export.add_argument("output_dir")
+    p_export.add_argument("--filename", default="scraped_data.json")
+    commands.add_parser("list", help="List versions and disk usage")
+    args = parser.parse_args()
+
+    store = CorpusStore(args.root)
+    if args.command == "import":
+        stats = import_json(store, args.name, args.json_path, args.pdf_dir, args.kind)["stats"]
+        print(f"{args.name}: {stats['objects']} objects ({stats['new_objects']} new), "
+              f"{stats['raw_bytes'] / 1e6:.1f} MB raw; store is {store.disk_usage() / 1e6:.1f} MB")
+    elif args.command == "export":
+        store.open_version(args.name).export(args.output_dir, args.filename)
+        print(f"Exported {args.name} → {args.output_dir}")
+    else:
+        for name in store.versions():
+            manifest = store.open_version(name).manifest
+            print(f"{name:<20} {manifest['kind']:<7} {len(manifest['entries']):>5} entries {len(manifest['files']):>4} files")
+        print(f"Store size: {store.disk_usage() / 1e6:.1f} MB")
@@ -0,0 +1,259 @@
+"""
+Near-duplicate and boilerplate removal between scraping and ingestion.
+
+Two passes over the scraped pages:
+1. Near-duplicate pages: MinHash signatures over word shingles, bucketed with LSH (banding).
+   Candidate pairs above a Jaccard threshold are merged and only one page is kept;
+   the others are recorded in its `duplicate_urls`.
+2. Boilerplate spans: word shingles that occur on many pages (industry lists, leftover nav
+   text) are kept on the first page they appear on and cut from every other page.
+   Repeats shorter than a shingle (carousel labels like "Press pause Press play") can only be
+   told apart from ordinary phrases when they form a block of their own, so they are
+   removed from structured pages (those with `blocks`) but stay in flat legacy content.
+"""
+
+import hashlib
+import json
+import logging
+from collections import defaultdict
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SHINGLE_WORDS = 5  # page-similarity shingles
+NUM_PERM = 128
+BANDS = 16  # 16 bands x 8 rows: pairs around Jaccard 0.7+ become candidates
+PRIME = 4294967311  # smallest prime above 2**32
+BOILERPLATE_WORDS = 8  # span shingles; shorter repeats are left alone
+BOILERPLATE_MIN_PAGES = 5
+
+
+def _hash32(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def shingles(words: list[str], n: int) -> list[int]:
+    """32-bit hashes of every n-word window (lower-cased)."""
+    return [_hash32(" ".join(words[i:i + n]).lower()) for i in range(len(words) - n + 1)]
+
+
+class MinHasher:
+    """MinHash signatures from universal hashes (a*x + b) mod p with a fixed seed."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: list[int]) -> np.ndarray:
+        if not hashes:
+            return np.full(len(self.a), PRIME, dtype=np.uint64)
+        x = np.unique(np.asarray(hashes, dtype=np.uint64))
+        return ((np.outer(x, self.a) + self.b) % PRIME).min(axis=0)
+
+
+def find_near_duplicates(texts: list[str], threshold: float = 0.85, bands: int = BANDS) -> list[list[int]]:
+    """Group indices of texts whose estimated Jaccard similarity is >= threshold."""
+    hasher = MinHasher()
+    signatures = [hasher.signature(shingles(t.split(), SHINGLE_WORDS)) for t in texts]
+    rows = NUM_PERM // bands
+
+    buckets = defaultdict(list)
+    for i, sig in enumerate(signatures):
+        if len(texts[i].split()) < SHINGLE_WORDS:
+            continue
+        for band in range(bands):
+            buckets[(band, sig[band * rows:(band + 1) * rows].tobytes())].append(i)
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for members in buckets.values():
+        for pos, i in enumerate(members):
+            for j in members[pos + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if np.mean(signatures[i] == signatures[j]) >= threshold:
+                    parent[find(j)] = find(i)
+
+    groups = defaultdict(list)
+    for i in range(len(texts)):
+        groups[find(i)].append(i)
+    return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+def boilerplate_masks(texts: list[str], n: int = BOILERPLATE_WORDS, min_pages: int = BOILERPLATE_MIN_PAGES) -> list[np.ndarray]:
+    """
+    Per page, a boolean mask over its words marking spans made of shingles that appear on
+    >= min_pages pages, except on the first page that contains them.
+    """
+    page_words = [t.split() for t in texts]
+    page_shingles = [shingles(words, n) for words in page_words]
+
+    page_count, owner = defaultdict(int), {}
+    for i, hashes in enumerate(page_shingles):
+        for h in set(hashes):
+            page_count[h] += 1
+            owner.setdefault(h, i)
+
+    masks = []
+    for i, (words, hashes) in enumerate(zip(page_words, page_shingles)):
+        drop = np.zeros(len(words), dtype=bool)
+        for pos, h in enumerate(hashes):
+            if page_count[h] >= min_pages and owner[h] != i:
+                drop[pos:pos + n] = True
+        masks.append(drop)
+    return masks
+
+
+def repeated_short_blocks(block_lists: list[list[dict]], n: int = BOILERPLATE_WORDS,
+                          min_pages: int = BOILERPLATE_MIN_PAGES) -> list[np.ndarray]:
+    """
+    Per page, a word mask marking blocks shorter than `n` words whose text appears on
+    >= min_pages pages, except on the first page that contains them.
+    """
+    def key(block):
+        return " ".join(block["text"].lower().split())
+
+    page_count, owner = defaultdict(int), {}
+    for i, blocks in enumerate(block_lists):
+        for k in {key(b) for b in blocks if len(b["text"].split()) < n}:
+            page_count[k] += 1
+            owner.setdefault(k, i)
+
+    masks = []
+    for i, blocks in enumerate(block_lists):
+        drop = []
+        for block in blocks:
+            words = block["text"].split()
+            repeated = len(words) < n and page_count[key(block)] >= min_pages and owner[key(block)] != i
+            drop.extend([repeated] * len(words))
+        masks.append(np.array(drop, dtype=bool))
+    return masks
+
+
+def strip_boilerplate(texts: list[str], n: int = BOILERPLATE_WORDS, min_pages: int = BOILERPLATE_MIN_PAGES) -> tuple[list[str], int]:
+    """Cut repeated boilerplate spans. Returns (new texts, number of words removed)."""
+    masks = boilerplate_masks(texts, n, min_pages)
+    cleaned = [" ".join(w for w, d in zip(t.split(), drop) if not d) for t, drop in zip(texts, masks)]
+    return cleaned, int(sum(m.sum() for m in masks))
+
+
+def _strip_blocks(blocks: list[dict], drop: np.ndarray) -> list[dict]:
+    """Apply a content-level word mask to structured blocks (content is their text joined)."""
+    output, pos = [], 0
+    for block in blocks:
+        words = block["text"].split()
+        kept = [w for w, d in zip(words, drop[pos:pos + len(words)]) if not d]
+        pos += len(words)
+        if kept:
+            output.append({**block, "text": " ".join(kept)})
+    return output
+
+
+def dedup_entries(entries: list[dict], threshold: float = 0.85, min_pages: int = BOILERPLATE_MIN_PAGES) -> tuple[list[dict], dict]:
+    """Collapse near-duplicate pages and repeated boilerplate. Returns (entries, stats)."""
+    texts = [e.get("content", "") for e in entries]
+    groups = find_near_duplicates(texts, threshold)
+
+    dropped, duplicates = set(), {}
+    for group in groups:
+        # Keep the longest page of each group; its URL carries the others for citation
+        keep = max(group, key=lambda i: len(texts[i]))
+        duplicates[keep] = [entries[i].get("url", "") for i in group if i != keep]
+        dropped.update(i for i in group if i != keep)
+
+    kept = [i for i in range(len(entries)) if i not in dropped]
+    masks = boilerplate_masks([texts[i] for i in kept], min_pages=min_pages)
+    # Blocks are only usable where they are word-for-word aligned with the content
+    aligned = [entries[i]["blocks"] if entries[i].get("blocks")
+               and sum(len(b["text"].split()) for b in entries[i]["blocks"]) == len(drop) else []
+               for i, drop in zip(kept, masks)]
+    short_masks = repeated_short_blocks(aligned, min_pages=min_pages)
+    masks = [drop | short if blocks else drop for drop, short, blocks in zip(masks, short_masks, aligned)]
+    words_removed = int(sum(m.sum() for m in masks))
+
+    output = []
+    for i, drop, blocks in zip(kept, masks, aligned):
+        content = " ".join(w for w, d in zip(texts[i].split(), drop) if not d)
+        entry = {**entries[i], "content": content}
+        if blocks:
+            entry["blocks"] = _strip_blocks(blocks, drop)
+        if i in duplicates:
+            entry["duplicate_urls"] = duplicates[i]
+        output.append(entry)
+
+    stats = {
+        "pages_in": len(entries),
+        "pages_out": len(output),
+        "near_duplicate_pages": len(dropped),
+        "boilerplate_words_removed": words_removed,
+    }
+    return output, stats
+
+
+def savings_report(before: list[dict], after: list[dict], chunk_size: int = 1000, chunk_overlap: int = 200,
+                   count_tokens=None) -> dict:
+    """Chunks and tokens that ingestion no longer has to embed."""
+    from app.ingest import entries_to_documents, split_documents
+    if count_tokens is None:
+        from app.digester import count_tokens
+
+    def measure(entries):
+        chunks = split_documents(entries_to_documents(entries), chunk_size, chunk_overlap)
+        return len(chunks), sum(count_tokens(c.page_content) for c in chunks)
+
+    chunks_before, tokens_before = measure(before)
+    chunks_after, tokens_after = measure(after)
+    return {
+        "chunks_before": chunks_before,
+        "chunks_after": chunks_after,
+        "chunks_saved": chunks_before - chunks_after,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+    }
+
+
+def dedup_file(input_path: str = "data/scraped_data.json", output_path: str = "data/deduped_data.json",
+               threshold: float = 0.85, min_pages: int = BOILERPLATE_MIN_PAGES, chunk_size: int = 1000,
+               chunk_overlap: int = 200) -> dict:
+    with open(input_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    deduped, stats = dedup_entries(entries, threshold, min_pages)
+    stats.update(savings_report(entries, deduped, chunk_size, chunk_overlap))
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(deduped, f, ensure_ascii=False, indent=2)
+
+    logging.info(
+        f"Dedup: {stats['pages_in']} → {stats['pages_out']} pages "
+        f"({stats['near_duplicate_pages']} near-duplicates, {stats['boilerplate_words_removed']} boilerplate words); "
+        f"saved {stats['chunks_saved']} chunks ({stats['chunks_before']} → {stats['chunks_after']}) and "
+        f"{stats['tokens_saved']} tokens ({stats['tokens_before']} → {stats['tokens_after']}) → {output_path}"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Remove near-duplicate pages and boilerplate before ingestion.")
+    parser.add_argument("--input", default="data/scraped_data.json")
+    parser.add_argument("--output", default="data/deduped_data.json")
+    parser.add_argument("--threshold", type=float, default=0.85, help="Jaccard threshold for near-duplicate pages")
+    parser.add_argument("--min-pages", type=int, default=BOILERPLATE_MIN_PAGES,
+                        help="A span is boilerplate if it appears on at least this many pages")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Chunk size used for the savings report")
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    dedup_file(args.input, args.output, args.threshold, args.min_pages, args.chunk_size, args.chunk_overlap)
@@ -1,25 +1,60 @@
 """
 LLM-based content digestion using LangChain with Pydantic structured output.
-Appends summary and key facts to original content.
+Stores summary, key facts and topics as structured fields next to the original chunk
+(or, with inline=True, appends them to the chunk text as markdown).
+
+With packed=True, small chunks are bin-packed into one request (up to PACK_TOKEN_BUDGET
+tokens) and digested together into a DigestedBatch; chunks missing from a batch response are
+retried one by one.
 """
 
+import hashlib
 import json
 import logging
+import os
+import re
+import threading
+from functools import lru_cache
 from pathlib import Path
 
 import tiktoken
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+from app.clients import make_chat_model
+from app.metrics import CACHE_REQUESTS
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 MAX_CHUNK_TOKENS = 500
-ENCODING = tiktoken.encoding_for_model("gpt-4o")
+DIGEST_MODEL = "gpt-4o"
+DIGEST_CACHE_PATH = "data/digest_cache.json"
+
+DIGEST_PROMPT = [
+    ("system", """Extract a summary and key facts from the content. Be concise:
+- Summary: exactly 2-3 sentences
+- Key facts: 3-5 single-sentence facts with specific details
+- Topics: 2-5 tags, each 2-3 words"""),
+    ("user", "Content from {source_type}:\nTitle: {title}\n\n{content}")
+]
+# Derived from the prompt text, so editing DIGEST_PROMPT invalidates cached digests by itself
+PROMPT_VERSION = hashlib.sha256(json.dumps(DIGEST_PROMPT).encode("utf-8")).hexdigest()[:12]
+
+PACK_TOKEN_BUDGET = 2000
+PACK_MAX_CHUNKS = 8
+PACK_ITEM_OVERHEAD = 20  # tokens for each item's header in a packed request
+
+BATCH_PROMPT = [
+    ("system", DIGEST_PROMPT[0][1] + """
+
+The input contains several numbered items. Digest each item on its own and return one digest per item, with its item_id."""),
+    ("user", "{items}")
+]
+BATCH_PROMPT_VERSION = hashlib.sha256(json.dumps([DIGEST_PROMPT, BATCH_PROMPT]).encode("utf-8")).hexdigest()[:12]
 
 
 class DigestedContent(BaseModel):
@@ -29,8 +64,23 @@ class DigestedContent(BaseModel):
     topics: list[str] = Field(description="2-5 topic tags (1-3 words each)")
 
 
+class DigestedItem(DigestedContent):
+    item_id: int = Field(description="Number of the item this digest belongs to")
+
+
+class DigestedBatch(BaseModel):
+    """Structured output for a packed request: one digest per input item."""
+    digests: list[DigestedItem]
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """gpt-4o tokenizer, loaded on first use so importing this module never downloads it."""
+    return tiktoken.encoding_for_model("gpt-4o")
+
+
 def count_tokens(text: str) -> int:
-    return len(ENCODING.encode(text))
+    return len(get_encoding().encode(text))
 
 
 def chunk_text(text: str, max_tokens: int = MAX_CHUNK_TOKENS) -> list[str]:
@@ -60,19 +110,164 @@ def chunk_text(text: str, max_tokens: int = MAX_CHUNK_TOKENS) -> list[str]:
     return chunks
 
 
-def create_digester():
-    """Create LangChain digester with structured output."""
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.3)
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """Extract a summary and key facts from the content. Be concise:
-- Summary: exactly 2-3 sentences
-- Key facts: 3-5 single-sentence facts with specific details
-- Topics: 2-5 tags, each 2-3 words"""),
-        ("user", "Content from {source_type}:\nTitle: {title}\n\n{content}")
-    ])
-    
-    return prompt | llm.with_structured_output(DigestedContent)
+def create_digester(model: str = DIGEST_MODEL, routing: bool = False):
+    """
+    Create LangChain digester with structured output. With routing=True simple chunks go to the
+    fast model tier and only long/PDF/number-dense chunks (or failed fast digests) to `model`.
+    """
+    prompt = ChatPromptTemplate.from_messages(DIGEST_PROMPT)
+    strong = prompt | make_chat_model(model, temperature=0.3).with_structured_output(DigestedContent)
+    if not routing:
+        return strong
+    from app.routing import FAST_MODEL, create_routed_digester
+    fast = prompt | make_chat_model(FAST_MODEL, temperature=0.3).with_structured_output(DigestedContent)
+    return create_routed_digester(fast, strong)
+
+
+def create_batch_digester(model: str = DIGEST_MODEL):
+    """Digester for packed requests: {"items": format_batch(...)} -> DigestedBatch."""
+    prompt = ChatPromptTemplate.from_messages(BATCH_PROMPT)
+    return prompt | make_chat_model(model, temperature=0.3).with_structured_output(DigestedBatch)
+
+
+def format_batch(items: list[dict]) -> str:
+    return "\n\n".join(
+        f"### Item {n}\nContent from {item['source_type']}:\nTitle: {item['title']}\n\n{item['content']}"
+        for n, item in enumerate(items, start=1)
+    )
+
+
+def pack_chunks(items: list[dict], budget: int = PACK_TOKEN_BUDGET, max_chunks: int = PACK_MAX_CHUNKS) -> list[list[int]]:
+    """
+    First-fit decreasing bin packing of digest inputs. Returns groups of indices into `items`,
+    each within `budget` tokens and `max_chunks` items; an item over the budget is packed alone.
+    """
+    sizes = [count_tokens(item["title"]) + count_tokens(item["content"]) + PACK_ITEM_OVERHEAD for item in items]
+    packs, loads = [], []
+    for index in sorted(range(len(items)), key=lambda i: -sizes[i]):
+        for p, pack in enumerate(packs):
+            if loads[p] + sizes[index] <= budget and len(pack) < max_chunks:
+                pack.append(index)
+                loads[p] += sizes[index]
+                break
+        else:
+            packs.append([index])
+            loads.append(sizes[index])
+    return [sorted(pack) for pack in packs]
+
+
+def digest_packed(items: list[dict], batch_digester, digester, budget: int = PACK_TOKEN_BUDGET,
+                  max_chunks: int = PACK_MAX_CHUNKS, accept=None) -> tuple[list, list[bool]]:
+    """
+    Digest `items` ({content, title, source_type}) with packed requests. Returns digests aligned
+    with `items` and, per item, whether its digest came from a packed request. Items packed
+    alone, missing from a batch response, rejected by `accept`, or in a failed batch are
+    digested one by one with `digester`; None where that fails too.
+    """
+    accept = accept or (lambda digest: digest is not None)
+    results = [None] * len(items)
+    batched = [False] * len(items)
+    packs = pack_chunks(items, budget, max_chunks)
+    individual = []
+    for pack in packs:
+        if len(pack) == 1:
+            individual.extend(pack)
+            continue
+        try:
+            batch = batch_digester.invoke({"items": format_batch([items[i] for i in pack])})
+            for digest in batch.digests:
+                if 1 <= digest.item_id <= len(pack) and results[pack[digest.item_id - 1]] is None:
+                    results[pack[digest.item_id - 1]] = DigestedContent(**digest.model_dump(exclude={"item_id"}))
+                    batched[pack[digest.item_id - 1]] = True
+        except Exception as e:
+            logging.warning(f"Packed digest of {len(pack)} chunks failed, retrying them individually: {e}")
+        individual.extend(i for i in pack if not accept(results[i]))
+
+    for i in individual:
+        try:
+            results[i] = digester.invoke(items[i])
+            batched[i] = False
+        except Exception as e:
+            # A rejected batch digest is not kept: neither cached nor recorded as packed
+            results[i], batched[i] = None, False
+            logging.error(f"Failed to digest {items[i]['title']!r}: {e}")
+    batches = sum(1 for pack in packs if len(pack) > 1)
+    logging.info(f"Packed digestion: {len(items)} chunks in {batches} packed + {len(individual)} individual requests")
+    return results, batched
+
+
+class DigestCache:
+    """
+    Persistent digests keyed on (content hash, model, prompt version). The key covers everything
+    the prompt sees (content, title, source type), so unchanged pages are never re-digested
+    after a recrawl, while a new model or prompt misses for every entry it affects.
+    Each entry is stored under the prompt version that produced it; lookups accept
+    `prompt_version` and any `extra_versions` (digests from the single and packed prompts are
+    interchangeable, so switching modes reuses the cache).
+    """
+
+    def __init__(self, path: str | None = DIGEST_CACHE_PATH, model: str = DIGEST_MODEL,
+                 prompt_version: str = PROMPT_VERSION, extra_versions: tuple = ()):
+        self.path = path
+        self.model = model
+        self.prompt_version = prompt_version
+        self.prompt_versions = (prompt_version, *extra_versions)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+
+    def key(self, content: str, title: str, source_type: str, prompt_version: str | None = None) -> str:
+        content_hash = hashlib.sha256(
+            json.dumps([source_type, title, content], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        return f"{content_hash}:{self.model}:{prompt_version or self.prompt_version}"
+
+    def get(self, content, title, source_type) -> DigestedContent | None:
+        with self._lock:
+            entry = None
+            for version in self.prompt_versions:
+                entry = self._entries.get(self.key(content, title, source_type, version))
+                if entry is not None:
+                    break
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        CACHE_REQUESTS.inc(cache="digest", result="miss" if entry is None else "hit")
+        return DigestedContent(**entry["digest"]) if entry else None
+
+    def set(self, content, title, source_type, digest: DigestedContent, prompt_version: str | None = None):
+        """Store a digest under the prompt version that produced it (default: `prompt_version`)."""
+        prompt_version = prompt_version or self.prompt_version
+        with self._lock:
+            self._entries[self.key(content, title, source_type, prompt_version)] = {
+                "model": self.model,
+                "prompt_version": prompt_version,
+                "digest": digest.model_dump()
+            }
+
+    def prune(self) -> int:
+        """Drop entries written with another model or an unaccepted prompt version. Returns how many."""
+        with self._lock:
+            stale = [k for k, e in self._entries.items()
+                     if e["model"] != self.model or e["prompt_version"] not in self.prompt_versions]
+            for k in stale:
+                del self._entries[k]
+        return len(stale)
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
 
 
 def format_digest(digest: DigestedContent) -> str:
@@ -82,6 +277,25 @@ def format_digest(digest: DigestedContent) -> str:
     return f"\n\n---\n## Summary\n{digest.summary}\n\n## Key Facts\n{facts}\n\n## Topics\n{topics}"
 
 
+INLINE_DIGEST_PATTERN = re.compile(
+    r"\n\n---\n## Summary\n(?P<summary>.*?)\n\n## Key Facts\n(?P<facts>.*?)\n\n## Topics\n(?P<topics>.*)\Z",
+    re.DOTALL
+)
+
+
+def parse_inline_digest(content: str) -> tuple[str, DigestedContent | None]:
+    """Split content produced with format_digest back into (chunk, digest)."""
+    match = INLINE_DIGEST_PATTERN.search(content)
+    if not match:
+        return content, None
+    digest = DigestedContent(
+        summary=match["summary"].strip(),
+        key_facts=[f[2:].strip() for f in match["facts"].splitlines() if f.startswith("- ")],
+        topics=[t.strip() for t in match["topics"].split(",") if t.strip()]
+    )
+    return content[:match.start()], digest
+
+
 def sample_data(data: list, html_count: int = 20, pdf_count: int = 5) -> tuple[list, dict]:
     """
     Sample data: first N HTML pages and first M PDF pages.
@@ -109,10 +323,34 @@ def digest_data(
     input_path: str = "data/scraped_data.json",
     output_path: str = "data/llm_digested_data.json",
     sample_html: int | None = None,
-    sample_pdf: int | None = None
+    sample_pdf: int | None = None,
+    inline: bool = False,
+    cache_path: str | None = DIGEST_CACHE_PATH,
+    model: str = DIGEST_MODEL,
+    digester=None,
+    prune_cache: bool = False,
+    routing: bool = False,
+    packed: bool = False,
+    pack_tokens: int = PACK_TOKEN_BUDGET,
+    batch_digester=None
 ):
-    """Process scraped data: split if needed, digest with LLM, append to original."""
-    digester = create_digester()
+    """
+    Process scraped data: split if needed, digest with LLM. Each output chunk keeps its raw
+    `content` plus `summary`, `key_facts` and `topics` fields; inline=True restores the legacy
+    format with the digest appended to `content`. Chunks already in the digest cache
+    (same content, model and prompt version) skip the LLM call; cache_path=None disables it.
+    packed=True digests small chunks several per request (see digest_packed); with routing,
+    only fast-tier chunks are packed (on the fast model) and thin results are escalated.
+    """
+    digester = digester or create_digester(model, routing)
+    if routing:
+        from app.routing import FAST, FAST_MODEL, digest_needs_escalation, record_route, route_chunk
+        # Routed digests are cached apart from single-model ones
+        cache = DigestCache(cache_path, f"routed:{FAST_MODEL}|{model}", PROMPT_VERSION, (BATCH_PROMPT_VERSION,))
+    else:
+        cache = DigestCache(cache_path, model, PROMPT_VERSION, (BATCH_PROMPT_VERSION,))
+    if packed and batch_digester is None:
+        batch_digester = create_batch_digester(FAST_MODEL if routing else model)
     
     with open(input_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
@@ -133,34 +371,78 @@ def digest_data(
             json.dump(sample_info, f, ensure_ascii=False, indent=2)
         logging.info(f"Sample info saved to {sample_path}")
     
-    output = []
-    
-    for entry in tqdm(data, desc="Digesting"):
+    # Collect all chunks first, so cache misses can be digested one by one or packed together
+    chunks = []
+    for entry in data:
         url, title = entry.get("url", ""), entry.get("title", "")
         content, source_type = entry.get("content", ""), entry.get("source_type", "html")
         
         if len(content) < 100:
             continue
         
-        chunks = chunk_text(content)
-        
-        for i, chunk in enumerate(chunks):
-            try:
-                digest = digester.invoke({
-                    "content": chunk,
-                    "title": title,
-                    "source_type": source_type
-                })
-                enriched_content = chunk + format_digest(digest)
-                
-                output.append({
-                    "url": url,
-                    "title": title,
-                    "content": enriched_content,
-                    "source_type": source_type
-                })
-            except Exception as e:
-                logging.error(f"Failed to digest {url} chunk {i}: {e}")
+        for i, chunk in enumerate(chunk_text(content)):
+            chunks.append((url, i, {"content": chunk, "title": title, "source_type": source_type}))
+    
+    digests = {}
+    misses = []
+    for n, (_, _, item) in enumerate(chunks):
+        digest = cache.get(item["content"], item["title"], item["source_type"])
+        if digest is None:
+            misses.append(n)
+        else:
+            digests[n] = digest
+    
+    if packed:
+        packable = [n for n in misses
+                    if not routing or route_chunk(chunks[n][2]["content"], chunks[n][2]["source_type"])[0] == FAST]
+        accept = (lambda d: not digest_needs_escalation(d)) if routing else None
+        results, batched = digest_packed([chunks[n][2] for n in packable], batch_digester, digester, pack_tokens,
+                                         accept=accept)
+        for n, digest, from_batch in zip(packable, results, batched):
+            # Individually digested chunks were routed (and recorded) by the routed digester itself
+            if routing and from_batch:
+                record_route("digest", FAST, "packed")
+            if digest is not None:
+                digests[n] = digest
+                cache.set(**chunks[n][2], digest=digest,
+                          prompt_version=BATCH_PROMPT_VERSION if from_batch else PROMPT_VERSION)
+        packed_set = set(packable)
+        misses = [n for n in misses if n not in packed_set]
+    
+    for n in tqdm(misses, desc="Digesting"):
+        url, i, item = chunks[n]
+        try:
+            digests[n] = digester.invoke(item)
+            cache.set(**item, digest=digests[n])
+        except Exception as e:
+            logging.error(f"Failed to digest {url} chunk {i}: {e}")
+    
+    output = []
+    for n, (url, i, item) in enumerate(chunks):
+        if n not in digests:
+            continue
+        chunk, title, source_type, digest = item["content"], item["title"], item["source_type"], digests[n]
+        if inline:
+            output.append({
+                "url": url,
+                "title": title,
+                "content": chunk + format_digest(digest),
+                "source_type": source_type
+            })
+        else:
+            output.append({
+                "url": url,
+                "title": title,
+                "content": chunk,
+                "source_type": source_type,
+                "chunk_index": i,
+                **digest.model_dump()
+            })
+    
+    if prune_cache:
+        logging.info(f"Pruned {cache.prune()} stale digest cache entries")
+    cache.save()
+    logging.info(f"Digest cache: {cache.hits} hits, {cache.misses} misses (prompt {cache.prompt_version}, model {cache.model})")
     
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(output, f, ensure_ascii=False, indent=2)
@@ -175,6 +457,16 @@ if __name__ == "__main__":
     parser.add_argument("--output", default="data/llm_digested_data.json")
     parser.add_argument("--sample-html", type=int, default=None, help="Sample N HTML pages")
     parser.add_argument("--sample-pdf", type=int, default=None, help="Sample N PDF pages")
+    parser.add_argument("--inline", action="store_true", help="Append the digest to content as markdown (legacy format)")
+    parser.add_argument("--model", default=DIGEST_MODEL)
+    parser.add_argument("--cache", default=DIGEST_CACHE_PATH, help="Digest cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the LLM")
+    parser.add_argument("--prune-cache", action="store_true", help="Drop cached digests from other models/prompt versions")
+    parser.add_argument("--routing", action="store_true", help="Digest simple chunks with the fast model tier (RAG_FAST_MODEL)")
+    parser.add_argument("--packed", action="store_true", help="Digest several small chunks per request")
+    parser.add_argument("--pack-tokens", type=int, default=PACK_TOKEN_BUDGET, help="Token budget per packed request")
     args = parser.parse_args()
     
-    digest_data(args.input, args.output, args.sample_html, args.sample_pdf)
+    digest_data(args.input, args.output, args.sample_html, args.sample_pdf, args.inline,
+                cache_path=None if args.no_cache else args.cache, model=args.model, prune_cache=args.prune_cache,
+                routing=args.routing, packed=args.packed, pack_tokens=args.pack_tokens)
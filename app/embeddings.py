@@ -0,0 +1,147 @@
+"""
+Embedding helpers shared by ingestion, retrieval and the offline tooling.
+"""
+
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+from app.metrics import CACHE_REQUESTS
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by does did do for from has have how in is it its of on or that the "
+    "this to was what when where which who why will with".split()
+)
+
+
+class LocalHashEmbeddings(Embeddings):
+    """
+    Deterministic, network-free embeddings: feature-hashed unigrams and bigrams, L2-normalized.
+    Not a semantic model - meant for offline benchmarks and tests where runs are compared
+    against each other, never against OpenAI embeddings.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> list[float]:
+        tokens = [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dimensions] += 1.0 if h >> 63 else -1.0
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Persistent embedding cache (SQLite, float32 blobs) in front of any embeddings model.
+    Keys include `namespace` (e.g. the model name) so different models never collide;
+    identical chunk texts produced by different experiments are embedded only once.
+    """
+
+    def __init__(self, underlying: Embeddings, path: str, namespace: str = ""):
+        self.underlying = underlying
+        self.namespace = namespace or type(underlying).__name__
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self._lock = threading.Lock()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(t) for t in texts]
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((k, array("f", v).tolist()) for k, v in rows)
+
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        if missing:
+            # Round-trip through float32 so cached and fresh vectors are identical
+            vectors = [array("f", v) for v in self.underlying.embed_documents([texts[i] for i in missing])]
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                    [(keys[i], v.tobytes()) for i, v in zip(missing, vectors)]
+                )
+                self._conn.commit()
+            found.update((keys[i], v.tolist()) for i, v in zip(missing, vectors))
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Bounded in-process LRU for query embeddings. Queries are keyed on their whitespace-normalized
+    text, so repeated short questions skip the embedding round-trip. Documents pass through.
+    """
+
+    def __init__(self, underlying: Embeddings, maxsize: int = 1024):
+        self.underlying = underlying
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return " ".join(text.split())
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if vector is not None:
+            CACHE_REQUESTS.inc(cache="query_embedding", result="hit")
+            return list(vector)
+
+        vector = self.underlying.embed_query(key)
+        CACHE_REQUESTS.inc(cache="query_embedding", result="miss")
+        with self._lock:
+            self.misses += 1
+            if self.maxsize > 0:
+                self._entries[key] = tuple(vector)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return vector
@@ -0,0 +1,206 @@
+"""
+Precomputed answers for known questions, served without retrieval or LLM calls.
+
+An offline job runs the full RAG chain over a curated question list (by default
+data/factual_questions.json and data/abstract_questions.json) and stores each answer with its
+sources in <persist_directory>/faq_index.json, together with the question embeddings and the
+vector store version it was built from.
+
+At query time a question is looked up by exact (normalized) text first, then by embedding
+nearest neighbour above FAQ_SIMILARITY. The FAQ index is only served while the vector store
+version matches; when ingestion produces a new version it is rebuilt in the background.
+
+Usage:
+    python -m app.faq --questions data/factual_questions.json data/abstract_questions.json
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.ingest import read_index_version
+from app.metrics import CACHE_REQUESTS, timed
+
+FAQ_FILE = "faq_index.json"
+FAQ_QUESTION_FILES = ["data/factual_questions.json", "data/abstract_questions.json"]
+FAQ_SIMILARITY = float(os.getenv("RAG_FAQ_SIMILARITY", "0.95"))
+VERSION_CHECK_SECONDS = 30
+REBUILD_BACKOFF_SECONDS = 60  # doubled after each failed rebuild of the same version
+REBUILD_MAX_FAILURES = 5
+
+NORMALIZE_PATTERN = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(NORMALIZE_PATTERN.sub(" ", question.lower()).split())
+
+
+def load_curated_questions(paths=FAQ_QUESTION_FILES) -> list[str]:
+    """Questions from JSON files holding strings or {"question": ...} objects, de-duplicated."""
+    questions, seen = [], set()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                question = item if isinstance(item, str) else item["question"]
+                if normalize_question(question) not in seen:
+                    seen.add(normalize_question(question))
+                    questions.append(question)
+    return questions
+
+
+def build_faq_index(questions: list[str], answer_fn, embeddings, persist_directory: str) -> dict:
+    """Answer every question with `answer_fn` (the uncached RAG chain) and write the FAQ index."""
+    version = read_index_version(persist_directory)
+    vectors = embeddings.embed_documents(questions)
+    entries = []
+    for question, vector in zip(questions, vectors):
+        result = answer_fn(question)
+        entries.append({
+            "question": question,
+            "answer": result["answer"],
+            "source_documents": [{"page_content": d.page_content, "metadata": d.metadata}
+                                 for d in result["source_documents"]],
+            "vector": vector,
+        })
+
+    index = {"index_version": version, "built_at": time.time(), "entries": entries}
+    path = os.path.join(persist_directory, FAQ_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+    logging.info(f"FAQ index: {len(entries)} answers for index version {version} → {path}")
+    return index
+
+
+class FAQIndex:
+    """In-memory exact + nearest-neighbour lookup over a built FAQ index."""
+
+    def __init__(self, index: dict):
+        self.index_version = index["index_version"]
+        self.entries = index["entries"]
+        self.exact = {normalize_question(e["question"]): e for e in self.entries}
+        vectors = np.asarray([e["vector"] for e in self.entries], dtype=np.float32).reshape(len(self.entries), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.where(norms == 0, 1, norms)
+
+    @classmethod
+    def load(cls, persist_directory: str):
+        path = os.path.join(persist_directory, FAQ_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def match_exact(self, question: str) -> dict | None:
+        return self.exact.get(normalize_question(question))
+
+    def match_nearest(self, query_vector, threshold: float = FAQ_SIMILARITY) -> dict | None:
+        if not self.entries:
+            return None
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+        similarities = self.vectors @ (query / norm)
+        best = int(np.argmax(similarities))
+        return self.entries[best] if similarities[best] >= threshold else None
+
+
+def as_result(entry: dict) -> dict:
+    return {
+        "answer": entry["answer"],
+        "source_documents": [Document(**d) for d in entry["source_documents"]],
+    }
+
+
+class FAQService:
+    """
+    Serves FAQ answers while the index matches the vector store version. The version is
+    re-read at most every VERSION_CHECK_SECONDS; on a change the stale index stops serving
+    and, if `rebuild` is given, is rebuilt in a background thread. It is served again only
+    once a rebuild succeeds. Failed rebuilds are retried with exponential backoff, and after
+    REBUILD_MAX_FAILURES only a newer vector store version triggers another attempt.
+    """
+
+    def __init__(self, persist_directory: str, embed_query, rebuild=None, threshold: float = FAQ_SIMILARITY):
+        self.persist_directory = persist_directory
+        self.embed_query = embed_query
+        self.rebuild = rebuild
+        self.threshold = threshold
+        self.index = FAQIndex.load(persist_directory)
+        self._checked_at = 0.0
+        self._stale = False
+        self._rebuilding = False
+        self._failures = 0
+        self._failed_version = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_fresh(self) -> bool:
+        if self.index is None:
+            return False
+        now = time.monotonic()
+        if now - self._checked_at >= VERSION_CHECK_SECONDS:
+            self._checked_at = now
+            version = read_index_version(self.persist_directory)
+            if version != self.index.index_version:
+                self._stale = True
+                self._start_rebuild(version, now)
+        return not self._stale
+
+    def _start_rebuild(self, version: str, now: float):
+        with self._lock:
+            if version != self._failed_version:
+                # A new ingest deserves a fresh attempt, whatever happened to the previous one
+                self._failures, self._retry_at = 0, 0.0
+            if (self._rebuilding or self.rebuild is None or now < self._retry_at
+                    or self._failures >= REBUILD_MAX_FAILURES):
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                questions = [e["question"] for e in self.index.entries]
+                self.index = FAQIndex(self.rebuild(questions))
+                self._stale = False
+                self._failures, self._failed_version = 0, None
+            except Exception as e:
+                self._failures += 1
+                self._failed_version = version
+                self._retry_at = time.monotonic() + REBUILD_BACKOFF_SECONDS * 2 ** (self._failures - 1)
+                logging.error(f"FAQ index rebuild failed ({self._failures}/{REBUILD_MAX_FAILURES}): {e}")
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def lookup(self, question: str) -> dict | None:
+        """A precomputed result for `question`, or None."""
+        if not self.is_fresh():
+            return None
+        with timed("faq"):
+            entry = self.index.match_exact(question)
+            if entry is None:
+                entry = self.index.match_nearest(self.embed_query(question), self.threshold)
+        CACHE_REQUESTS.inc(cache="faq", result="miss" if entry is None else "hit")
+        return as_result(entry) if entry else None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.rag import PERSIST_DIRECTORY, get_qa_chain
+
+    parser = argparse.ArgumentParser(description="Pre-generate answers for curated questions.")
+    parser.add_argument("--questions", nargs="+", default=FAQ_QUESTION_FILES)
+    parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    args = parser.parse_args()
+
+    qa = get_qa_chain(persist_directory=args.persist_directory, faq=False)
+    build_faq_index(load_curated_questions(args.questions), qa, qa.embeddings, args.persist_directory)
@@ -0,0 +1,58 @@
+"""
+Retrieval filters on chunk metadata, pushed down into the Chroma query as a `where` clause.
+
+Chroma has no string-prefix operator on metadata, so every chunk stores the path prefixes of
+its URL (`url_paths`, e.g. ["/industries/", "/industries/healthcare/"]); a URL-prefix filter is
+then an exact `$contains` match on that list. Prefixes deeper than MAX_PATH_DEPTH segments are
+not stored, so they are rejected rather than silently matching nothing. Topic tags from the digester are stored
+lower-cased in `topics`.
+"""
+
+from urllib.parse import urlparse
+
+MAX_PATH_DEPTH = 3
+SOURCE_TYPES = ("html", "pdf")
+
+
+def normalize_prefix(prefix: str) -> str:
+    """'/industries', 'industries/' or 'https://nortal.com/industries' -> '/industries/'."""
+    path = urlparse(prefix).path if "://" in prefix else prefix
+    segments = [s for s in path.split("/") if s]
+    return "/" + "".join(f"{s}/" for s in segments)
+
+
+def prefix_depth(prefix: str) -> int:
+    return normalize_prefix(prefix).count("/") - 1
+
+
+def url_paths(url: str) -> list[str]:
+    """Path prefixes of a URL up to MAX_PATH_DEPTH segments; always includes '/'."""
+    segments = [s for s in urlparse(url).path.split("/") if s][:MAX_PATH_DEPTH]
+    return ["/"] + ["/" + "".join(f"{s}/" for s in segments[:i]) for i in range(1, len(segments) + 1)]
+
+
+def normalize_topics(topics) -> list[str]:
+    return sorted({t.strip().lower() for t in topics or [] if t and t.strip()})
+
+
+def build_filter(source_type: str | None = None, url_prefix: str | None = None, topics=None) -> dict | None:
+    """Chroma `where` clause for the given filters (topics match any of the tags), or None."""
+    if source_type is not None and source_type not in SOURCE_TYPES:
+        raise ValueError(f"source_type must be one of {SOURCE_TYPES}, got {source_type!r}")
+
+    conditions = []
+    if source_type:
+        conditions.append({"source_type": source_type})
+    if url_prefix and prefix_depth(url_prefix) > MAX_PATH_DEPTH:
+        raise ValueError(f"url_prefix can have at most {MAX_PATH_DEPTH} path segments, got {url_prefix!r}")
+    if url_prefix and normalize_prefix(url_prefix) != "/":
+        conditions.append({"url_paths": {"$contains": normalize_prefix(url_prefix)}})
+    topic_conditions = [{"topics": {"$contains": t}} for t in normalize_topics(topics)]
+    if len(topic_conditions) > 1:
+        conditions.append({"$or": topic_conditions})
+    else:
+        conditions += topic_conditions
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
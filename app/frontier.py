@@ -0,0 +1,163 @@
+"""
+Crawl frontier for the scraper: canonical URLs, sitemap seeding and priority ordering.
+
+- canonicalize_url() maps the variants of one page (case, trailing slash, fragments, tracking
+  parameters, parameter order, default ports) to a single URL, so each page uses one unit of
+  the max_pages budget. Pages can also declare their canonical URL with <link rel="canonical">.
+- Sitemaps (found via robots.txt or /sitemap.xml, including sitemap indexes) seed the frontier
+  with every listed page and its <lastmod>. A page whose lastmod has not changed since the
+  previous crawl is not fetched again.
+- The frontier is a heap ordered by a priority score instead of FIFO. The default score prefers
+  shallow pages and content sections and demotes archive/tag/search pages; pass your own
+  `priority(url, depth, lastmod)` to change it.
+"""
+
+import heapq
+import logging
+import re
+import xml.etree.ElementTree as ET
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "dclid", "yclid", "mc_cid", "mc_eid", "_ga", "_gl",
+                   "_hsenc", "_hsmi", "hsctatracking", "ref", "referrer", "source"}
+TRACKING_PREFIXES = ("utm_", "hsa_", "pk_", "mtm_")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+FILE_PATTERN = re.compile(r"\.[A-Za-z0-9]{2,5}$")
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+PRIORITY_PATTERNS = [
+    (re.compile(r"/(services|industries|about|case-studies|insights|careers)(/|$)"), 1.0),
+    (re.compile(r"/(tag|category|author|page/\d+|search|feed)(/|$)"), -3.0),
+    (re.compile(r"\?"), -1.0),
+]
+
+
+def canonicalize_url(url: str, lowercase_path: bool = True) -> str:
+    """
+    Canonical form of `url`: lower-case scheme and host (and page paths, for sites with
+    case-insensitive slugs); no default port, fragment, tracking parameters or trailing slash
+    (except for the root); remaining query parameters sorted.
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parsed.port}"
+
+    path = re.sub(r"/{2,}", "/", parsed.path or "/")
+    # File paths (uploads, PDFs) are case-sensitive on most servers; only page slugs are folded
+    if lowercase_path and not FILE_PATTERN.search(path):
+        path = path.lower()
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunparse((scheme, host, path, "", urlencode(query), ""))
+
+
+def find_canonical(soup, page_url: str) -> str | None:
+    """The page's <link rel="canonical"> target, resolved against `page_url`."""
+    link = soup.find("link", rel=lambda value: value and "canonical" in (value if isinstance(value, list) else value.split()))
+    if link and link.get("href"):
+        return urljoin(page_url, link["href"])
+    return None
+
+
+def default_priority(url: str, depth: int, lastmod: str | None = None) -> float:
+    """Higher is crawled first: shallow pages and content sections, not archive listings."""
+    score = -float(depth)
+    parsed = urlparse(url)
+    target = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+    for pattern, weight in PRIORITY_PATTERNS:
+        if pattern.search(target):
+            score += weight
+    if lastmod:
+        score += 0.5  # listed in the sitemap: a page the site itself considers content
+    return score
+
+
+class CrawlFrontier:
+    """
+    Priority queue of canonical URLs. Each canonical URL is enqueued at most once; among
+    equal scores, URLs come out in insertion order (so the default behaves like BFS).
+    """
+
+    def __init__(self, priority=default_priority, canonicalize=canonicalize_url):
+        self.priority = priority
+        self.canonicalize = canonicalize
+        self.seen = set()
+        self._heap = []
+        self._counter = 0
+
+    def push(self, url: str, depth: int, lastmod: str | None = None) -> bool:
+        """Enqueue `url` unless its canonical form was already seen. Returns whether it was added."""
+        canonical = self.canonicalize(url)
+        if canonical in self.seen:
+            return False
+        self.seen.add(canonical)
+        heapq.heappush(self._heap, (-self.priority(canonical, depth, lastmod), self._counter, canonical, depth))
+        self._counter += 1
+        return True
+
+    def pop(self) -> tuple[str, int]:
+        _, _, url, depth = heapq.heappop(self._heap)
+        return url, depth
+
+    def mark_seen(self, url: str):
+        """Record an alias (e.g. a rel=canonical target) so it is never enqueued."""
+        self.seen.add(self.canonicalize(url))
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+
+def discover_sitemaps(start_url: str, fetch) -> list[str]:
+    """Sitemap URLs from robots.txt, falling back to /sitemap.xml. `fetch(url)` returns text or None."""
+    robots = fetch(urljoin(start_url, "/robots.txt")) or ""
+    sitemaps = [line.split(":", 1)[1].strip() for line in robots.splitlines()
+                if line.lower().startswith("sitemap:")]
+    return sitemaps or [urljoin(start_url, "/sitemap.xml")]
+
+
+def parse_sitemap(xml_text: str) -> tuple[list[tuple[str, str | None]], list[str]]:
+    """(pages as (loc, lastmod), nested sitemap URLs) from a urlset or sitemapindex document."""
+    root = ET.fromstring(xml_text)
+    pages, children = [], []
+    for node in root:
+        loc = node.findtext(f"{SITEMAP_NS}loc") or node.findtext("loc")
+        if not loc:
+            continue
+        if node.tag.endswith("sitemap"):
+            children.append(loc.strip())
+        else:
+            lastmod = node.findtext(f"{SITEMAP_NS}lastmod") or node.findtext("lastmod")
+            pages.append((loc.strip(), lastmod.strip() if lastmod else None))
+    return pages, children
+
+
+def read_sitemaps(start_url: str, fetch, max_sitemaps: int = 50) -> list[tuple[str, str | None]]:
+    """All (url, lastmod) pairs reachable from the site's sitemaps, following sitemap indexes."""
+    pending, done, pages = discover_sitemaps(start_url, fetch), set(), []
+    while pending and len(done) < max_sitemaps:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in done:
+            continue
+        done.add(sitemap_url)
+        text = fetch(sitemap_url)
+        if not text:
+            continue
+        try:
+            found, children = parse_sitemap(text)
+        except ET.ParseError as e:
+            logging.warning(f"Could not parse sitemap {sitemap_url}: {e}")
+            continue
+        pages.extend(found)
+        pending.extend(children)
+    logging.info(f"Sitemaps: {len(pages)} pages from {len(done)} sitemap(s)")
+    return pages
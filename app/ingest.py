@@ -1,70 +1,216 @@
-
 import json
 import os
 import shutil
+import uuid
 from langchain_community.document_loaders import JSONLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from dotenv import load_dotenv
 
+from app.clients import make_embeddings
+from app.filters import normalize_topics, url_paths
+
 load_dotenv()
 
 PERSIST_DIRECTORY = "data/chroma_db"
+INDEX_VERSION_FILE = "index_version"
 
-def ingest_data(json_path="data/scraped_data.json", chunk_size=1000, chunk_overlap=200):
-    if not os.path.exists(json_path):
-        print(f"Error: {json_path} not found. Run scraper first.")
-        return
+def write_index_version(persist_directory):
+    """Mark a (re)built index with a new version, so derived data (e.g. the FAQ index) is rebuilt."""
+    version = uuid.uuid4().hex
+    with open(os.path.join(persist_directory, INDEX_VERSION_FILE), 'w', encoding='utf-8') as f:
+        f.write(version)
+    return version
 
-    # Load data
+def read_index_version(persist_directory):
+    path = os.path.join(persist_directory, INDEX_VERSION_FILE)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    # Indexes built before versioning: fall back to the state of the Chroma database file
+    db = os.path.join(persist_directory, "chroma.sqlite3")
+    if os.path.exists(db):
+        stat = os.stat(db)
+        return f"sqlite-{stat.st_size}-{stat.st_mtime_ns}"
+    return None
+
+def load_documents(json_path="data/scraped_data.json"):
+    """Load scraped pages as one Document per page."""
     with open(json_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
-    
+    return entries_to_documents(data)
+
+def entry_metadata(entry):
+    # Metadata is crucial for citations
+    metadata = {
+        "source": entry.get("url", ""),
+        "title": entry.get("title", ""),
+        "source_type": entry.get("source_type", "html"),  # Track content origin
+        "url_paths": url_paths(entry.get("url", ""))  # URL-prefix filters (see app/filters.py)
+    }
+    topics = normalize_topics(entry.get("topics"))
+    if topics:  # Chroma rejects empty lists
+        metadata["topics"] = topics
+    return metadata
+
+def entries_to_documents(data):
     documents = []
     for entry in data:
         # Create a document for each page
-        # Metadata is crucial for citations
-        doc = Document(
-            page_content=entry.get("content", ""),
-            metadata={
-                "source": entry.get("url", ""),
-                "title": entry.get("title", ""),
-                "source_type": entry.get("source_type", "html")  # Track content origin
-            }
-        )
+        doc = Document(page_content=entry.get("content", ""), metadata=entry_metadata(entry))
         documents.append(doc)
+    return documents
 
-    # Split text
+def split_documents(documents, chunk_size=1000, chunk_overlap=200):
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len
     )
-    chunks = text_splitter.split_documents(documents)
-    print(f"Split {len(documents)} documents into {len(chunks)} chunks (Size: {chunk_size}, Overlap: {chunk_overlap}).")
+    return text_splitter.split_documents(documents)
+
+def split_structured(data, chunk_tokens=350, length_function=None):
+    """
+    Chunk scraped entries on their structure (see NortalScraper.extract_blocks): whole blocks
+    are packed up to `chunk_tokens`, a chunk never crosses a heading or a PDF page, and each
+    chunk starts with its heading trail. Entries without blocks are one paragraph.
+    """
+    if length_function is None:
+        from app.digester import count_tokens as length_function
+    # Only used for single blocks that are larger than the budget
+    oversize_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens, chunk_overlap=0, length_function=length_function
+    )
+
+    chunks = []
+    for entry in data:
+        metadata = entry_metadata(entry)
+        blocks = entry.get("blocks") or [{"type": "paragraph", "text": entry.get("content", "")}]
+        headings = {}  # level -> heading text
+        trail, parts, tokens, page = "", [], 0, None
+
+        def flush():
+            if parts:
+                chunk_metadata = {**metadata, "section": trail}
+                if page is not None:
+                    chunk_metadata["page"] = page
+                text = "\n".join(parts)
+                chunks.append(Document(page_content=f"{trail}\n{text}" if trail else text, metadata=chunk_metadata))
+
+        for block in blocks:
+            if block.get("type") == "heading":
+                flush()
+                level = block.get("level", 1)
+                headings = {l: t for l, t in headings.items() if l < level}
+                headings[level] = block["text"]
+                trail = " > ".join(headings[l] for l in sorted(headings))
+                parts, tokens = [], length_function(trail)
+                continue
+
+            block_tokens = length_function(block["text"])
+            if block.get("page") != page or tokens + block_tokens > chunk_tokens:
+                flush()
+                parts, tokens, page = [], length_function(trail) if trail else 0, block.get("page")
+
+            if tokens + block_tokens > chunk_tokens:
+                for piece in oversize_splitter.split_text(block["text"]):
+                    parts = [piece]
+                    flush()
+                parts = []
+            else:
+                parts.append(block["text"])
+                tokens += block_tokens
+        flush()
+    return chunks
+
+def ingest_data(json_path="data/scraped_data.json", chunk_size=1000, chunk_overlap=200,
+                persist_directory=PERSIST_DIRECTORY, embeddings=None, dedup=False,
+                splitter="recursive", chunk_tokens=350, multi_vector=False, workers=None):
+    if not os.path.exists(json_path):
+        print(f"Error: {json_path} not found. Run scraper first.")
+        return
+
+    # Load data
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if dedup:
+        from app.dedup import dedup_entries, savings_report
+        deduped, stats = dedup_entries(data)
+        stats.update(savings_report(data, deduped, chunk_size, chunk_overlap))
+        data = deduped
+        print(f"Dedup: {stats['pages_in']} → {stats['pages_out']} pages, "
+              f"{stats['boilerplate_words_removed']} boilerplate words removed; "
+              f"saved {stats['chunks_saved']} chunks ({stats['chunks_before']} → {stats['chunks_after']}) and "
+              f"{stats['tokens_saved']} tokens ({stats['tokens_before']} → {stats['tokens_after']}).")
+
+    if multi_vector:
+        # Digested chunks are already split; summary and key facts become child vectors
+        from app.multi_vector import build_multi_vector_index
+        vectorstore = build_multi_vector_index(data, embeddings or make_embeddings(), persist_directory)
+        write_index_version(persist_directory)
+        print(f"Ingestion complete. Multi-vector store saved to {persist_directory}")
+        return vectorstore
+
+    # A parent docstore left by an earlier multi-vector ingest would make retrieval expect
+    # parent_id on every hit, so the plain chunks indexed below would never be returned
+    from app.multi_vector import PARENTS_FILE
+    parents_path = os.path.join(persist_directory, PARENTS_FILE)
+    if os.path.exists(parents_path):
+        os.remove(parents_path)
+
+    if workers:
+        # Large crawls: split on a process pool while earlier shards are being embedded
+        from app.sharded_ingest import ingest_sharded
+        vectorstore = ingest_sharded(data, embeddings or make_embeddings(), persist_directory, workers,
+                                     splitter, chunk_size, chunk_overlap, chunk_tokens)
+        write_index_version(persist_directory)
+        print(f"Ingestion complete. Vector store saved to {persist_directory}")
+        return vectorstore
+
+    # Split text
+    if splitter == "structured":
+        chunks = split_structured(data, chunk_tokens)
+        print(f"Split {len(data)} documents into {len(chunks)} structured chunks (Max tokens: {chunk_tokens}).")
+    else:
+        documents = entries_to_documents(data)
+        chunks = split_documents(documents, chunk_size, chunk_overlap)
+        print(f"Split {len(documents)} documents into {len(chunks)} chunks (Size: {chunk_size}, Overlap: {chunk_overlap}).")
 
     # Create Embeddings
-    embeddings = OpenAIEmbeddings()
+    embeddings = embeddings or make_embeddings()
 
     # Clear existing DB if needed (optional, for clean re-runs)
-    # if os.path.exists(PERSIST_DIRECTORY):
-    #     shutil.rmtree(PERSIST_DIRECTORY)
+    # if os.path.exists(persist_directory):
+    #     shutil.rmtree(persist_directory)
 
     # Store in Chroma
     vectorstore = Chroma.from_documents(
         documents=chunks,
         embedding=embeddings,
-        persist_directory=PERSIST_DIRECTORY
+        persist_directory=persist_directory
     )
-    print(f"Ingestion complete. Vector store saved to {PERSIST_DIRECTORY}")
+    write_index_version(persist_directory)
+    print(f"Ingestion complete. Vector store saved to {persist_directory}")
+    return vectorstore
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Ingest data into RAG vector store.")
     parser.add_argument("--chunk-size", type=int, default=1000, help="Size of text chunks")
     parser.add_argument("--chunk-overlap", type=int, default=200, help="Overlap between chunks")
+    parser.add_argument("--json-path", default="data/scraped_data.json", help="Path to input JSON data")
+    parser.add_argument("--dedup", action="store_true", help="Collapse near-duplicate pages and boilerplate first")
+    parser.add_argument("--splitter", choices=["recursive", "structured"], default="recursive",
+                        help="'structured' chunks on headings/PDF pages with token-based sizing")
+    parser.add_argument("--chunk-tokens", type=int, default=350, help="Max tokens per chunk (structured splitter)")
+    parser.add_argument("--multi-vector", action="store_true",
+                        help="Index digest summaries/key facts as child vectors of digested chunks (use with llm_digested_data.json)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Sharded mode: split on N processes and embed asynchronously (for large crawls)")
     args = parser.parse_args()
-    
-    ingest_data(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+
+    ingest_data(json_path=args.json_path, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                dedup=args.dedup, splitter=args.splitter, chunk_tokens=args.chunk_tokens,
+                multi_vector=args.multi_vector, workers=args.workers)
@@ -1,15 +1,21 @@
 
 import streamlit as st
 import os
+import sys
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
 # Set LangSmith project for Streamlit
 os.environ["LANGCHAIN_PROJECT"] = "nortal-rag-streamlit"
 
-from rag import get_qa_chain
-from scraper import NortalScraper
-from ingest import ingest_data
+# `streamlit run app/main.py` only puts app/ on the path; app modules import each other as `app.*`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.rag import get_qa_chain
+from app.sessions import ConversationMemory, conversational, create_session_store
+from app.scraper import NortalScraper
+from app.ingest import ingest_data
 
 st.set_page_config(page_title="Nortal Intelligence", page_icon="🤖")
 
@@ -73,9 +79,17 @@ if not os.path.exists("data/chroma_db"):
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+@st.cache_resource
+def get_conversation_memory():
+    # One store per server process, shared by all browser sessions
+    return ConversationMemory(create_session_store())
+
 if "qa_func" not in st.session_state:
     try:
-        st.session_state.qa_func = get_qa_chain()
+        st.session_state.qa_func = conversational(get_qa_chain(), get_conversation_memory())
     except Exception as e:
         st.error(f"Failed to initialize RAG pipeline: {e}")
         st.info("Try reinitializing the database using the button above.")
@@ -97,7 +111,7 @@ if prompt := st.chat_input("What would you like to know?"):
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-                    result = st.session_state.qa_func(prompt)
+                    result = st.session_state.qa_func(prompt, st.session_state.session_id)
                     answer = result['answer']
                     source_docs = result['source_documents']
                     
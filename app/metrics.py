@@ -0,0 +1,184 @@
+"""
+In-process metrics for the RAG hot path, exposed in Prometheus text format.
+Works offline and independently of LangSmith; `/metrics` in app/api.py renders REGISTRY.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from app.profiling import span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(n, "") for n in self.labelnames), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v:g}" for k, v in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() touches a single bucket to stay cheap."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(labels.get(n, "") for n in self.labelnames))
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds metrics by name; creating an existing metric returns the same instance."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_duration_seconds",
+    "Latency of RAG pipeline stages (embed, search, prompt, llm_ttft, llm, total).",
+    ("stage",)
+)
+TOKENS = REGISTRY.counter("rag_llm_tokens_total", "LLM tokens used, by kind (prompt/completion).", ("kind",))
+CACHE_REQUESTS = REGISTRY.counter("rag_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
+ERRORS = REGISTRY.counter("rag_errors_total", "Errors raised inside a RAG stage.", ("stage",))
+RETRIEVED_CHUNKS = REGISTRY.histogram(
+    "rag_retrieved_chunks", "Chunks passed to the LLM per question (adaptive k).", buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10)
+)
+NO_ANSWER = REGISTRY.counter("rag_no_answer_total", "Questions answered with \"don't know\" without calling the LLM.")
+ROUTE_DECISIONS = REGISTRY.counter(
+    "rag_route_decisions_total", "Model-tier routing decisions by target (answer/digest), tier and reason.",
+    ("target", "tier", "reason")
+)
+ESCALATIONS = REGISTRY.counter("rag_escalations_total", "Fast-tier results re-run on the strong tier.", ("target",))
+TIER_SECONDS = REGISTRY.histogram(
+    "rag_llm_tier_duration_seconds", "LLM call latency by target and model tier.", ("target", "tier")
+)
+HEDGED_REQUESTS = REGISTRY.counter("rag_hedged_requests_total", "Duplicate upstream calls sent for slow stages.", ("stage",))
+STAGE_TIMEOUTS = REGISTRY.counter("rag_stage_timeouts_total", "Stages that ran out of time (stage timeout or deadline).", ("stage",))
+DEGRADED = REGISTRY.counter("rag_degraded_total", "Answers returned as sources only because a stage timed out.", ("stage",))
+API_REQUESTS = REGISTRY.counter("api_requests_total", "API requests by endpoint and status code.", ("endpoint", "status"))
+API_SECONDS = REGISTRY.histogram("api_request_duration_seconds", "End-to-end API request latency.", ("endpoint",))
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Record the duration of a stage; exceptions are counted in rag_errors_total and re-raised.
+    The stage is also a span of the request's span tree when one is being recorded.
+    """
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    except Exception:
+        ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def percentile(values, q: float) -> float:
+    """Linear-interpolated percentile (q in 0-100) of raw samples, for offline reports."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def record_usage(usage: dict | None):
+    """Count tokens from a LangChain `usage_metadata` dict."""
+    if not usage:
+        return
+    TOKENS.inc(usage.get("input_tokens", 0), kind="prompt")
+    TOKENS.inc(usage.get("output_tokens", 0), kind="completion")
@@ -0,0 +1,110 @@
+"""
+Multi-vector index over digested chunks.
+
+Each digested chunk (see digester.digest_data) is a parent. Its summary, each key fact and the
+raw chunk text are embedded as separate small child vectors in Chroma, each carrying the
+`parent_id`. Parents are kept out of the vector store in a JSON docstore next to it
+(<persist_directory>/parents.json). At query time child hits are resolved to their parents,
+so the prompt only ever contains the raw chunk text.
+"""
+
+import hashlib
+import json
+import os
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from app.digester import parse_inline_digest
+from app.ingest import entry_metadata
+
+PARENTS_FILE = "parents.json"
+FANOUT = 4  # children fetched per requested parent; several children often share a parent
+
+
+def parent_id(entry: dict) -> str:
+    key = f"{entry.get('url', '')}\n{entry.get('chunk_index', '')}\n{entry.get('content', '')}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def normalize_entry(entry: dict) -> dict:
+    """Accept both the structured digest format and the legacy inline (markdown) one."""
+    if "summary" in entry:
+        return entry
+    content, digest = parse_inline_digest(entry.get("content", ""))
+    if digest is None:
+        return entry
+    return {**entry, "content": content, **digest.model_dump()}
+
+
+def build_documents(entries: list[dict]) -> tuple[dict, list[Document], list[str]]:
+    """Returns (parents by id, child documents, child ids)."""
+    parents, children, ids = {}, [], []
+    for entry in map(normalize_entry, entries):
+        content = entry.get("content", "")
+        if not content.strip():
+            continue
+        pid = parent_id(entry)
+        if pid in parents:
+            continue
+        metadata = entry_metadata(entry)
+        parents[pid] = {"page_content": content, "metadata": {**metadata, "summary": entry.get("summary", "")}}
+
+        child_metadata = {**metadata, "parent_id": pid}
+        texts = [("chunk", content)]
+        if entry.get("summary"):
+            texts.append(("summary", entry["summary"]))
+        texts += [("fact", fact) for fact in entry.get("key_facts") or [] if fact.strip()]
+        for n, (kind, text) in enumerate(texts):
+            children.append(Document(page_content=text, metadata={**child_metadata, "kind": kind}))
+            ids.append(f"{pid}:{n}")
+    return parents, children, ids
+
+
+def save_parents(persist_directory: str, parents: dict):
+    os.makedirs(persist_directory, exist_ok=True)
+    with open(os.path.join(persist_directory, PARENTS_FILE), "w", encoding="utf-8") as f:
+        json.dump(parents, f, ensure_ascii=False)
+
+
+def load_parents(persist_directory: str) -> dict[str, Document]:
+    with open(os.path.join(persist_directory, PARENTS_FILE), "r", encoding="utf-8") as f:
+        return {pid: Document(**doc) for pid, doc in json.load(f).items()}
+
+
+def is_multi_vector(persist_directory: str) -> bool:
+    return os.path.exists(os.path.join(persist_directory, PARENTS_FILE))
+
+
+def build_multi_vector_index(entries: list[dict], embeddings, persist_directory: str):
+    """Index children in Chroma and write the parent docstore. Returns the vectorstore."""
+    parents, children, ids = build_documents(entries)
+    save_parents(persist_directory, parents)
+    vectorstore = Chroma.from_documents(children, embeddings, ids=ids, persist_directory=persist_directory)
+    print(f"Indexed {len(children)} child vectors for {len(parents)} parent chunks.")
+    return vectorstore
+
+
+def resolve_scored_parents(scored_children: list[tuple], parents: dict[str, Document], k: int) -> list[tuple]:
+    """Unique (parent, score) pairs for (child, score) hits, in rank order of their best child."""
+    seen, output = set(), []
+    for doc, score in scored_children:
+        pid = doc.metadata.get("parent_id")
+        if pid in seen or pid not in parents:
+            continue
+        seen.add(pid)
+        output.append((parents[pid], score))
+        if len(output) == k:
+            break
+    return output
+
+
+def resolve_parents(child_docs: list[Document], parents: dict[str, Document], k: int) -> list[Document]:
+    """Unique parents of the child hits, in rank order of their best child."""
+    return [doc for doc, _ in resolve_scored_parents([(d, None) for d in child_docs], parents, k)]
+
+
+def search_parents(vectorstore, parents: dict[str, Document], query_vector, k: int = 3, fanout: int = FANOUT,
+                   filter: dict | None = None) -> list[Document]:
+    children = vectorstore.similarity_search_by_vector(query_vector, k=k * fanout, filter=filter)
+    return resolve_parents(children, parents, k)
@@ -0,0 +1,198 @@
+"""
+Opt-in profiling for the API hot path. Both tools cost next to nothing while disabled.
+
+- Span trees: with RAG_SLOW_REQUEST_MS set, each /chat request records a tree of timed stages.
+  Every `metrics.timed` stage becomes a span, plus API-level spans such as response
+  serialization. Requests slower than the threshold are logged and return the tree in
+  `spans`. The current span is a context variable, so stages run on worker threads (see
+  app/resilience.py) attach to the request that started them.
+- Sampling profiler: POST /debug/profile arms wall-clock sampling for the next N /chat
+  requests. It needs the `X-Profile-Token` header to match RAG_PROFILE_TOKEN; without that
+  variable the endpoints are disabled. While an armed request runs, a background thread reads
+  every thread's stack from sys._current_frames(). GET /debug/profile returns the result in
+  collapsed-stack format ("thread;outer;...;inner count"), which flamegraph.pl and
+  speedscope read directly. Threads idling in a pool queue or the event loop's select are
+  skipped. The sample is process-wide, so concurrent unarmed requests show up too.
+"""
+
+import contextvars
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+SLOW_REQUEST_MS = float(os.getenv("RAG_SLOW_REQUEST_MS", "0"))  # 0 disables span trees
+SAMPLE_INTERVAL = float(os.getenv("RAG_PROFILE_INTERVAL", "0.005"))
+MAX_PROFILE_REQUESTS = 1000
+
+# Leaf frames of threads that are waiting for work rather than doing it
+IDLE_FRAMES = {("thread.py", "_worker"), ("selectors.py", "select"), ("queue.py", "get")}
+
+_current_span = contextvars.ContextVar("profiling_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+
+    @property
+    def ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "ms": round(self.ms, 2), "children": [c.to_dict() for c in self.children]}
+
+    def render(self, indent: int = 0) -> str:
+        lines = [f"{'  ' * indent}{self.name} {self.ms:.1f}ms"]
+        lines.extend(c.render(indent + 1) for c in self.children)
+        return "\n".join(lines)
+
+
+@contextmanager
+def trace(name: str, enabled: bool = True):
+    """Start a span tree for one request; yields the root Span, or None when disabled."""
+    if not enabled:
+        yield None
+        return
+    root = Span(name)
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        root.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    """Record a child span of the current trace; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """Wall-clock sampler over sys._current_frames(); stacks are aggregated in collapsed format."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own)
+
+    def sample(self, exclude: int | None = None):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        self.samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident == exclude or _is_idle(frame):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Samples while armed requests run; keeps the collapsed output of the last finished profile."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.remaining = 0
+        self.last_profile = None
+        self._active = 0
+        self._profiler = None
+        self._lock = threading.Lock()
+
+    def arm(self, requests: int):
+        with self._lock:
+            self.remaining = requests
+            if self._profiler is None or not self._active:
+                self._profiler = SamplingProfiler(self.interval)
+
+    @property
+    def in_progress(self) -> bool:
+        return self.remaining > 0 or self._active > 0
+
+    @contextmanager
+    def request(self):
+        """Wrap one request; sampled only if profiling is armed (a plain attribute check otherwise)."""
+        if not self.remaining:
+            yield
+            return
+        with self._lock:
+            armed = self.remaining > 0
+            if armed:
+                self.remaining -= 1
+                self._active += 1
+                if self._active == 1:
+                    self._profiler.start()
+        try:
+            yield
+        finally:
+            if armed:
+                with self._lock:
+                    self._active -= 1
+                    if not self._active:
+                        self._profiler.stop()
+                        if not self.remaining:
+                            self.last_profile = self._profiler.collapsed()
+
+
+PROFILER = RequestProfiler()
+
+
+def check_profile_token(token: str | None) -> bool | None:
+    """None when profiling is not configured (no RAG_PROFILE_TOKEN), else whether `token` matches."""
+    expected = os.getenv("RAG_PROFILE_TOKEN")
+    if not expected:
+        return None
+    return token is not None and hmac.compare_digest(token, expected)
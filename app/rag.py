@@ -1,34 +1,61 @@
-
 import os
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+import time
 from langchain_chroma import Chroma
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
+from langsmith import traceable
 from dotenv import load_dotenv
 
+from app.clients import make_chat_model, make_embeddings
+from app.adaptive import ADAPTIVE_ENABLED, ADAPTIVE_MAX_K, DONT_KNOW_ANSWER, search_with_relevance, select_adaptive
+from app.embeddings import CachedQueryEmbeddings
+from app.faq import FAQ_FILE, FAQService, build_faq_index
+from app.filters import build_filter
+from app.metrics import NO_ANSWER, RETRIEVED_CHUNKS, STAGE_SECONDS, timed, record_usage
+from app.routing import (
+    FAST, FAST_MODEL, ROUTING_ENABLED, STRONG, STRONG_MODEL, answer_needs_escalation, record_escalation,
+    record_route, route_question, tier_timer
+)
+from app.multi_vector import FANOUT, is_multi_vector, load_parents, resolve_scored_parents, search_parents
+from app.resilience import StageTimeout, call_with_deadline, current_deadline, degraded_result, stage_budget
+
 load_dotenv()
 
 PERSIST_DIRECTORY = "data/chroma_db"
+QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
 
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
-def get_qa_chain():
-    if not os.path.exists(PERSIST_DIRECTORY):
-        raise ValueError(f"Vector store not found at {PERSIST_DIRECTORY}. Please run ingestion first.")
+def get_qa_chain(persist_directory=PERSIST_DIRECTORY, k=3, embeddings=None, adaptive=ADAPTIVE_ENABLED,
+                 routing=ROUTING_ENABLED, faq=True):
+    """
+    adaptive=True picks between 1 and ADAPTIVE_MAX_K chunks from their relevance scores
+    (instead of a fixed k) and answers "don't know" without the LLM when nothing is relevant.
+    routing=True answers simple questions with the fast model tier (see app/routing.py).
+    faq=True serves precomputed answers for known questions when an FAQ index exists (see app/faq.py).
+    Upstream calls run under the request deadline with per-stage timeouts and hedging (see
+    app/resilience.py); an answer that runs out of time is returned as sources only.
+    """
+    if not os.path.exists(persist_directory):
+        raise ValueError(f"Vector store not found at {persist_directory}. Please run ingestion first.")
 
-    embeddings = OpenAIEmbeddings()
+    embeddings = embeddings or make_embeddings()
+    # Repeated questions skip the query-embedding round-trip
+    query_embeddings = CachedQueryEmbeddings(embeddings, QUERY_CACHE_SIZE)
     vectorstore = Chroma(
-        persist_directory=PERSIST_DIRECTORY,
+        persist_directory=persist_directory,
         embedding_function=embeddings
     )
-    
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-    
-    llm = ChatOpenAI(model_name="gpt-4o", temperature=0)
-    
-    # Simple LCEL pattern
+    # Multi-vector indexes hold summary/fact children; hits resolve to raw parent chunks
+    parents = load_parents(persist_directory) if is_multi_vector(persist_directory) else None
+
+    # stream_usage reports token counts on the final streamed chunk. Answers are deadline-bound:
+    # a slow call is degraded, never retried
+    llms = {STRONG: make_chat_model(STRONG_MODEL if routing else "gpt-4o", temperature=0, stream_usage=True,
+                                    max_retries=0)}
+    if routing:
+        llms[FAST] = make_chat_model(FAST_MODEL, temperature=0, stream_usage=True, max_retries=0)
+
     template = """You are an assistant for question-answering tasks about Nortal.
 Use the following pieces of retrieved context to answer the question.
 If you don't know the answer, say that you don't know.
@@ -39,21 +66,103 @@ Context: {context}
 Question: {question}
 
 Answer:"""
-    
+
     prompt = ChatPromptTemplate.from_template(template)
-    
-    # Build the chain using LCEL
-    rag_chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
-    
-    # Wrap to also return source docs
-    def qa_with_sources(question):
-        answer = rag_chain.invoke(question)
-        docs = retriever.invoke(question)
-        return {"answer": answer, "source_documents": docs}
-    
+
+    # Stages are run explicitly (rather than as one LCEL chain) so each can be timed;
+    # retrieval happens once and its documents are reused for the answer and the sources.
+    def retrieve(question, filters=None):
+        # Filters become a Chroma `where` clause, so only the matching subset is searched
+        where = build_filter(**(filters or {}))
+        with timed("embed"):
+            query_vector = call_with_deadline(lambda: query_embeddings.embed_query(question), "embed")
+        deadline = current_deadline()
+        if deadline:
+            deadline.check("search")
+        with timed("search"):
+            if adaptive:
+                if parents is not None:
+                    scored = search_with_relevance(vectorstore, query_vector, ADAPTIVE_MAX_K * FANOUT, where)
+                    scored = resolve_scored_parents(scored, parents, ADAPTIVE_MAX_K)
+                else:
+                    scored = search_with_relevance(vectorstore, query_vector, ADAPTIVE_MAX_K, where)
+                return select_adaptive(scored)
+            if parents is not None:
+                return search_parents(vectorstore, parents, query_vector, k=k, filter=where)
+            return vectorstore.similarity_search_by_vector(query_vector, k=k, filter=where)
+
+    def stream_answer(messages, tier):
+        """(answer, usage, time to first token); recorded by the caller, once for the winning attempt."""
+        parts, usage, ttft = [], None, None
+        start = time.perf_counter()
+        for chunk in llms[tier].stream(messages):
+            if chunk.content and ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(chunk.content)
+            usage = chunk.usage_metadata or usage
+            budget = stage_budget()
+            if budget is not None and budget[1] <= 0:
+                raise StageTimeout(*budget)  # abandoned by call_with_deadline: stop reading the stream
+        return "".join(parts), usage, ttft
+
+    def answer_with(messages, tier):
+        with timed("llm"), tier_timer("answer", tier):
+            answer, usage, ttft = call_with_deadline(lambda: stream_answer(messages, tier), "llm")
+        if ttft is not None:
+            STAGE_SECONDS.observe(ttft, stage="llm_ttft")
+        record_usage(usage)
+        return answer
+
+    def generate(question, docs):
+        with timed("prompt"):
+            context = format_docs(docs)
+            messages = prompt.format_messages(context=context, question=question)
+
+        if not routing:
+            return answer_with(messages, STRONG)
+        tier, reason = route_question(question, context)
+        record_route("answer", tier, reason)
+        answer = answer_with(messages, tier)
+        if tier == FAST and answer_needs_escalation(answer, docs):
+            record_escalation("answer")
+            try:
+                answer = answer_with(messages, STRONG)
+            except StageTimeout:
+                pass  # out of time: the fast-tier answer is better than none
+        return answer
+
+    def answer_question(question, filters=None):
+        docs = retrieve(question, filters)
+        RETRIEVED_CHUNKS.observe(len(docs))
+        if not docs:
+            # Nothing relevant enough (adaptive mode): skip the LLM call entirely
+            NO_ANSWER.inc()
+            return {"answer": DONT_KNOW_ANSWER, "source_documents": []}
+        try:
+            return {"answer": generate(question, docs), "source_documents": docs}
+        except StageTimeout as e:
+            # Out of time after retrieval: the sources are still useful without an answer
+            return degraded_result(docs, e.stage)
+
+    # Precomputed answers for curated questions (python -m app.faq), rebuilt when the index changes
+    faq_service = None
+    if faq and os.path.exists(os.path.join(persist_directory, FAQ_FILE)):
+        # The lookup's embedding is the question's first (uncached) one, so it gets the embed stage limits
+        faq_service = FAQService(
+            persist_directory, lambda q: call_with_deadline(lambda: query_embeddings.embed_query(q), "embed"),
+            rebuild=lambda questions: build_faq_index(questions, answer_question, embeddings, persist_directory)
+        )
+
+    @traceable(name="qa_with_sources")
+    def qa_with_sources(question, filters=None):
+        """filters: optional dict with source_type ('html'/'pdf'), url_prefix and topics."""
+        with timed("total"):
+            # FAQ answers were generated without filters, so filtered questions always retrieve
+            result = faq_service.lookup(question) if faq_service and not filters else None
+            if result is None:
+                result = answer_question(question, filters)
+        return result
+
+    qa_with_sources.data_source = persist_directory
+    qa_with_sources.embeddings = embeddings
     return qa_with_sources
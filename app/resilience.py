@@ -0,0 +1,185 @@
+"""
+Deadlines, per-stage timeouts and hedged requests for the upstream calls in the RAG path.
+
+- A Deadline is set per request (the API's `deadline_seconds`, default RAG_DEADLINE_SECONDS)
+  and propagated with a context variable, so nested stages (query rewrite, embedding, LLM)
+  see the remaining budget without threading it through every signature.
+- Each stage runs with timeout = min(stage timeout, time left on the deadline). That budget
+  also reaches the HTTP call itself (see app/clients.py): the request timeout is capped to
+  what is left, and once it is spent the call fails instead of being retried, so abandoned
+  attempts free their worker when the stage gives up on them.
+- Hedging: if a call has not finished after the stage's recent p95 latency (HEDGE_PERCENTILE,
+  once HEDGE_MIN_SAMPLES calls were seen), a duplicate is sent and the first to finish wins.
+  The slower call is abandoned and finishes in the background. Only the cheap, short stages in
+  HEDGE_STAGES are hedged by default; a duplicate answer stream would double the token spend.
+- When a stage runs out of time, StageTimeout is raised; the RAG chain turns a timed-out
+  answer into a degraded result with the retrieved sources and DEGRADED_ANSWER.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from app.metrics import DEGRADED, HEDGED_REQUESTS, STAGE_TIMEOUTS, percentile
+
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("RAG_DEADLINE_SECONDS", "30"))
+STAGE_TIMEOUT_SECONDS = {
+    "rewrite": float(os.getenv("RAG_REWRITE_TIMEOUT", "5")),
+    "embed": float(os.getenv("RAG_EMBED_TIMEOUT", "5")),
+    "llm": float(os.getenv("RAG_LLM_TIMEOUT", "20")),
+}
+HEDGE_ENABLED = os.getenv("RAG_HEDGING", "1") == "1"
+HEDGE_STAGES = set(os.getenv("RAG_HEDGE_STAGES", "rewrite,embed").split(","))
+HEDGE_PERCENTILE = float(os.getenv("RAG_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+DEGRADED_ANSWER = ("I couldn't generate an answer in time. "
+                   "These are the most relevant sources I found for your question.")
+
+_deadline = contextvars.ContextVar("rag_deadline", default=None)
+_stage_budget = contextvars.ContextVar("rag_stage_budget", default=None)  # (stage, expires_at) of the running call
+# Abandoned (hedged or timed-out) calls keep a worker until their stage budget runs out
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RAG_UPSTREAM_WORKERS", "32")),
+                               thread_name_prefix="upstream")
+
+
+class StageTimeout(TimeoutError):
+    """A stage did not finish within its timeout or the request deadline."""
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"{stage} timed out after {timeout:.2f}s")
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, seconds: float, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.clock())
+
+    def timeout(self, stage: str) -> float:
+        """Time the stage may take: its own timeout, capped by what is left of the deadline."""
+        return min(STAGE_TIMEOUT_SECONDS.get(stage, self.remaining()), self.remaining())
+
+    def check(self, stage: str):
+        if self.remaining() <= 0:
+            STAGE_TIMEOUTS.inc(stage=stage)
+            raise StageTimeout(stage, 0.0)
+
+
+def current_deadline() -> Deadline | None:
+    return _deadline.get()
+
+
+def stage_budget() -> tuple[str, float] | None:
+    """(stage, seconds left) for the upstream call running under call_with_deadline, else None."""
+    budget = _stage_budget.get()
+    if budget is None:
+        return None
+    stage, expires_at = budget
+    return stage, max(0.0, expires_at - time.monotonic())
+
+
+def _attempt_context(stage: str, expires_at: float) -> contextvars.Context:
+    context = contextvars.copy_context()
+    context.run(_stage_budget.set, (stage, expires_at))
+    return context
+
+
+@contextmanager
+def deadline_scope(seconds: float | None = None):
+    """Set the request deadline for everything called inside the block."""
+    token = _deadline.set(Deadline(seconds or DEFAULT_DEADLINE_SECONDS))
+    try:
+        yield _deadline.get()
+    finally:
+        _deadline.reset(token)
+
+
+class LatencyTracker:
+    """Recent successful call durations per stage, for the hedging delay."""
+
+    def __init__(self, window: int = HEDGE_WINDOW, min_samples: int = HEDGE_MIN_SAMPLES,
+                 hedge_percentile: float = HEDGE_PERCENTILE):
+        self.min_samples = min_samples
+        self.hedge_percentile = hedge_percentile
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            self._samples[stage].append(seconds)
+
+    def hedge_delay(self, stage: str) -> float | None:
+        """Delay before sending a duplicate, or None while there are too few samples."""
+        with self._lock:
+            samples = list(self._samples[stage])
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, self.hedge_percentile)
+
+
+TRACKER = LatencyTracker()
+
+
+def call_with_deadline(fn, stage: str, hedge: bool | None = None, tracker: LatencyTracker = TRACKER):
+    """
+    Run `fn()` within the stage timeout (capped by the current deadline), hedging it with a
+    duplicate call once it is slower than the stage's recent HEDGE_PERCENTILE latency.
+    `hedge` defaults to HEDGE_ENABLED for stages in HEDGE_STAGES. A hedged `fn` may run twice,
+    so it should record metrics only through its return value.
+    Raises StageTimeout when no attempt finishes in time; re-raises the error if all attempts fail.
+    """
+    if hedge is None:
+        hedge = HEDGE_ENABLED and stage in HEDGE_STAGES
+    deadline = current_deadline()
+    timeout = deadline.timeout(stage) if deadline else STAGE_TIMEOUT_SECONDS.get(stage, DEFAULT_DEADLINE_SECONDS)
+    if timeout <= 0:
+        STAGE_TIMEOUTS.inc(stage=stage)
+        raise StageTimeout(stage, timeout)
+
+    start = time.monotonic()
+    pending = {_executor.submit(_attempt_context(stage, start + timeout).run, fn)}
+    delay = tracker.hedge_delay(stage) if hedge else None
+    hedged, error = False, None
+
+    while pending:
+        elapsed = time.monotonic() - start
+        wait_for = timeout - elapsed
+        if delay is not None and not hedged:
+            wait_for = min(wait_for, delay - elapsed)
+        done, pending = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            if future.exception() is None:
+                tracker.observe(stage, time.monotonic() - start)
+                return future.result()
+            error = future.exception()
+
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            break
+        if delay is not None and not hedged and elapsed >= delay:
+            hedged = True
+            HEDGED_REQUESTS.inc(stage=stage)
+            pending.add(_executor.submit(_attempt_context(stage, start + timeout).run, fn))
+        elif not pending and error is not None:
+            raise error
+
+    if error is not None and not pending:
+        raise error
+    STAGE_TIMEOUTS.inc(stage=stage)
+    raise StageTimeout(stage, timeout)
+
+
+def degraded_result(docs, stage: str) -> dict:
+    """Sources without a generated answer, for a request that ran out of time."""
+    DEGRADED.inc(stage=stage)
+    return {"answer": DEGRADED_ANSWER, "source_documents": docs, "degraded": True}
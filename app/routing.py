@@ -0,0 +1,130 @@
+"""
+Model routing: a fast model tier for simple work, the strong tier only when needed.
+
+Questions and digest chunks are classified with cheap heuristics (no model call):
+- questions: short factual lookups ("How many...", "When was...", "Who is...") go to the fast
+  tier; explanation/comparison questions, multi-part or long questions and large contexts go
+  to the strong tier; anything else starts on the fast tier.
+- digest chunks: long chunks, PDF pages and number-dense text (tables, reports) go to the
+  strong tier.
+A fast-tier result is escalated to the strong tier when it is unusable: an answer that gives up
+although context was retrieved, or a digest that fails or comes back with too few key facts.
+
+Tiers are configured with RAG_FAST_MODEL / RAG_STRONG_MODEL. Every decision is counted in
+rag_route_decisions_total{target,tier,reason}, escalations in rag_escalations_total and
+model latency per tier in rag_llm_tier_duration_seconds.
+"""
+
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from app.metrics import ESCALATIONS, ROUTE_DECISIONS, TIER_SECONDS
+
+FAST_MODEL = os.getenv("RAG_FAST_MODEL", "gpt-4o-mini")
+STRONG_MODEL = os.getenv("RAG_STRONG_MODEL", "gpt-4o")
+ROUTING_ENABLED = os.getenv("RAG_ROUTING", "0") == "1"
+
+FAST, STRONG = "fast", "strong"
+
+LOOKUP_PATTERN = re.compile(
+    r"^\s*(how (many|much|long|old)|when|who|whom|where|which|in (which|what) year|what year|"
+    r"what is the (name|number|address|email)|is|are|does|did|do)\b",
+    re.IGNORECASE,
+)
+REASONING_PATTERN = re.compile(
+    r"\b(why|explain|describe|compare|comparison|differen\w*|contribut\w*|impact|strateg\w*|analy\w*|"
+    r"evaluate|recommend\w*|should|pros|cons|advantages?|trade-?offs?|how (does|do|can|could|would))\b",
+    re.IGNORECASE,
+)
+UNCERTAIN_PATTERN = re.compile(
+    r"\b(i don't know|i do not know|not sure|cannot (determine|find)|can't (determine|find)|"
+    r"(does|do) not (provide|mention|contain|specify)|no information)\b",
+    re.IGNORECASE,
+)
+NUMBER_PATTERN = re.compile(r"\d")
+
+MAX_FAST_QUESTION_WORDS = 20
+MAX_FAST_CONTEXT_TOKENS = 3000
+MAX_FAST_CHUNK_TOKENS = 350
+MAX_FAST_DIGIT_RATIO = 0.08
+MIN_KEY_FACTS = 3
+CHARS_PER_TOKEN = 4  # estimate; routing must be cheaper than a tokenizer pass
+
+
+def route_question(question: str, context: str = "") -> tuple[str, str]:
+    """(tier, reason) for answering `question` over the retrieved `context`."""
+    if REASONING_PATTERN.search(question):
+        return STRONG, "reasoning"
+    if question.count("?") > 1 or len(question.split()) > MAX_FAST_QUESTION_WORDS:
+        return STRONG, "complex_question"
+    if len(context) / CHARS_PER_TOKEN > MAX_FAST_CONTEXT_TOKENS:
+        return STRONG, "long_context"
+    if LOOKUP_PATTERN.search(question):
+        return FAST, "lookup"
+    return FAST, "default"
+
+
+def route_chunk(text: str, source_type: str = "html") -> tuple[str, str]:
+    """(tier, reason) for digesting one chunk."""
+    if len(text) / CHARS_PER_TOKEN > MAX_FAST_CHUNK_TOKENS:
+        return STRONG, "long_chunk"
+    if source_type == "pdf":
+        return STRONG, "pdf"
+    if text and len(NUMBER_PATTERN.findall(text)) / len(text) > MAX_FAST_DIGIT_RATIO:
+        return STRONG, "number_dense"
+    return FAST, "simple_chunk"
+
+
+def answer_needs_escalation(answer: str, docs) -> bool:
+    """A fast-tier answer that gives up although context was retrieved."""
+    return bool(docs) and bool(UNCERTAIN_PATTERN.search(answer))
+
+
+def digest_needs_escalation(digest) -> bool:
+    return digest is None or len(digest.key_facts) < MIN_KEY_FACTS or not digest.summary.strip()
+
+
+def record_route(target: str, tier: str, reason: str):
+    ROUTE_DECISIONS.inc(target=target, tier=tier, reason=reason)
+
+
+def record_escalation(target: str):
+    ESCALATIONS.inc(target=target)
+
+
+@contextmanager
+def tier_timer(target: str, tier: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        TIER_SECONDS.observe(time.perf_counter() - start, target=target, tier=tier)
+
+
+def create_routed_digester(fast_chain, strong_chain):
+    """
+    Runnable-like digester: `invoke(inputs)` routes the chunk, runs the chosen tier and
+    escalates a failed or thin fast-tier digest to the strong tier.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    def digest(inputs: dict):
+        tier, reason = route_chunk(inputs["content"], inputs.get("source_type", "html"))
+        record_route("digest", tier, reason)
+        if tier == FAST:
+            result = None
+            try:
+                with tier_timer("digest", FAST):
+                    result = fast_chain.invoke(inputs)
+            except Exception as e:
+                logging.warning(f"Fast-tier digest failed, escalating: {e}")
+            if not digest_needs_escalation(result):
+                return result
+            record_escalation("digest")
+        with tier_timer("digest", STRONG):
+            return strong_chain.invoke(inputs)
+
+    return RunnableLambda(digest)
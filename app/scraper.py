@@ -4,13 +4,16 @@ import os
 import logging
 import re
 import requests
-from collections import deque
 from urllib.parse import urlparse, urljoin
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Comment
+
+from app.frontier import CrawlFrontier, canonicalize_url, default_priority, find_canonical, read_sitemaps
 
 try:
     import fitz  # PyMuPDF
@@ -22,20 +25,67 @@ except ImportError:
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+CRAWL_STATE_FILE = "crawl_state.json"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Lean rendering: only the DOM text is extracted, so media, fonts, styles and third-party
+# scripts are blocked through the DevTools protocol (Network.setBlockedURLs patterns)
+PAGE_LOAD_TIMEOUT = 10
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.css",
+    "*.mp4", "*.webm", "*.mov", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*",
+    "*hotjar.com*", "*licdn.com*", "*linkedin.com/px*", "*hs-scripts.com*", "*hs-analytics.net*",
+    "*hubspot.com*", "*cookiebot.com*", "*clarity.ms*", "*youtube.com*", "*vimeo.com*",
+]
+# The DOM is usable once parsing is done and the main content (or enough body text) exists
+READY_SCRIPT = ("return document.readyState !== 'loading' && !!(document.querySelector('main, article') "
+                "|| (document.body && document.body.innerText.length > 100));")
+# Bytes on the wire come from the DevTools Network.loadingFinished events in Chrome's performance
+# log; Resource Timing reports transferSize 0 for cross-origin responses without Timing-Allow-Origin
+PERFORMANCE_LOG_PREFS = {"performance": "ALL"}
+
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+BLOCK_TAGS = {'p', 'li', 'div', 'section', 'article', 'main', 'aside', 'blockquote', 'pre',
+              'td', 'th', 'dd', 'dt', 'figcaption', 'summary'}
+
+
+def transferred_bytes(log_entries) -> int:
+    """Sum of `encodedDataLength` over the Network.loadingFinished events in performance log entries."""
+    total = 0
+    for entry in log_entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        if message.get("method") == "Network.loadingFinished":
+            total += int(message.get("params", {}).get("encodedDataLength") or 0)
+    return total
+
 
 class NortalScraper:
     def __init__(self, start_url="https://nortal.com/", max_pages=10, max_depth=2, 
-                 output_dir="data", pdf_output_dir="data/scraped_pdfs", scrape_pdfs=True):
+                 output_dir="data", pdf_output_dir="data/scraped_pdfs", scrape_pdfs=True,
+                 use_sitemap=True, priority=default_priority, lean=False, blocked_url_patterns=BLOCKED_URL_PATTERNS):
         self.start_url = start_url
         self.max_pages = max_pages
         self.max_depth = max_depth
         self.output_dir = output_dir
         self.pdf_output_dir = pdf_output_dir
         self.scrape_pdfs = scrape_pdfs and PDF_SUPPORT
-        self.visited = set()
-        self.queue = deque([(start_url, 0)])  # (url, depth)
+        self.use_sitemap = use_sitemap
+        self.lean = lean
+        self.blocked_url_patterns = blocked_url_patterns
+        self.domain = urlparse(canonicalize_url(start_url)).netloc
+        self.visited = set()  # canonical URLs fetched (or carried over) in this crawl
+        self.frontier = CrawlFrontier(priority)
+        self.frontier.push(start_url, 0)
         self.data = []
         self.pdf_urls = set()  # Track discovered PDF URLs
+        self.lastmod = {}  # canonical URL -> sitemap lastmod, saved for the next crawl
+        self.unchanged = 0
+        self.fetch_stats = []  # per page: url, seconds, bytes transferred
         
         self.driver = None
 
@@ -45,6 +95,8 @@ class NortalScraper:
             logging.info(f"Connecting to remote Selenium at {selenium_url}")
             options = Options()
             options.add_argument("--headless")
+            options.set_capability("goog:loggingPrefs", PERFORMANCE_LOG_PREFS)
+            self._apply_lean_options(options)
             self.driver = webdriver.Remote(
                 command_executor=selenium_url,
                 options=options
@@ -56,6 +108,8 @@ class NortalScraper:
             chrome_options.add_argument("--no-sandbox")
             chrome_options.add_argument("--disable-dev-shm-usage")
             chrome_options.add_argument("--disable-gpu")
+            chrome_options.set_capability("goog:loggingPrefs", PERFORMANCE_LOG_PREFS)
+            self._apply_lean_options(chrome_options)
             
             # Use native Selenium Manager (cleaner and more robust)
             try:
@@ -64,10 +118,55 @@ class NortalScraper:
                 logging.error(f"Failed to initialize local driver: {e}")
                 raise
 
+        if self.lean:
+            self._block_resources()
+
+    def _apply_lean_options(self, options):
+        """Eager page loads (don't wait for subresources) and no image decoding."""
+        if self.lean:
+            options.page_load_strategy = "eager"
+            options.add_argument("--blink-settings=imagesEnabled=false")
+
+    def _block_resources(self):
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_url_patterns})
+        except Exception as e:
+            # Remote drivers don't expose CDP; eager loading and disabled images still apply
+            logging.warning(f"Could not block resources via DevTools: {e}")
+
+    def fetch_page(self, url):
+        """Load `url` and return the rendered HTML, recording fetch time and bytes transferred."""
+        self._performance_log()  # drop events of earlier pages, e.g. late loads after an eager fetch
+        start = time.perf_counter()
+        self.driver.get(url)
+        if self.lean:
+            try:
+                WebDriverWait(self.driver, PAGE_LOAD_TIMEOUT, poll_frequency=0.1).until(
+                    lambda driver: driver.execute_script(READY_SCRIPT))
+            except TimeoutException:
+                logging.warning(f"Content not ready after {PAGE_LOAD_TIMEOUT}s, using what has rendered: {url}")
+        else:
+            time.sleep(2) # Basic wait
+        page_source = self.driver.page_source
+        seconds = time.perf_counter() - start
+
+        transferred = transferred_bytes(self._performance_log())
+        self.fetch_stats.append({"url": url, "seconds": round(seconds, 3), "bytes": transferred})
+        logging.info(f"Fetched {url} in {seconds:.2f}s ({transferred / 1024:.0f} KB transferred)")
+        return page_source
+
+    def _performance_log(self) -> list:
+        """Performance log entries since the last call; empty where the driver has no such log."""
+        try:
+            return self.driver.get_log("performance")
+        except Exception:
+            return []
+
     def is_valid_url(self, url):
-        """Check if URL is a valid nortal.com URL."""
+        """Check if URL is on the crawled site (nortal.com by default)."""
         parsed = urlparse(url)
-        return parsed.netloc == "nortal.com" and "#" not in url
+        return parsed.netloc == self.domain and "#" not in url
 
     def is_html_url(self, url):
         """Check if URL is an HTML page (not a binary asset)."""
@@ -89,6 +188,14 @@ class NortalScraper:
         """
         Extract content focusing on the 'main' content areas to avoid header/footer/nav.
         """
+        content, _ = self.extract_structured(soup)
+        return content
+
+    def extract_structured(self, soup):
+        """
+        Like extract_content, but also returns the page as a list of heading/paragraph blocks.
+        `content` is the blocks' text joined with spaces, so the two stay word-for-word aligned.
+        """
         # Remove common non-content elements
         for element in soup(['script', 'style', 'nav', 'footer', 'header', 'noscript', 'iframe', 'form', 'button', 'input', 'select', 'textarea']):
             element.decompose()
@@ -100,14 +207,88 @@ class NortalScraper:
         # Try to find the main content article or div
         # Setup specific selectors usually found in modern WP/CMS sites
         main_content = soup.find('main') or soup.find('article') or soup.find('div', class_=re.compile(r'content|main|post'))
-        
-        if main_content:
-            text = main_content.get_text(separator=' ')
-        else:
-            # Fallback to body if no main found
-            text = soup.body.get_text(separator=' ') if soup.body else ""
-            
-        return self.clean_text(text)
+
+        # Fallback to body if no main found
+        root = main_content or soup.body
+        if root is None:
+            return "", []
+
+        blocks = self.extract_blocks(root)
+        return ' '.join(b["text"] for b in blocks), blocks
+
+    def extract_blocks(self, root):
+        """
+        Group text nodes by their nearest heading or block-level ancestor.
+        Returns [{"type": "heading", "level": 2, "text": ...} | {"type": "paragraph", "text": ...}].
+        """
+        blocks = []
+        current, parts = None, []
+
+        def flush():
+            text = self.clean_text(' '.join(parts))
+            if text:
+                if current.name in HEADING_TAGS:
+                    blocks.append({"type": "heading", "level": int(current.name[1]), "text": text})
+                else:
+                    blocks.append({"type": "paragraph", "text": text})
+
+        for node in root.find_all(string=True):
+            if isinstance(node, Comment) or not node.strip():
+                continue
+            parent = node.parent
+            while parent is not root and parent.name not in HEADING_TAGS and parent.name not in BLOCK_TAGS:
+                parent = parent.parent
+            if parent is not current:
+                if current is not None:
+                    flush()
+                current, parts = parent, []
+            parts.append(node)
+
+        if current is not None:
+            flush()
+        return blocks
+
+    def fetch_text(self, url):
+        """GET a small text resource (robots.txt, sitemaps) without the browser."""
+        try:
+            response = requests.get(url, timeout=15, headers={'User-Agent': USER_AGENT})
+            return response.text if response.ok else None
+        except requests.RequestException as e:
+            logging.warning(f"Could not fetch {url}: {e}")
+            return None
+
+    def load_previous_crawl(self):
+        """Entries and sitemap lastmods from the previous crawl in output_dir, by canonical URL."""
+        entries, lastmod = {}, {}
+        data_path = os.path.join(self.output_dir, "scraped_data.json")
+        state_path = os.path.join(self.output_dir, CRAWL_STATE_FILE)
+        if os.path.exists(data_path) and os.path.exists(state_path):
+            with open(data_path, 'r', encoding='utf-8') as f:
+                entries = {canonicalize_url(e["url"]): e for e in json.load(f)}
+            with open(state_path, 'r', encoding='utf-8') as f:
+                lastmod = json.load(f).get("lastmod", {})
+        return entries, lastmod
+
+    def seed_from_sitemap(self):
+        """
+        Enqueue sitemap pages. A page whose lastmod matches the previous crawl is carried over
+        from the previous scraped_data.json instead of being fetched again.
+        """
+        previous, previous_lastmod = self.load_previous_crawl()
+        for url, lastmod in read_sitemaps(self.start_url, self.fetch_text):
+            canonical = canonicalize_url(url)
+            if not self.is_valid_url(canonical) or canonical in self.frontier.seen:
+                continue
+            if lastmod:
+                self.lastmod[canonical] = lastmod
+            if lastmod and previous_lastmod.get(canonical) == lastmod and canonical in previous:
+                self.data.append(previous[canonical])
+                self.frontier.mark_seen(canonical)
+                self.visited.add(canonical)
+                self.unchanged += 1
+                continue
+            self.frontier.push(canonical, 1, lastmod)
+        logging.info(f"Sitemap seeding: {len(self.frontier)} pages queued, {self.unchanged} unchanged since last crawl")
 
     def download_pdf(self, url):
         """
@@ -136,9 +317,7 @@ class NortalScraper:
                 return pdf_path
             
             logging.info(f"Downloading PDF: {url}")
-            response = requests.get(url, timeout=30, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
+            response = requests.get(url, timeout=30, headers={'User-Agent': USER_AGENT})
             response.raise_for_status()
             
             # Verify it's actually a PDF
@@ -164,8 +343,18 @@ class NortalScraper:
         Returns:
             tuple: (title, content) extracted from the PDF.
         """
+        title, content, _ = self.extract_pdf_structured(pdf_path)
+        return title, content
+
+    def extract_pdf_structured(self, pdf_path):
+        """
+        Extract text from a PDF as paragraph blocks tagged with their 1-based page number.
+
+        Returns:
+            tuple: (title, content, blocks).
+        """
         if not PDF_SUPPORT:
-            return None, ""
+            return None, "", []
         
         try:
             doc = fitz.open(pdf_path)
@@ -177,36 +366,36 @@ class NortalScraper:
                 title = os.path.splitext(os.path.basename(pdf_path))[0]
                 title = title.replace('_', ' ').replace('-', ' ').title()
             
-            # Extract text from all pages
-            text_parts = []
-            for page in doc:
-                text = page.get_text()
-                if text:
-                    text_parts.append(text)
+            # Extract text blocks from all pages (block_type 0 is text, 1 is image)
+            blocks = []
+            for page_number, page in enumerate(doc, start=1):
+                for block in page.get_text("blocks"):
+                    text = self.clean_text(block[4])
+                    if text and block[6] == 0:
+                        blocks.append({"type": "paragraph", "text": text, "page": page_number})
             
             doc.close()
             
-            content = self.clean_text(' '.join(text_parts))
-            return title, content
+            content = ' '.join(b["text"] for b in blocks)
+            return title, content, blocks
             
         except Exception as e:
             logging.error(f"Failed to extract content from PDF {pdf_path}: {e}")
-            return None, ""
+            return None, "", []
 
     def scrape(self):
         if not self.driver:
             self._init_driver()
+
+        if self.use_sitemap:
+            self.seed_from_sitemap()
             
         try:
             pages_scraped = 0
-            while self.queue and pages_scraped < self.max_pages:
-                current_url, depth = self.queue.popleft()
-                
-                # Normalize URL (strip trailing slash for HTML pages)
-                if not self.is_pdf_url(current_url):
-                    current_url = current_url.rstrip('/')
-                
-                if current_url in self.visited:
+            while self.frontier and pages_scraped < self.max_pages:
+                # URLs come out canonicalized and unique, highest priority first
+                current_url, depth = self.frontier.pop()
+                if current_url in self.visited:  # stored earlier under a rel=canonical alias
                     continue
                 
                 # Check depth early
@@ -228,13 +417,21 @@ class NortalScraper:
                 logging.info(f"Scraping: {current_url} (Depth: {depth})")
                 
                 try:
-                    self.driver.get(current_url)
-                    time.sleep(2) # Basic wait
-                    
-                    page_source = self.driver.page_source
+                    page_source = self.fetch_page(current_url)
                     soup = BeautifulSoup(page_source, 'html.parser')
                     
-                    content = self.extract_content(soup)
+                    # Honor rel=canonical: store the page under its canonical URL, once
+                    canonical = find_canonical(soup, current_url)
+                    if canonical and canonicalize_url(canonical) != current_url:
+                        canonical = canonicalize_url(canonical)
+                        self.visited.add(current_url)
+                        if canonical in self.visited:
+                            logging.info(f"Skipping {current_url}: duplicate of {canonical}")
+                            continue
+                        self.frontier.mark_seen(canonical)
+                        current_url = canonical
+
+                    content, blocks = self.extract_structured(soup)
                     title = soup.title.string.strip() if soup.title else current_url
                     
                     # Only save if we found substantial content
@@ -243,7 +440,8 @@ class NortalScraper:
                             "url": current_url,
                             "title": title,
                             "content": content,
-                            "source_type": "html"
+                            "source_type": "html",
+                            "blocks": blocks
                         })
                         pages_scraped += 1
                     else:
@@ -255,20 +453,12 @@ class NortalScraper:
                     if depth < self.max_depth:
                         links_found = 0
                         for link in soup.find_all('a', href=True):
-                            href = link['href']
-                            full_url = urljoin(current_url, href)
-                            
-                            # Handle PDF links differently
-                            if self.is_pdf_url(full_url):
-                                full_url_normalized = full_url  # Don't strip trailing slash for PDFs
-                            else:
-                                full_url_normalized = full_url.rstrip('/')
+                            full_url = canonicalize_url(urljoin(current_url, link['href']))
                             
-                            if self.is_valid_url(full_url_normalized) and full_url_normalized not in self.visited:
+                            if self.is_valid_url(full_url) and self.frontier.push(full_url, depth + 1):
                                 # Add PDF URLs to a separate set for tracking
-                                if self.is_pdf_url(full_url_normalized):
-                                    self.pdf_urls.add(full_url_normalized)
-                                self.queue.append((full_url_normalized, depth + 1))
+                                if self.is_pdf_url(full_url):
+                                    self.pdf_urls.add(full_url)
                                 links_found += 1
                         logging.info(f"Found {links_found} new links on {current_url}")
                                 
@@ -293,14 +483,15 @@ class NortalScraper:
         if not pdf_path:
             return
         
-        title, content = self.extract_pdf_content(pdf_path)
+        title, content, blocks = self.extract_pdf_structured(pdf_path)
         
         if content and len(content) > 100:
             self.data.append({
                 "url": url,
                 "title": title or os.path.basename(pdf_path),
                 "content": content,
-                "source_type": "pdf"
+                "source_type": "pdf",
+                "blocks": blocks
             })
             logging.info(f"Successfully extracted content from PDF: {title}")
         else:
@@ -311,15 +502,31 @@ class NortalScraper:
         output_path = os.path.join(self.output_dir, "scraped_data.json")
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(self.data, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(self.output_dir, CRAWL_STATE_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"lastmod": self.lastmod, "fetch_stats": self.fetch_stats}, f, indent=2)
         
         # Count by source type
         html_count = sum(1 for d in self.data if d.get('source_type') == 'html')
         pdf_count = sum(1 for d in self.data if d.get('source_type') == 'pdf')
         
-        logging.info(f"Scraping complete. Saved {len(self.data)} items ({html_count} HTML, {pdf_count} PDF) to {output_path}")
+        if self.fetch_stats:
+            seconds = sum(s["seconds"] for s in self.fetch_stats)
+            transferred = sum(s["bytes"] for s in self.fetch_stats)
+            logging.info(f"Fetched {len(self.fetch_stats)} pages ({'lean' if self.lean else 'full'} rendering): "
+                         f"{seconds / len(self.fetch_stats):.2f}s and {transferred / len(self.fetch_stats) / 1024:.0f} KB per page")
+        logging.info(f"Scraping complete. Saved {len(self.data)} items ({html_count} HTML, {pdf_count} PDF, "
+                     f"{self.unchanged} unchanged since last crawl) to {output_path}")
 
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Crawl nortal.com into data/scraped_data.json.")
+    parser.add_argument("--max-pages", type=int, default=50)
+    parser.add_argument("--max-depth", type=int, default=2)
+    parser.add_argument("--lean", action="store_true",
+                        help="Eager page loads, no images/fonts/trackers, readiness wait instead of a fixed sleep")
+    args = parser.parse_args()
+
     # Production run with more comprehensive scraping
-    scraper = NortalScraper(max_pages=50, max_depth=2)
+    scraper = NortalScraper(max_pages=args.max_pages, max_depth=args.max_depth, lean=args.lean)
     scraper.scrape()
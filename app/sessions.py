@@ -0,0 +1,255 @@
+"""
+Server-side conversation memory for /chat and the Streamlit UI.
+
+- Session stores with TTL eviction: in-process (default) or Redis when REDIS_URL is set
+  and the `redis` package is installed.
+- Follow-up questions ("and in healthcare?") are rewritten into standalone questions from the
+  recent turns before retrieval, so retrieval and the answer prompt see a self-contained query.
+- History is token-bounded: once the summary plus the turns older than the last `keep_turns`
+  exceed `max_history_tokens`, those turns are folded into a running summary, so the rewrite
+  prompt stays the same size however long the conversation runs. The summary call runs on a
+  background thread after the turn is saved, never on the /chat request path.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.metrics import timed
+from app.resilience import call_with_deadline
+
+try:
+    import redis
+    REDIS_SUPPORT = True
+except ImportError:
+    REDIS_SUPPORT = False
+
+SESSION_TTL_SECONDS = int(os.getenv("RAG_SESSION_TTL", "3600"))
+MAX_SESSIONS = 10000
+MAX_HISTORY_TOKENS = 600
+KEEP_TURNS = 4  # most recent messages (2 exchanges) are never summarized
+MAX_SUMMARY_WORDS = 120
+
+REWRITE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Rewrite the user's latest question as a standalone question about Nortal, using the conversation only to resolve references.
+Return the question only. If it is already standalone, return it unchanged."""),
+    ("user", "Conversation summary: {summary}\n\nRecent turns:\n{turns}\n\nLatest question: {question}")
+])
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", f"Update the running summary of a conversation about Nortal with the new turns. "
+               f"Keep names, sectors and facts the user asked about. At most {MAX_SUMMARY_WORDS} words."),
+    ("user", "Current summary: {summary}\n\nNew turns:\n{turns}")
+])
+
+
+def new_session() -> dict:
+    return {"summary": "", "turns": []}
+
+
+class MemorySessionStore:
+    """In-process session store with sliding TTL and an LRU cap. Local stand-in for Redis."""
+
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS, max_sessions: int = MAX_SESSIONS, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions = OrderedDict()  # id -> (expires_at, session)
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        expired = [sid for sid, (expires_at, _) in self._sessions.items() if expires_at <= now]
+        for sid in expired:
+            del self._sessions[sid]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> dict | None:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] <= self.clock():
+                self._sessions.pop(session_id, None)
+                return None
+            return json.loads(json.dumps(entry[1]))
+
+    def save(self, session_id: str, session: dict):
+        with self._lock:
+            now = self.clock()
+            self._sessions[session_id] = (now + self.ttl_seconds, json.loads(json.dumps(session)))
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            self._evict(self.clock())
+            return len(self._sessions)
+
+
+class RedisSessionStore:
+    """Sessions as JSON strings in Redis; expiry is handled by Redis (SETEX)."""
+
+    def __init__(self, url: str, ttl_seconds: int = SESSION_TTL_SECONDS, prefix: str = "rag:session:"):
+        if not REDIS_SUPPORT:
+            raise RuntimeError("RedisSessionStore requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, session_id: str) -> dict | None:
+        raw = self.client.get(self.prefix + session_id)
+        return json.loads(raw) if raw else None
+
+    def save(self, session_id: str, session: dict):
+        self.client.setex(self.prefix + session_id, self.ttl_seconds, json.dumps(session, ensure_ascii=False))
+
+    def delete(self, session_id: str):
+        self.client.delete(self.prefix + session_id)
+
+
+def create_session_store():
+    """Redis if REDIS_URL is set (and redis is installed), otherwise the in-process store."""
+    url = os.getenv("REDIS_URL")
+    if url and REDIS_SUPPORT:
+        return RedisSessionStore(url)
+    if url:
+        print("REDIS_URL is set but the 'redis' package is not installed; using in-process sessions.")
+    return MemorySessionStore()
+
+
+def format_turns(turns: list[dict]) -> str:
+    return "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+
+
+class ConversationMemory:
+    """Query rewriting and token-bounded history on top of a session store."""
+
+    def __init__(self, store, llm=None, count_tokens=None, max_history_tokens: int = MAX_HISTORY_TOKENS,
+                 keep_turns: int = KEEP_TURNS, background: bool = True):
+        if llm is None:
+            from app.clients import make_chat_model
+            llm = make_chat_model(os.getenv("RAG_REWRITE_MODEL", "gpt-4o-mini"), temperature=0, max_retries=0)
+        if count_tokens is None:
+            from app.digester import count_tokens
+        self.store = store
+        self.llm = llm
+        self.count_tokens = count_tokens
+        self.max_history_tokens = max_history_tokens
+        self.keep_turns = keep_turns
+        self.background = background
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compact")
+        self._pending = set()  # session ids with a compaction queued or running
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> dict:
+        return self.store.get(session_id) or new_session()
+
+    def rewrite(self, question: str, session: dict) -> str:
+        """Standalone form of `question`. The first question of a session is used as-is."""
+        if not session["turns"] and not session["summary"]:
+            return question
+        with timed("rewrite"):
+            messages = REWRITE_PROMPT.format_messages(
+                summary=session["summary"] or "(none)", turns=format_turns(session["turns"]), question=question
+            )
+            try:
+                return call_with_deadline(lambda: self.llm.invoke(messages), "rewrite").content.strip() or question
+            except Exception as e:
+                # Slow or failing rewrite: retrieve with the question as asked
+                logging.warning(f"Query rewrite failed, using the question as asked: {e!r}")
+                return question
+
+    def history_tokens(self, session: dict) -> int:
+        return self.count_tokens(session["summary"]) + sum(self.count_tokens(t["content"]) for t in session["turns"])
+
+    def needs_compaction(self, session: dict) -> bool:
+        """Only the summary and the turns that would be folded count; the kept recent turns never shrink."""
+        old = session["turns"][:-self.keep_turns] if self.keep_turns else session["turns"]
+        if not old:
+            return False
+        return self.count_tokens(session["summary"]) + sum(self.count_tokens(t["content"]) for t in old) > self.max_history_tokens
+
+    def compact(self, session: dict) -> dict:
+        """Fold the turns before the last `keep_turns` into the summary once they exceed the token budget."""
+        if not self.needs_compaction(session):
+            return session
+        with timed("compact"):
+            split = len(session["turns"]) - self.keep_turns
+            old, recent = session["turns"][:split], session["turns"][split:]
+            messages = SUMMARY_PROMPT.format_messages(summary=session["summary"] or "(none)", turns=format_turns(old))
+            try:
+                summary = call_with_deadline(lambda: self.llm.invoke(messages), "rewrite").content.strip()
+            except Exception as e:
+                logging.warning(f"History compaction failed, keeping the full history: {e!r}")
+                return session  # compact on a later turn instead
+            # Hard cap in case the model ignores the length instruction
+            summary = " ".join(summary.split()[:MAX_SUMMARY_WORDS])
+        return {"summary": summary, "turns": recent}
+
+    def append(self, session_id: str, session: dict, question: str, answer: str):
+        session = {**session, "turns": session["turns"] + [
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": answer},
+        ]}
+        if not self.background:
+            self.store.save(session_id, self.compact(session))
+            return
+        self.store.save(session_id, session)
+        if self.needs_compaction(session):
+            with self._lock:
+                if session_id in self._pending:
+                    return
+                self._pending.add(session_id)
+            self._executor.submit(self._compact_stored, session_id)
+
+    def _compact_stored(self, session_id: str):
+        """Compact the stored session, keeping any turns appended while the summary was generated."""
+        try:
+            session = self.store.get(session_id)
+            if session is None:
+                return
+            compacted = self.compact(session)
+            if compacted is session:
+                return
+            latest = self.store.get(session_id)
+            if latest is None or latest["summary"] != session["summary"] \
+                    or latest["turns"][:len(session["turns"])] != session["turns"]:
+                return  # rewritten meanwhile; compact on a later turn instead
+            folded = len(session["turns"]) - len(compacted["turns"])
+            self.store.save(session_id, {"summary": compacted["summary"], "turns": latest["turns"][folded:]})
+        except Exception as e:
+            logging.warning(f"Background compaction of session {session_id} failed: {e!r}")
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
+
+    def wait(self):
+        """Block until queued compactions have finished (tests, shutdown)."""
+        self._executor.submit(lambda: None).result()
+
+
+def conversational(qa_func, memory: ConversationMemory):
+    """
+    Wrap a qa_with_sources function with session memory. The returned function takes
+    (question, session_id=None, filters=None); a new session id is created when none is given.
+    """
+    def chat(question: str, session_id: str | None = None, filters: dict | None = None) -> dict:
+        session_id = session_id or uuid.uuid4().hex
+        session = memory.load(session_id)
+        standalone = memory.rewrite(question, session)
+        result = qa_func(standalone, filters) if filters else qa_func(standalone)
+        memory.append(session_id, session, question, result["answer"])
+        return {**result, "session_id": session_id, "standalone_question": standalone}
+
+    chat.data_source = getattr(qa_func, "data_source", None)
+    return chat
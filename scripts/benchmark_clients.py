@@ -0,0 +1,114 @@
+"""
+Benchmark of the RAG client path against the local OpenAI stub (scripts/stub_openai.py).
+
+Replays a skewed stream of questions (a few popular questions asked often, as in production)
+through query embedding + chat completion, once with default per-instance clients and no query
+cache, once with the shared connection pool and the query-embedding LRU. Reports embedding
+round-trips, TCP connections opened and per-request latency.
+
+Usage:
+    python -m scripts.benchmark_clients --requests 300 --workers 8 --latency 0.02
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from app.clients import make_chat_model, make_embeddings
+from app.embeddings import CachedQueryEmbeddings
+from app.metrics import percentile
+from scripts.benchmark_retrieval import QUESTION_FILES, load_questions
+from scripts.stub_openai import run_in_thread
+
+
+def question_stream(questions: list[str], n: int, seed: int = 0) -> list[str]:
+    """Zipf-like sample: the i-th question is drawn with weight 1 / (i + 1)."""
+    rng = random.Random(seed)
+    return rng.choices(questions, weights=[1 / (i + 1) for i in range(len(questions))], k=n)
+
+
+def run_variant(name, embeddings, llm, stream, base_url, workers) -> dict:
+    admin = base_url.rsplit("/v1", 1)[0]
+    httpx.post(f"{admin}/reset")
+
+    def ask(question):
+        start = time.perf_counter()
+        embeddings.embed_query(question)
+        llm.invoke(question)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(ask, stream))
+    elapsed = time.perf_counter() - start
+
+    stats = httpx.get(f"{admin}/stats").json()
+    latencies_ms = [l * 1000 for l in latencies]
+    return {
+        "variant": name,
+        "requests": len(stream),
+        "embedding_calls": stats["requests"].get("/v1/embeddings", 0),
+        "chat_calls": stats["requests"].get("/v1/chat/completions", 0),
+        "connections": stats["connections"],
+        "latency_ms": {"p50": round(percentile(latencies_ms, 50), 2), "p95": round(percentile(latencies_ms, 95), 2)},
+        "throughput_rps": round(len(stream) / elapsed, 1),
+    }
+
+
+def run_benchmark(num_requests=300, workers=8, latency=0.02, port=8765, cache_size=1024):
+    server, base_url = run_in_thread(port, latency)
+    try:
+        questions = [q["question"] for q in load_questions(QUESTION_FILES)]
+        stream = question_stream(questions, num_requests)
+        common = {"base_url": base_url, "api_key": "stub"}
+
+        baseline = run_variant(
+            "default clients, no query cache",
+            OpenAIEmbeddings(check_embedding_ctx_length=False, **common),
+            ChatOpenAI(model="gpt-4o", temperature=0, **common),
+            stream, base_url, workers,
+        )
+        tuned = run_variant(
+            "shared pool + query LRU",
+            CachedQueryEmbeddings(make_embeddings(check_embedding_ctx_length=False, **common), cache_size),
+            make_chat_model("gpt-4o", temperature=0, **common),
+            stream, base_url, workers,
+        )
+    finally:
+        server.should_exit = True
+
+    return {"latency_s": latency, "workers": workers, "unique_questions": len(set(stream)), "results": [baseline, tuned]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query-embedding cache and connection pooling.")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub round-trip latency in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    report = run_benchmark(args.requests, args.workers, args.latency, args.port)
+    print(f"{report['unique_questions']} unique questions, {args.requests} requests, {args.workers} workers")
+    print(f"{'Variant':<34} {'Embed calls':>11} {'Chat calls':>10} {'Conns':>6} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>7}")
+    for r in report["results"]:
+        print(f"{r['variant']:<34} {r['embedding_calls']:>11} {r['chat_calls']:>10} {r['connections']:>6} "
+              f"{r['latency_ms']['p50']:>8} {r['latency_ms']['p95']:>8} {r['throughput_rps']:>7}")
+
+    output = args.output or f"data/benchmarks/clients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved → {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Offline retrieval benchmark: recall@k, MRR and latency percentiles for the retrieval half only.
+Uses the labeled `relevant_urls` in data/*_questions.json and a deterministic local embedding
+model by default, so it runs in CI without network access.
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from langchain_chroma import Chroma
+
+from app.adaptive import ADAPTIVE_MAX_K, MIN_RELEVANCE, RELEVANCE_MARGIN, search_with_relevance, select_adaptive
+from app.embeddings import LocalHashEmbeddings
+from app.ingest import load_documents, split_documents
+from app.metrics import percentile
+
+QUESTION_FILES = ["data/factual_questions.json", "data/abstract_questions.json"]
+CHARS_PER_TOKEN = 4  # rough English average; keeps the benchmark tokenizer-free (offline)
+
+
+def load_questions(paths=QUESTION_FILES) -> list[dict]:
+    """Load labeled questions, tagging each with the dataset it came from."""
+    questions = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            dataset = os.path.splitext(os.path.basename(path))[0]
+            for item in json.load(f):
+                if item.get("relevant_urls"):
+                    questions.append({**item, "dataset": dataset})
+    return questions
+
+
+def score_ranking(retrieved_urls: list[str], relevant_urls: list[str]) -> dict:
+    """Recall, hit and reciprocal rank for one ranked list of retrieved chunk sources."""
+    relevant = set(relevant_urls)
+    found = relevant.intersection(retrieved_urls)
+    first_rank = next((i + 1 for i, url in enumerate(retrieved_urls) if url in relevant), None)
+    return {
+        "recall": len(found) / len(relevant) if relevant else 0.0,
+        "hit": 1.0 if found else 0.0,
+        "reciprocal_rank": 1.0 / first_rank if first_rank else 0.0,
+    }
+
+
+def build_index(documents, chunk_size: int, chunk_overlap: int, embeddings, collection_name: str):
+    """Chunk and embed documents into an ephemeral (in-memory) Chroma collection."""
+    chunks = split_documents(documents, chunk_size, chunk_overlap)
+    Chroma(collection_name=collection_name, embedding_function=embeddings).delete_collection()
+    vectorstore = Chroma.from_documents(chunks, embeddings, collection_name=collection_name)
+    return vectorstore, len(chunks)
+
+
+def run_queries(search, questions: list[dict], k: int, repeat: int = 1) -> dict:
+    """
+    Run every question through `search(question, k) -> list[Document]` and aggregate
+    quality and latency. Latencies are per query (embedding + vector search).
+    """
+    latencies, per_question = [], []
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        per_question = []
+        for q in questions:
+            start = time.perf_counter()
+            docs = search(q["question"], k)
+            latencies.append(time.perf_counter() - start)
+            scores = score_ranking([d.metadata.get("source", "") for d in docs], q["relevant_urls"])
+            per_question.append({
+                "question": q["question"], "dataset": q["dataset"], **scores,
+                "chunks": len(docs),
+                "context_tokens_est": sum(len(d.page_content) for d in docs) // CHARS_PER_TOKEN,
+            })
+    wall = time.perf_counter() - wall_start
+
+    def summarize(rows):
+        n = len(rows) or 1
+        return {
+            "recall_at_k": round(sum(r["recall"] for r in rows) / n, 4),
+            "hit_rate": round(sum(r["hit"] for r in rows) / n, 4),
+            "mrr": round(sum(r["reciprocal_rank"] for r in rows) / n, 4),
+            "mean_chunks": round(sum(r["chunks"] for r in rows) / n, 3),
+            "no_answer_rate": round(sum(1 for r in rows if not r["chunks"]) / n, 4),
+            "context_tokens_est": round(sum(r["context_tokens_est"] for r in rows) / n, 1),
+        }
+
+    datasets = sorted({r["dataset"] for r in per_question})
+    return {
+        **summarize(per_question),
+        "per_dataset": {d: summarize([r for r in per_question if r["dataset"] == d]) for d in datasets},
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        },
+        "qps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "questions": per_question,
+    }
+
+
+def vector_search(vectorstore):
+    return lambda question, k: vectorstore.similarity_search(question, k=k)
+
+
+def adaptive_search(vectorstore, embeddings, min_relevance=MIN_RELEVANCE, margin=RELEVANCE_MARGIN,
+                    max_k=ADAPTIVE_MAX_K):
+    """Adaptive-k retrieval as in get_qa_chain(adaptive=True); the k argument is ignored."""
+    def search(question, k):
+        scored = search_with_relevance(vectorstore, embeddings.embed_query(question), max_k)
+        return select_adaptive(scored, max_k=max_k, min_relevance=min_relevance, margin=margin)
+    return search
+
+
+def retrievers(vectorstore, embeddings, ks, adaptive=None):
+    """(name, k, search) for each fixed k, plus the adaptive retriever when `adaptive` settings are given."""
+    variants = [("similarity", k, vector_search(vectorstore)) for k in ks]
+    if adaptive is not None:
+        variants.append(("adaptive", adaptive["max_k"], adaptive_search(vectorstore, embeddings, **adaptive)))
+    return variants
+
+
+def report(label, retriever, k, stats):
+    print(f"{label} {retriever} k={k}: recall@k={stats['recall_at_k']:.3f} MRR={stats['mrr']:.3f} "
+          f"chunks={stats['mean_chunks']:.2f} ctx≈{stats['context_tokens_est']:.0f} tok "
+          f"no-answer={stats['no_answer_rate']:.2f} p95={stats['latency_ms']['p95']:.1f}ms QPS={stats['qps']:.1f}")
+
+
+def parse_configs(spec: str) -> list[tuple[int, int]]:
+    """Parse 'size:overlap,size:overlap' into chunking configurations."""
+    return [tuple(int(x) for x in part.split(":")) for part in spec.split(",") if part]
+
+
+def benchmark_persisted(persist_directory, ks, questions, embeddings, repeat=1, adaptive=None) -> list[dict]:
+    """Benchmark an already-built index (e.g. data/chroma_db) instead of building one."""
+    vectorstore = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+    results = []
+    for retriever, k, search in retrievers(vectorstore, embeddings, ks, adaptive):
+        stats = run_queries(search, questions, k, repeat)
+        results.append({"retriever": retriever, "index": persist_directory, "k": k, **stats})
+        report(persist_directory, retriever, k, stats)
+    return results
+
+
+def run_benchmark(json_path, configs, ks, questions, embeddings, repeat=1, adaptive=None) -> list[dict]:
+    documents = load_documents(json_path)
+    results = []
+    for chunk_size, chunk_overlap in configs:
+        build_start = time.perf_counter()
+        vectorstore, num_chunks = build_index(
+            documents, chunk_size, chunk_overlap, embeddings,
+            collection_name=f"bench-{chunk_size}-{chunk_overlap}"
+        )
+        build_seconds = time.perf_counter() - build_start
+        for retriever, k, search in retrievers(vectorstore, embeddings, ks, adaptive):
+            stats = run_queries(search, questions, k, repeat)
+            results.append({
+                "retriever": retriever,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "k": k,
+                "num_chunks": num_chunks,
+                "build_seconds": round(build_seconds, 3),
+                **stats,
+            })
+            report(f"chunk {chunk_size}/{chunk_overlap}", retriever, k, stats)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark (recall@k, MRR, latency).")
+    parser.add_argument("--json-path", default="data/scraped_data.json", help="Corpus to index")
+    parser.add_argument("--configs", default="1000:200,500:50,2000:400", help="Chunking configs as size:overlap,...")
+    parser.add_argument("--k", default="1,3,5", help="Comma-separated k values")
+    parser.add_argument("--questions", nargs="+", default=QUESTION_FILES)
+    parser.add_argument("--repeat", type=int, default=3, help="Repeat queries for stable latency percentiles")
+    parser.add_argument("--embeddings", choices=["local", "openai"], default="local")
+    parser.add_argument("--index", default=None,
+                        help="Benchmark an existing persisted index instead of building from --configs "
+                             "(use the embeddings it was built with)")
+    parser.add_argument("--adaptive", action="store_true", help="Also benchmark adaptive-k retrieval")
+    parser.add_argument("--min-relevance", type=float, default=MIN_RELEVANCE)
+    parser.add_argument("--relevance-margin", type=float, default=RELEVANCE_MARGIN)
+    parser.add_argument("--max-k", type=int, default=ADAPTIVE_MAX_K, help="Upper bound for adaptive k")
+    parser.add_argument("--output", default=None, help="Output JSON (default: data/benchmarks/retrieval_<timestamp>.json)")
+    args = parser.parse_args()
+
+    if args.embeddings == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings()
+    else:
+        embeddings = LocalHashEmbeddings()
+
+    questions = load_questions(args.questions)
+    started = datetime.now(timezone.utc)
+    ks = [int(k) for k in args.k.split(",")]
+    adaptive = None
+    if args.adaptive:
+        adaptive = {"min_relevance": args.min_relevance, "margin": args.relevance_margin, "max_k": args.max_k}
+    if args.index:
+        results = benchmark_persisted(args.index, ks, questions, embeddings, args.repeat, adaptive)
+    else:
+        results = run_benchmark(args.json_path, parse_configs(args.configs), ks, questions, embeddings,
+                                args.repeat, adaptive)
+
+    output = args.output or f"data/benchmarks/retrieval_{started.strftime('%Y%m%dT%H%M%SZ')}.json"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": started.isoformat(),
+            "json_path": args.json_path,
+            "embeddings": args.embeddings,
+            "num_questions": len(questions),
+            "repeat": args.repeat,
+            "adaptive": adaptive,
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark of lean vs full Selenium rendering against a local fixture site.
+
+Generates a small site (pages with links, large images, web fonts, a stylesheet and a slow
+"third-party" analytics script served from a second port), serves it on localhost, and crawls
+it once with full rendering (load event + fixed 2 s wait) and once with the lean profile
+(eager load, blocked resources, DOM readiness wait). Reports per-page fetch time and bytes
+transferred. Needs Chrome (or SELENIUM_URL) like the scraper itself.
+
+Usage:
+    python -m scripts.benchmark_scraper --pages 10 --asset-latency 0.05
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from app.metrics import percentile
+from app.scraper import BLOCKED_URL_PATTERNS, NortalScraper
+
+PAGE_TEMPLATE = """<html><head><title>Fixture page {i}</title>
+<link rel="stylesheet" href="/static/site.css">
+<script src="http://127.0.0.1:{tracker_port}/analytics.js"></script>
+</head><body>
+<nav><a href="/page-{prev}.html">Previous</a> <a href="/page-{next}.html">Next</a></nav>
+<main>
+  <h1>Fixture page {i}</h1>
+  <img src="/static/hero-{i}.jpg"><img src="/static/banner.png">
+  <p>{text}</p>
+  <ul>{links}</ul>
+</main>
+</body></html>"""
+
+
+def build_site(directory: str, pages: int, tracker_port: int, image_kb: int = 400):
+    """Write `pages` linked HTML pages plus heavy static assets into `directory`."""
+    static = os.path.join(directory, "static")
+    os.makedirs(static, exist_ok=True)
+    for i in range(pages):
+        links = "".join(f'<li><a href="/page-{j}.html">Page {j}</a></li>' for j in range(pages) if j != i)
+        text = f"Nortal fixture content for page {i}. " * 40
+        html = PAGE_TEMPLATE.format(i=i, prev=(i - 1) % pages, next=(i + 1) % pages,
+                                    tracker_port=tracker_port, text=text, links=links)
+        with open(os.path.join(directory, f"page-{i}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+        with open(os.path.join(static, f"hero-{i}.jpg"), "wb") as f:
+            f.write(os.urandom(image_kb * 1024))
+    with open(os.path.join(static, "banner.png"), "wb") as f:
+        f.write(os.urandom(image_kb * 1024))
+    with open(os.path.join(static, "site.css"), "w", encoding="utf-8") as f:
+        f.write("@font-face { font-family: Fixture; src: url('/static/font.woff2'); }\nbody { font-family: Fixture; }\n")
+    with open(os.path.join(static, "font.woff2"), "wb") as f:
+        f.write(os.urandom(100 * 1024))
+    with open(os.path.join(directory, "index.html"), "w", encoding="utf-8") as f:
+        f.write('<html><body><main><a href="/page-0.html">Start</a></main></body></html>')
+
+
+def serve(directory: str, latency: float):
+    """Static server in a thread; every response is delayed by `latency` seconds (network stand-in)."""
+
+    class Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def crawl(start_url: str, pages: int, lean: bool, blocked: list[str], output_dir: str) -> dict:
+    scraper = NortalScraper(start_url=start_url, max_pages=pages, max_depth=pages, output_dir=output_dir,
+                            scrape_pdfs=False, use_sitemap=False, lean=lean, blocked_url_patterns=blocked)
+    scraper.scrape()
+    seconds = [s["seconds"] for s in scraper.fetch_stats]
+    transferred = [s["bytes"] for s in scraper.fetch_stats]
+    return {
+        "variant": "lean" if lean else "full",
+        "pages": len(scraper.data),
+        "fetch_s": {"mean": round(sum(seconds) / len(seconds), 3), "p50": round(percentile(seconds, 50), 3),
+                    "p95": round(percentile(seconds, 95), 3)},
+        "kb_per_page": round(sum(transferred) / len(transferred) / 1024, 1),
+    }
+
+
+def run_benchmark(pages: int, asset_latency: float, tracker_latency: float) -> dict:
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as tracker_dir, \
+            tempfile.TemporaryDirectory() as output:
+        with open(os.path.join(tracker_dir, "analytics.js"), "w", encoding="utf-8") as f:
+            f.write("window.fixtureTracked = true;\n")
+        tracker = serve(tracker_dir, tracker_latency)
+        build_site(site, pages, tracker.server_address[1])
+        server = serve(site, asset_latency)
+        start_url = f"http://127.0.0.1:{server.server_address[1]}/"
+        blocked = BLOCKED_URL_PATTERNS + [f"*127.0.0.1:{tracker.server_address[1]}*"]
+        try:
+            results = [crawl(start_url, pages, lean, blocked, output) for lean in (False, True)]
+        finally:
+            server.shutdown()
+            tracker.shutdown()
+    return {"pages": pages, "asset_latency_s": asset_latency, "tracker_latency_s": tracker_latency, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lean vs full Selenium rendering on a fixture site.")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--asset-latency", type=float, default=0.05, help="Delay per fixture response in seconds")
+    parser.add_argument("--tracker-latency", type=float, default=0.5, help="Delay of the third-party script")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    report = run_benchmark(args.pages, args.asset_latency, args.tracker_latency)
+    print(f"{'Variant':<8} {'Pages':>6} {'mean s':>8} {'p50 s':>8} {'p95 s':>8} {'KB/page':>9}")
+    for r in report["results"]:
+        print(f"{r['variant']:<8} {r['pages']:>6} {r['fetch_s']['mean']:>8} {r['fetch_s']['p50']:>8} "
+              f"{r['fetch_s']['p95']:>8} {r['kb_per_page']:>9}")
+
+    output = args.output or f"data/benchmarks/scraper_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved → {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Local evaluation runner: loads datasets straight from data/*.json, runs the RAG target and
+the evaluators on a thread pool, and writes results comparable to data/eval_results_digested.json.
+No LangSmith connection is needed; judge verdicts are cached on disk so unchanged answers
+are never re-scored.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+
+from app.metrics import percentile
+
+load_dotenv()
+
+DATASETS = {
+    "factual": "data/factual_questions.json",
+    "abstract": "data/abstract_questions.json",
+}
+JUDGE_CACHE_PATH = "data/judge_cache.json"
+JUDGE_PASS_SCORE = 0.8  # 4/5 or better counts as passed
+
+JUDGE_SYSTEM_PROMPT = """You are an expert evaluator for a RAG system.
+    Compare the Assistant's Answer to the Reference Answer for the given Question.
+    Grade on a scale of 1-5 based on correctness and completeness.
+    """
+JUDGE_HUMAN_PROMPT = "Question: {question}\nReference: {reference}\nAssistant Answer: {prediction}"
+# Derived from the prompt text, so editing the judge prompt invalidates cached verdicts by itself
+JUDGE_PROMPT_VERSION = hashlib.sha256(
+    json.dumps([JUDGE_SYSTEM_PROMPT, JUDGE_HUMAN_PROMPT]).encode("utf-8")
+).hexdigest()[:12]
+JUDGE_MODEL = "gpt-4o"
+
+
+class Grade(BaseModel):
+    score: int = Field(description="Score from 1 to 5, where 5 is perfect.")
+    explanation: str = Field(description="Short explanation of the score.")
+
+
+def score_factual(prediction: str, expected: str, match_type: str = "contains") -> Dict[str, Any]:
+    """Heuristic match of `expected` against the prediction (exact or contains)."""
+    if not prediction:
+        return {"key": "correctness", "score": 0, "comment": "Empty prediction"}
+
+    pred_norm = prediction.strip().lower()
+    exp_norm = expected.strip().lower()
+
+    comment = ""
+    if match_type == "exact":
+        score = 1 if exp_norm == pred_norm else 0
+        if not score:
+            comment = f"Expected exact '{expected}', got '{prediction}'"
+    else:  # contains or default
+        score = 1 if exp_norm in pred_norm else 0
+        if not score:
+            comment = f"Expected '{expected}' in '{prediction}'"
+
+    return {"key": "correctness", "score": score, "comment": comment}
+
+
+class JudgeCache:
+    """Persistent judge verdicts keyed on (question, reference, prediction, judge model, prompt version)."""
+
+    def __init__(self, path: str | None = JUDGE_CACHE_PATH, model: str = JUDGE_MODEL,
+                 prompt_version: str = JUDGE_PROMPT_VERSION):
+        self.path = path
+        self.model = model
+        self.prompt_version = prompt_version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+
+    def key(self, question: str, reference: str, prediction: str) -> str:
+        payload = json.dumps([question, reference, prediction, self.model, self.prompt_version], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, question, reference, prediction):
+        with self._lock:
+            verdict = self._entries.get(self.key(question, reference, prediction))
+            if verdict is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return verdict
+
+    def set(self, question, reference, prediction, verdict: dict):
+        with self._lock:
+            self._entries[self.key(question, reference, prediction)] = verdict
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            # A per-writer tmp file, so concurrent saves never rename each other's file away
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+class Judge:
+    """
+    LLM-as-a-judge that builds its client and prompt once and is safe to share across threads.
+    The chain is created lazily so factual-only runs never need an OpenAI key.
+    """
+
+    def __init__(self, model: str = JUDGE_MODEL, cache: JudgeCache | None = None, chain=None):
+        self.model = model
+        self.cache = cache if cache is not None else JudgeCache(path=None, model=model)
+        self._chain = chain
+        self._lock = threading.Lock()
+
+    @property
+    def chain(self):
+        with self._lock:
+            if self._chain is None:
+                from langchain_openai import ChatOpenAI
+                prompt = ChatPromptTemplate.from_messages([
+                    ("system", JUDGE_SYSTEM_PROMPT),
+                    ("human", JUDGE_HUMAN_PROMPT)
+                ])
+                llm = ChatOpenAI(model=self.model, temperature=0)
+                self._chain = prompt | llm.with_structured_output(Grade)
+            return self._chain
+
+    def grade(self, question: str, reference: str, prediction: str) -> Dict[str, Any]:
+        cached = self.cache.get(question, reference, prediction)
+        if cached is not None:
+            return cached
+        try:
+            grade = self.chain.invoke({
+                "question": question,
+                "reference": reference,
+                "prediction": prediction
+            })
+        except Exception as e:
+            # Errors are not cached so a later run can retry them
+            return {"key": "quality", "score": 0, "comment": f"Judge error: {e}"}
+        verdict = {
+            "key": "quality",
+            "score": grade.score / 5.0,  # Normalize to 0-1
+            "comment": grade.explanation
+        }
+        self.cache.set(question, reference, prediction, verdict)
+        return verdict
+
+
+def load_dataset(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def make_evaluator(dataset: str, judge: Judge | None = None) -> Callable[[dict, str], Dict[str, Any]]:
+    """Return `evaluator(example, prediction)` for the dataset kind."""
+    if dataset == "abstract":
+        judge = judge or Judge()
+        return lambda ex, pred: judge.grade(ex["question"], ex.get("reference_answer", ""), pred)
+    return lambda ex, pred: score_factual(pred, ex.get("expected_answer", ""), ex.get("match_type", "contains"))
+
+
+def evaluate_examples(examples: list[dict], target: Callable[[str], dict], evaluator, max_workers: int = 4) -> list[dict]:
+    """
+    Run target + evaluator for every example on a thread pool; different examples overlap,
+    so generation for one question runs while another is being judged.
+    """
+    def run_one(example):
+        start = time.perf_counter()
+        try:
+            output = target(example["question"])
+            error = None
+        except Exception as e:
+            output, error = {"answer": "", "source_documents": []}, str(e)
+        latency = time.perf_counter() - start
+
+        answer = output.get("answer") or ""
+        evaluation = evaluator(example, answer)
+        score = evaluation.get("score") or 0
+        row = {
+            "question": example["question"],
+            "expected": example.get("expected_answer", example.get("reference_answer", "")),
+            "answer": answer,
+            "passed": score >= (1 if evaluation["key"] == "correctness" else JUDGE_PASS_SCORE),
+            "score": score,
+            "comment": evaluation.get("comment", ""),
+            "latency_s": round(latency, 3),
+            "sources": [d.metadata.get("source", "") for d in output.get("source_documents", [])],
+        }
+        if error:
+            row["error"] = error
+        return row
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(run_one, examples))
+
+
+def summarize(experiment: str, dataset: str, data_source: str, results: list[dict], **extra) -> dict:
+    """Shape results like data/eval_results_digested.json, plus latency and mean score."""
+    passed = sum(1 for r in results if r["passed"])
+    latencies = [r["latency_s"] for r in results]
+    return {
+        "experiment": experiment,
+        "dataset": dataset,
+        "data_source": data_source,
+        "score": f"{passed}/{len(results)}",
+        "accuracy": round(passed / len(results), 4) if results else 0.0,
+        "mean_score": round(sum(r["score"] for r in results) / len(results), 4) if results else 0.0,
+        "latency_s": {"p50": round(percentile(latencies, 50), 3), "p95": round(percentile(latencies, 95), 3)},
+        **extra,
+        "results": results,
+    }
+
+
+def run_local_evaluation(experiment: str, datasets=("factual", "abstract"), max_workers: int = 4,
+                         judge_cache_path: str | None = JUDGE_CACHE_PATH, output_dir: str = "data",
+                         target: Callable[[str], dict] | None = None, judge_model: str = JUDGE_MODEL,
+                         judge_cache: JudgeCache | None = None) -> dict:
+    """
+    Evaluate the RAG chain on local datasets and write data/eval_results_<experiment>_<dataset>.json.
+    Concurrent runs should share one `judge_cache`; it is then left to the caller to save.
+    """
+    if target is None:
+        from app.rag import get_qa_chain, PERSIST_DIRECTORY
+        target, data_source = get_qa_chain(faq=False), PERSIST_DIRECTORY  # no precomputed FAQ answers
+    else:
+        data_source = getattr(target, "data_source", "custom")
+
+    cache = judge_cache if judge_cache is not None else JudgeCache(judge_cache_path, judge_model)
+    judge = Judge(model=judge_model, cache=cache)
+    summaries = {}
+    for dataset in datasets:
+        examples = load_dataset(DATASETS[dataset])
+        print(f"\n>>> Evaluating {dataset} ({len(examples)} examples, {max_workers} workers)")
+        start = time.perf_counter()
+        results = evaluate_examples(examples, target, make_evaluator(dataset, judge), max_workers)
+        summary = summarize(
+            experiment, dataset, data_source, results,
+            wall_seconds=round(time.perf_counter() - start, 3), max_workers=max_workers
+        )
+        summaries[dataset] = summary
+
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f"eval_results_{experiment}_{dataset}.json")
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"{dataset}: {summary['score']} passed (mean score {summary['mean_score']:.2f}) → {output_path}")
+
+    if judge_cache is None:
+        cache.save()
+        print(f"Judge cache: {cache.hits} hits, {cache.misses} misses")
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run RAG evaluation locally (no LangSmith).")
+    parser.add_argument("--name", required=True, help="Experiment name used in the output filenames")
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+    parser.add_argument("--max-workers", type=int, default=4, help="Parallel examples in flight")
+    parser.add_argument("--judge-cache", default=JUDGE_CACHE_PATH, help="Judge verdict cache file")
+    parser.add_argument("--judge-model", default=JUDGE_MODEL)
+    parser.add_argument("--output-dir", default="data")
+    args = parser.parse_args()
+
+    run_local_evaluation(
+        args.name, args.datasets, args.max_workers, args.judge_cache,
+        args.output_dir, judge_model=args.judge_model
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Whole-stack performance regression suite, fully offline against the OpenAI stub.
+
+Scenarios (each against scripts/stub_openai.py with the same seeded latency distribution):
+- ingest: ingest_data over a generated corpus (split + embed + Chroma write)
+- digest: digest_data over the same corpus, one request per chunk and packed
+- chat:   POST /chat on the FastAPI app (uvicorn in a thread) from concurrent clients
+
+Throughput (`*_per_s`, higher is better) and latency percentiles (`*_ms`, lower is better) are
+compared with the baseline in scripts/perf_baseline.json. The run fails (exit code 1) when a
+metric is worse than the baseline by more than --tolerance (and, for latencies, by more than
+MIN_DELTA_MS, so sub-millisecond noise never fails a run).
+
+Usage:
+    python -m scripts.perf_suite                    # run and compare with the baseline
+    python -m scripts.perf_suite --update-baseline  # record a new baseline
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import uvicorn
+
+from app.metrics import percentile
+
+BASELINE_PATH = "scripts/perf_baseline.json"
+TOLERANCE = 0.25
+MIN_DELTA_MS = 5.0
+CHARS_PER_TOKEN = 4
+
+DEFAULT_CONFIG = {
+    "latency": "lognormal:0.02,0.3",
+    "token_latency": 0.002,
+    "seed": 0,
+    "pages": 40,
+    "chat_requests": 60,
+    "chat_workers": 4,
+    "repeats": 3,
+}
+
+WORDS = ("Nortal builds digital government services healthcare finance cloud data platforms for public sector "
+         "clients across Europe the Middle East and North America with engineering teams in Estonia Finland "
+         "Germany Lithuania Serbia Oman and the United States").split()
+SECTIONS = ["services", "industries", "insights", "about", "careers"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def generate_corpus(pages: int, seed: int = 0) -> list[dict]:
+    """Deterministic scraped_data-style pages of 50-400 words, so chunk counts vary like the real site."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(pages):
+        section = SECTIONS[i % len(SECTIONS)]
+        sentences = [" ".join(rng.choices(WORDS, k=rng.randint(8, 16))).capitalize() + "."
+                     for _ in range(rng.randint(4, 30))]
+        corpus.append({"url": f"https://nortal.com/{section}/page-{i}", "title": f"{section.title()} {i}",
+                       "content": " ".join(sentences), "source_type": "html"})
+    return corpus
+
+
+def use_offline_tokenizer_if_needed():
+    """tiktoken downloads its encoding on first use; without network, estimate tokens from characters."""
+    import app.digester as digester
+    try:
+        digester.get_encoding()
+    except Exception as e:
+        logging.warning(f"tiktoken encoding unavailable ({e}); estimating tokens as chars/{CHARS_PER_TOKEN}")
+        digester.count_tokens = lambda text: len(text) // CHARS_PER_TOKEN
+
+
+def latency_summary(seconds: list[float], prefix: str) -> dict:
+    return {f"{prefix}_p{q}_ms": round(percentile(seconds, q) * 1000, 1) for q in (50, 95, 99)}
+
+
+def median_run(fn, repeats: int) -> tuple[int, float]:
+    """(items, median seconds) over `repeats` runs of `fn(run) -> items`; one run is too noisy for short scenarios."""
+    timings = []
+    for run in range(repeats):
+        start = time.perf_counter()
+        items = fn(run)
+        timings.append(time.perf_counter() - start)
+    return items, percentile(timings, 50)
+
+
+def throughput(items: int, seconds: float) -> dict:
+    return {"chunks": items, "seconds": round(seconds, 3), "chunks_per_s": round(items / seconds, 1)}
+
+
+def run_ingest(corpus_path: str, workdir: str, repeats: int) -> tuple[dict, str]:
+    """Ingest into a fresh directory per run; returns the metrics and the last index for the chat scenario."""
+    from app.clients import make_embeddings
+    from app.ingest import ingest_data
+
+    def ingest(run):
+        vectorstore = ingest_data(json_path=corpus_path, persist_directory=os.path.join(workdir, f"chroma_db_{run}"),
+                                  embeddings=make_embeddings(check_embedding_ctx_length=False))
+        return vectorstore._collection.count()
+
+    chunks, seconds = median_run(ingest, repeats)
+    return throughput(chunks, seconds), os.path.join(workdir, f"chroma_db_{repeats - 1}")
+
+
+def run_digest(corpus_path: str, workdir: str, packed: bool, repeats: int) -> dict:
+    from app.digester import digest_data
+
+    output_path = os.path.join(workdir, f"digested_{'packed' if packed else 'single'}.json")
+
+    def digest(run):
+        digest_data(corpus_path, output_path, cache_path=None, packed=packed)
+        with open(output_path, "r", encoding="utf-8") as f:
+            return len(json.load(f))
+
+    return throughput(*median_run(digest, repeats))
+
+
+def run_chat(persist_directory: str, questions: list[str], workers: int) -> dict:
+    import app.api as api
+    from app.clients import make_chat_model, make_embeddings
+    from app.digester import count_tokens
+    from app.rag import get_qa_chain
+    from app.sessions import ConversationMemory, MemorySessionStore, conversational
+
+    qa = get_qa_chain(persist_directory, embeddings=make_embeddings(check_embedding_ctx_length=False), faq=False)
+    memory = ConversationMemory(MemorySessionStore(), llm=make_chat_model("gpt-4o-mini", temperature=0),
+                                count_tokens=count_tokens)
+    original_qa_func, api.qa_func = api.qa_func, conversational(qa, memory)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def ask(question):
+        start = time.perf_counter()
+        response = client.post(f"http://127.0.0.1:{port}/chat", json={"question": question})
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    try:
+        with httpx.Client(timeout=60) as client:
+            ask(questions[0])  # warm-up: connections, Chroma collection load
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                latencies = list(pool.map(ask, questions))
+            seconds = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+        api.qa_func = original_qa_func
+    return {"requests": len(latencies), "requests_per_s": round(len(latencies) / seconds, 1),
+            **latency_summary(latencies, "latency")}
+
+
+def run_suite(config: dict) -> dict:
+    import app.digester as digester
+    from scripts.stub_openai import run_in_thread
+
+    server, base_url = run_in_thread(free_port(), config["latency"], config["token_latency"], config["seed"])
+    original_env = {name: os.environ.get(name) for name in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+    original_count_tokens = digester.count_tokens
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "stub"
+    use_offline_tokenizer_if_needed()
+
+    workdir = tempfile.mkdtemp(prefix="perf_suite_")
+    try:
+        corpus = generate_corpus(config["pages"], config["seed"])
+        corpus_path = os.path.join(workdir, "scraped_data.json")
+        with open(corpus_path, "w", encoding="utf-8") as f:
+            json.dump(corpus, f)
+
+        rng = random.Random(config["seed"])
+        questions = [f"What does Nortal do in {rng.choice(WORDS)} {rng.choice(SECTIONS)}?"
+                     for _ in range(config["chat_requests"])]
+        repeats = config.get("repeats", 1)
+        ingest, persist_directory = run_ingest(corpus_path, workdir, repeats)
+        return {
+            "ingest": ingest,
+            "digest": run_digest(corpus_path, workdir, packed=False, repeats=repeats),
+            "digest_packed": run_digest(corpus_path, workdir, packed=True, repeats=repeats),
+            "chat": run_chat(persist_directory, questions, config["chat_workers"]),
+        }
+    finally:
+        server.should_exit = True
+        shutil.rmtree(workdir, ignore_errors=True)
+        digester.count_tokens = original_count_tokens
+        for name, value in original_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE, min_delta_ms: float = MIN_DELTA_MS) -> list[str]:
+    """Human-readable regressions of `results` against `baseline` scenarios (empty if none)."""
+    regressions = []
+    for scenario, metrics in baseline.items():
+        current = results.get(scenario, {})
+        for key, expected in metrics.items():
+            if key not in current:
+                continue
+            value = current[key]
+            if key.endswith("_per_s") and value < expected * (1 - tolerance):
+                regressions.append(f"{scenario}.{key}: {value} < {expected} (-{(1 - value / expected) * 100:.0f}%)")
+            elif key.endswith("_ms") and value > expected * (1 + tolerance) and value - expected > min_delta_ms:
+                regressions.append(f"{scenario}.{key}: {value} > {expected} (+{(value / expected - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline whole-stack performance regression suite.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed relative regression")
+    parser.add_argument("--output", default=None, help="Also save this run's results as JSON")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    config = baseline["config"] if baseline and not args.update_baseline else DEFAULT_CONFIG
+
+    results = run_suite(config)
+    print(f"{'Scenario':<14} Metrics")
+    for scenario, metrics in results.items():
+        print(f"{scenario:<14} " + "  ".join(f"{k}={v}" for k, v in metrics.items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "scenarios": results}, f, indent=2)
+
+    if args.update_baseline or baseline is None:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "scenarios": results}, f, indent=2)
+        print(f"Baseline written → {args.baseline}")
+        return
+
+    regressions = compare(results, baseline["scenarios"], args.tolerance)
+    if regressions:
+        print(f"\nPerformance regressions vs {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions vs {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
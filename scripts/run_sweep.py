@@ -0,0 +1,247 @@
+"""
+Parameter-sweep experiment runner.
+
+Each chunking configuration is built into its own isolated Chroma index under
+data/experiments/<sweep>/, so experiments never mix in data/chroma_db. Shared stages are reused:
+- chunks are cached per (corpus hash, chunk_size, chunk_overlap),
+- embeddings are cached per chunk text (CachedEmbeddings), so identical chunks across
+  configurations are embedded once,
+- retrieval-only parameters (k) reuse the index of their chunking configuration. Index
+  directories are keyed by corpus hash and embedding model, and only reused once complete.
+Independent indexes are built and evaluated in parallel; with --with-llm they share one judge
+verdict cache, saved once after all variants finish. The output is a markdown comparison
+table of quality vs. latency vs. index size, like legacy_experiments/optimization_results.md.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from dotenv import load_dotenv
+
+from app.embeddings import CachedEmbeddings, LocalHashEmbeddings
+from app.ingest import load_documents, split_documents
+from scripts.benchmark_retrieval import QUESTION_FILES, load_questions, run_queries, vector_search
+
+load_dotenv()
+
+EXPERIMENTS_DIR = "data/experiments"
+CACHE_DIR = os.path.join(EXPERIMENTS_DIR, "cache")
+INDEX_MARKER = "index_complete.json"  # written last, so a half-built index is never reused
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def expand_grid(chunk_sizes, chunk_overlaps, ks) -> list[dict]:
+    """Cartesian product of the grid, dropping configs where overlap >= size."""
+    return [
+        {"chunk_size": s, "chunk_overlap": o, "k": k}
+        for s, o, k in itertools.product(chunk_sizes, chunk_overlaps, ks)
+        if o < s
+    ]
+
+
+def get_chunks(documents, corpus_hash: str, chunk_size: int, chunk_overlap: int) -> list[Document]:
+    """Split documents, reusing the cached split for the same corpus and chunking."""
+    path = os.path.join(CACHE_DIR, "chunks", f"{corpus_hash}_{chunk_size}_{chunk_overlap}.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return [Document(page_content=c["page_content"], metadata=c["metadata"]) for c in json.load(f)]
+
+    chunks = split_documents(documents, chunk_size, chunk_overlap)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([{"page_content": c.page_content, "metadata": c.metadata} for c in chunks], f, ensure_ascii=False)
+    return chunks
+
+
+def dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def index_key(corpus_hash: str, namespace: str) -> str:
+    """Short id of what an index was built from, so a recrawl or another embedding model gets a new index."""
+    return hashlib.sha256(f"{corpus_hash}:{namespace}".encode("utf-8")).hexdigest()[:8]
+
+
+def build_variant_index(sweep_dir, documents, corpus_hash, chunk_size, chunk_overlap, embeddings, namespace) -> dict:
+    """Build (or reuse) the isolated index for one chunking configuration."""
+    index_id = f"cs{chunk_size}_co{chunk_overlap}_{index_key(corpus_hash, namespace)}"
+    index_dir = os.path.join(sweep_dir, index_id)
+    persist_directory = os.path.join(index_dir, "chroma_db")
+    marker = os.path.join(index_dir, INDEX_MARKER)
+    start = time.perf_counter()
+    chunks = get_chunks(documents, corpus_hash, chunk_size, chunk_overlap)
+
+    if not os.path.exists(marker):
+        if os.path.exists(persist_directory):
+            # Leftovers of an interrupted build would be appended to, not replaced
+            Chroma(persist_directory=persist_directory, embedding_function=embeddings).delete_collection()
+        # Vectors come from the embedding cache; only unseen chunk texts hit the model
+        Chroma.from_documents(chunks, embeddings, persist_directory=persist_directory)
+        with open(marker, "w", encoding="utf-8") as f:
+            json.dump({"corpus_hash": corpus_hash, "embeddings": namespace, "num_chunks": len(chunks)}, f)
+
+    return {
+        "index_id": index_id,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "persist_directory": persist_directory,
+        "num_chunks": len(chunks),
+        "index_bytes": dir_size(persist_directory),
+        "build_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def evaluate_index(index: dict, ks, questions, embeddings, with_llm: bool, experiment: str, repeat: int,
+                   judge_cache=None) -> list[dict]:
+    """Evaluate every retrieval variant (k) of one index."""
+    vectorstore = Chroma(persist_directory=index["persist_directory"], embedding_function=embeddings)
+    rows = []
+    for k in ks:
+        stats = run_queries(vector_search(vectorstore), questions, k, repeat)
+        row = {
+            **index, "k": k,
+            "recall_at_k": stats["recall_at_k"], "mrr": stats["mrr"],
+            "retrieval_p50_ms": stats["latency_ms"]["p50"], "retrieval_p95_ms": stats["latency_ms"]["p95"],
+        }
+        if with_llm:
+            from app.rag import get_qa_chain
+            from scripts.local_evaluate import run_local_evaluation
+            qa = get_qa_chain(persist_directory=index["persist_directory"], k=k, embeddings=embeddings)
+            summaries = run_local_evaluation(
+                f"{experiment}-{index['index_id']}_k{k}", target=qa,
+                output_dir=os.path.dirname(index["persist_directory"]), judge_cache=judge_cache
+            )
+            row["factual_score"] = summaries["factual"]["score"]
+            row["abstract_mean"] = summaries["abstract"]["mean_score"]
+            row["answer_p95_s"] = max(s["latency_s"]["p95"] for s in summaries.values())
+        rows.append(row)
+    return rows
+
+
+def render_table(name: str, rows: list[dict], meta: dict) -> str:
+    columns = [
+        ("Chunk / Overlap", lambda r: f"{r['chunk_size']} / {r['chunk_overlap']}"),
+        ("k", lambda r: str(r["k"])),
+        ("Chunks", lambda r: str(r["num_chunks"])),
+        ("Index size", lambda r: f"{r['index_bytes'] / 1e6:.1f} MB"),
+        ("Recall@k", lambda r: f"{r['recall_at_k']:.3f}"),
+        ("MRR", lambda r: f"{r['mrr']:.3f}"),
+        ("Retrieval p95", lambda r: f"{r['retrieval_p95_ms']:.1f} ms"),
+    ]
+    if any("factual_score" in r for r in rows):
+        columns += [
+            ("Factual", lambda r: r.get("factual_score", "-")),
+            ("Abstract (0-1)", lambda r: f"{r['abstract_mean']:.2f}" if "abstract_mean" in r else "-"),
+            ("Answer p95", lambda r: f"{r['answer_p95_s']:.2f} s" if "answer_p95_s" in r else "-"),
+        ]
+
+    ranked = sorted(rows, key=lambda r: (-r["recall_at_k"], -r["mrr"], r["retrieval_p95_ms"]))
+    lines = [
+        f"# Sweep: {name}",
+        "",
+        f"- **Data**: {meta['json_path']} (corpus {meta['corpus_hash']})",
+        f"- **Embeddings**: {meta['embeddings']} (cache: {meta['embedding_cache_hits']} hits / "
+        f"{meta['embedding_cache_misses']} misses)",
+        f"- **Questions**: {meta['num_questions']}",
+        "",
+        "| " + " | ".join(c for c, _ in columns) + " |",
+        "|" + "|".join("---" for _ in columns) + "|",
+    ]
+    lines += ["| " + " | ".join(fmt(r) for _, fmt in columns) + " |" for r in ranked]
+    best = ranked[0]
+    lines += ["", f"**Best retrieval**: chunk {best['chunk_size']} / overlap {best['chunk_overlap']}, k={best['k']}."]
+    return "\n".join(lines) + "\n"
+
+
+def run_sweep(name, grid, json_path="data/scraped_data.json", embeddings_kind="local",
+              with_llm=False, max_workers=4, repeat=1, question_files=QUESTION_FILES):
+    sweep_dir = os.path.join(EXPERIMENTS_DIR, name)
+    os.makedirs(sweep_dir, exist_ok=True)
+
+    if embeddings_kind == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        base = OpenAIEmbeddings()
+        namespace = f"openai-{base.model}"
+    else:
+        base, namespace = LocalHashEmbeddings(), "local-hash-512"
+    embeddings = CachedEmbeddings(base, os.path.join(CACHE_DIR, "embeddings.sqlite"), namespace)
+
+    documents = load_documents(json_path)
+    corpus_hash = file_hash(json_path)
+    questions = load_questions(question_files)
+    judge_cache = None
+    if with_llm:
+        from scripts.local_evaluate import JudgeCache
+        judge_cache = JudgeCache()
+
+    # Group variants by their shared prefix (chunking) so each index is built once
+    groups = {}
+    for variant in grid:
+        groups.setdefault((variant["chunk_size"], variant["chunk_overlap"]), []).append(variant["k"])
+
+    def run_group(item):
+        (chunk_size, chunk_overlap), ks = item
+        index = build_variant_index(sweep_dir, documents, corpus_hash, chunk_size, chunk_overlap, embeddings, namespace)
+        print(f"Index {index['index_id']}: {index['num_chunks']} chunks, {index['index_bytes'] / 1e6:.1f} MB")
+        return evaluate_index(index, sorted(set(ks)), questions, embeddings, with_llm, name, repeat, judge_cache)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            rows = [row for group_rows in pool.map(run_group, groups.items()) for row in group_rows]
+    finally:
+        if judge_cache is not None:
+            judge_cache.save()
+            print(f"Judge cache: {judge_cache.hits} hits, {judge_cache.misses} misses")
+
+    meta = {
+        "json_path": json_path,
+        "corpus_hash": corpus_hash,
+        "embeddings": namespace,
+        "embedding_cache_hits": embeddings.hits,
+        "embedding_cache_misses": embeddings.misses,
+        "num_questions": len(questions),
+    }
+    with open(os.path.join(sweep_dir, "results.json"), "w", encoding="utf-8") as f:
+        json.dump({"name": name, **meta, "results": rows}, f, ensure_ascii=False, indent=2)
+    table_path = os.path.join(sweep_dir, "results.md")
+    with open(table_path, "w", encoding="utf-8") as f:
+        f.write(render_table(name, rows, meta))
+    print(f"Sweep complete → {table_path}")
+    return rows
+
+
+def int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a chunking/retrieval parameter sweep.")
+    parser.add_argument("--name", required=True, help="Sweep name (output under data/experiments/<name>)")
+    parser.add_argument("--chunk-sizes", type=int_list, default=[500, 1000, 2000])
+    parser.add_argument("--chunk-overlaps", type=int_list, default=[50, 200])
+    parser.add_argument("--k", type=int_list, default=[3, 5])
+    parser.add_argument("--json-path", default="data/scraped_data.json")
+    parser.add_argument("--embeddings", choices=["local", "openai"], default="local")
+    parser.add_argument("--with-llm", action="store_true", help="Also run the local end-to-end evaluation per variant")
+    parser.add_argument("--max-workers", type=int, default=4, help="Indexes built/evaluated in parallel")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat retrieval queries for stable latency")
+    args = parser.parse_args()
+
+    grid = expand_grid(args.chunk_sizes, args.chunk_overlaps, args.k)
+    print(f"=== Sweep {args.name}: {len(grid)} variants ===")
+    run_sweep(args.name, grid, args.json_path, args.embeddings, args.with_llm, args.max_workers, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Local stub of the OpenAI endpoints used by the RAG path, for offline benchmarks and tests.
+
+- POST /v1/embeddings: deterministic LocalHashEmbeddings vectors (same text, same vector)
+- POST /v1/chat/completions: a canned answer, plain or streamed (SSE) with usage. Requests with
+  a json_schema `response_format` (LangChain's with_structured_output) get a deterministic
+  instance of that schema; arrays of objects with an `item_id` get one element per
+  "### Item" in the prompt, as packed digest requests expect.
+- GET /stats: requests per endpoint and distinct client connections (host:port), which shows
+  whether callers reuse keep-alive connections
+- POST /reset: clear the stats
+- POST /inject {"latency": s, "count": n}: the next n API requests take s seconds longer
+  (a slow upstream response, for timeout and hedging tests)
+
+Latency is a distribution spec, sampled per request from a seeded RNG:
+    0.02 | fixed:0.02 | uniform:0.01,0.05 | lognormal:0.02,0.5 (median, sigma)
+Streamed answers can also wait `token_latency` seconds between chunks.
+
+Usage:
+    python -m scripts.stub_openai --port 8765 --latency lognormal:0.05,0.4 --token-latency 0.005
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub ...
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.embeddings import LocalHashEmbeddings
+
+ANSWER = "Nortal is a digital transformation company."
+
+
+def parse_latency(spec) -> callable:
+    """A sampler `rng -> seconds` for a latency spec (see module docstring)."""
+    if isinstance(spec, (int, float)):
+        spec = f"fixed:{spec}"
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        kind, params = "fixed", kind
+    values = [float(v) for v in params.split(",")]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) if values[0] > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _resolve(schema: dict, root: dict) -> dict:
+    while "$ref" in schema:
+        schema = root["$defs"][schema["$ref"].rsplit("/", 1)[-1]]
+    return schema
+
+
+def schema_instance(schema: dict, root: dict, seed: str, name: str = "value", index: int = 0, items: int = 3):
+    """Deterministic value matching a JSON schema; strings are derived from `seed` (the prompt)."""
+    schema = _resolve(schema, root)
+    if "anyOf" in schema:
+        return schema_instance(next(s for s in schema["anyOf"] if s.get("type") != "null"), root, seed, name, index, items)
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: schema_instance(sub, root, seed, key, index, items) for key, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        element = _resolve(schema.get("items", {}), root)
+        count = items if "item_id" in element.get("properties", {}) else 3
+        return [schema_instance(element, root, f"{seed}:{name}:{i}", name, i, items) for i in range(count)]
+    if kind == "integer":
+        return index + 1
+    if kind == "number":
+        return float(index)
+    if kind == "boolean":
+        return True
+    digest = hashlib.sha256(f"{seed}:{name}:{index}".encode("utf-8")).hexdigest()[:8]
+    return f"Stub {name.replace('_', ' ')} {index + 1} ({digest})."
+
+
+def create_app(latency=0.0, dimensions: int = 256, token_latency: float = 0.0, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="OpenAI stub")
+    embedder = LocalHashEmbeddings(dimensions)
+    sample_latency = parse_latency(latency)
+    rng = random.Random(seed)
+    stats = {"requests": Counter(), "connections": set()}
+    injected = {"latency": 0.0, "count": 0}
+
+    @app.middleware("http")
+    async def track(request: Request, call_next):
+        if request.url.path.startswith("/v1/"):
+            stats["requests"][request.url.path] += 1
+            if request.client:
+                stats["connections"].add(f"{request.client.host}:{request.client.port}")
+            delay = sample_latency(rng)
+            if injected["count"] > 0:
+                injected["count"] -= 1
+                delay += injected["latency"]
+            if delay:
+                await asyncio.sleep(delay)
+        return await call_next(request)
+
+    @app.get("/stats")
+    async def get_stats():
+        return {"requests": dict(stats["requests"]), "connections": len(stats["connections"])}
+
+    @app.post("/reset")
+    async def reset():
+        stats["requests"].clear()
+        stats["connections"].clear()
+        injected.update(latency=0.0, count=0)
+        return {"ok": True}
+
+    @app.post("/inject")
+    async def inject(request: Request):
+        body = await request.json()
+        injected.update(latency=float(body.get("latency", 0.0)), count=int(body.get("count", 1)))
+        return {"ok": True}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        # Token-id inputs (tiktoken path) are embedded from their string form
+        texts = [t if isinstance(t, str) else " ".join(map(str, t)) for t in inputs]
+        return {
+            "object": "list",
+            "model": body.get("model", "stub"),
+            "data": [{"object": "embedding", "index": i, "embedding": v}
+                     for i, v in enumerate(embedder.embed_documents(texts))],
+            "usage": {"prompt_tokens": sum(len(t.split()) for t in texts), "total_tokens": sum(len(t.split()) for t in texts)},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        created, model = int(time.time()), body.get("model", "stub")
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        prompt_tokens = len(prompt.split())
+
+        answer = ANSWER
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            answer = json.dumps(schema_instance(schema, schema, prompt, items=max(1, prompt.count("### Item"))))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(answer.split()),
+                 "total_tokens": prompt_tokens + len(answer.split())}
+
+        if not body.get("stream"):
+            return {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        def event(choices, **extra):
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created,
+                     "model": model, "choices": choices, **extra}
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        async def stream():
+            for word in answer.split(" "):
+                if token_latency:
+                    await asyncio.sleep(token_latency)
+                yield event([{"index": 0, "delta": {"role": "assistant", "content": word + " "}, "finish_reason": None}])
+            yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if body.get("stream_options", {}).get("include_usage"):
+                yield event([], usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def run_in_thread(port: int = 8765, latency=0.0, token_latency: float = 0.0, seed: int = 0) -> tuple[uvicorn.Server, str]:
+    """Start the stub in a daemon thread. Returns (server, base_url); set server.should_exit to stop."""
+    app = create_app(latency, token_latency=token_latency, seed=seed)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local OpenAI stub server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="0.02", help="Latency per API request: seconds or a distribution spec")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, token_latency=args.token_latency, seed=args.seed),
+                host="127.0.0.1", port=args.port)
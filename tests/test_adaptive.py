@@ -0,0 +1,35 @@
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from app.adaptive import DONT_KNOW_ANSWER, select_adaptive
+from app.embeddings import LocalHashEmbeddings
+from app.metrics import NO_ANSWER
+from app.rag import get_qa_chain
+
+
+def scored(*scores):
+    return [(Document(page_content=f"doc {i}"), s) for i, s in enumerate(scores)]
+
+
+def test_select_adaptive_follows_score_distribution():
+    """One clear winner -> 1 chunk; a flat distribution -> up to max_k; nothing relevant -> none."""
+    assert len(select_adaptive(scored(0.9, 0.5, 0.4), min_relevance=0.3, margin=0.1)) == 1
+    assert len(select_adaptive(scored(0.6, 0.58, 0.55, 0.53, 0.52), max_k=4, min_relevance=0.3, margin=0.1)) == 4
+    assert select_adaptive(scored(0.2, 0.1), min_relevance=0.3) == []
+    assert len(select_adaptive(scored(0.9, 0.5), min_k=2, min_relevance=0.3, margin=0.1)) == 2
+
+
+def test_irrelevant_question_skips_the_llm(tmp_path, monkeypatch):
+    """Adaptive mode answers "don't know" from retrieval alone; the placeholder API key is never used."""
+    monkeypatch.setenv("OPENAI_API_KEY", "unused")
+    embeddings = LocalHashEmbeddings()
+    Chroma.from_documents(
+        [Document(page_content="Nortal builds digital government services.", metadata={"source": "u"})],
+        embeddings, persist_directory=str(tmp_path)
+    )
+    qa = get_qa_chain(persist_directory=str(tmp_path), embeddings=embeddings, adaptive=True)
+
+    before = NO_ANSWER.value()
+    result = qa("zyxqv wombat quasar frobnicate?")
+    assert result == {"answer": DONT_KNOW_ANSWER, "source_documents": []}
+    assert NO_ANSWER.value() == before + 1
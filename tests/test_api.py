@@ -42,3 +42,12 @@ def test_chat_scada_scenario():
     # (The RAG system may phrase the response differently)
     assert isinstance(data["answer"], str)
     assert len(data["answer"]) > 10  # Should have some content
+
+def test_metrics_endpoint():
+    """The metrics endpoint serves Prometheus text even without a RAG pipeline."""
+    client.post("/chat", json={"question": "What is Nortal?"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE rag_stage_duration_seconds histogram" in response.text
+    assert 'api_requests_total{endpoint="/chat"' in response.text
@@ -0,0 +1,44 @@
+from langchain_core.documents import Document
+
+from app.embeddings import LocalHashEmbeddings
+from app.metrics import percentile
+from scripts.benchmark_retrieval import score_ranking, run_queries
+
+
+def test_score_ranking():
+    """Recall counts distinct relevant URLs; reciprocal rank uses the first relevant hit."""
+    scores = score_ranking(["a", "b", "a", "c"], ["b", "c", "d"])
+    assert scores["recall"] == 2 / 3
+    assert scores["hit"] == 1.0
+    assert scores["reciprocal_rank"] == 0.5
+
+    assert score_ranking(["x"], ["y"]) == {"recall": 0.0, "hit": 0.0, "reciprocal_rank": 0.0}
+
+
+def test_local_embeddings_are_deterministic():
+    """Local embeddings are stable across instances and unit-normalized."""
+    a = LocalHashEmbeddings(dimensions=64).embed_query("Nortal acquired Dev9 in 2018")
+    b = LocalHashEmbeddings(dimensions=64).embed_documents(["Nortal acquired Dev9 in 2018"])[0]
+    assert a == b
+    assert abs(sum(v * v for v in a) - 1.0) < 1e-9
+
+
+def test_percentile_interpolates():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([5], 99) == 5
+    assert percentile([], 95) == 0.0
+
+
+def test_run_queries_aggregates_per_dataset():
+    """Quality is averaged per dataset and latency percentiles are reported."""
+    questions = [
+        {"question": "q1", "dataset": "factual", "relevant_urls": ["u1"]},
+        {"question": "q2", "dataset": "abstract", "relevant_urls": ["u2"]},
+    ]
+    docs = {"q1": [Document(page_content="", metadata={"source": "u1"})],
+            "q2": [Document(page_content="", metadata={"source": "u3"})]}
+    stats = run_queries(lambda q, k: docs[q][:k], questions, k=1, repeat=2)
+    assert stats["recall_at_k"] == 0.5
+    assert stats["per_dataset"]["factual"]["mrr"] == 1.0
+    assert stats["per_dataset"]["abstract"]["hit_rate"] == 0.0
+    assert set(stats["latency_ms"]) == {"p50", "p95", "p99", "mean"}
@@ -0,0 +1,75 @@
+import socket
+
+import httpx
+
+from app.clients import get_http_client, make_chat_model, make_embeddings
+from app.embeddings import CachedQueryEmbeddings, LocalHashEmbeddings
+from scripts.stub_openai import run_in_thread
+
+
+class CountingEmbeddings(LocalHashEmbeddings):
+    def __init__(self):
+        super().__init__(dimensions=16)
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return super().embed_query(text)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_query_cache_is_bounded_lru():
+    """Repeated (whitespace-variant) queries hit the cache; the least recently used entry is evicted."""
+    underlying = CountingEmbeddings()
+    cache = CachedQueryEmbeddings(underlying, maxsize=2)
+
+    first = cache.embed_query("What does Nortal do?")
+    assert cache.embed_query("  What does   Nortal do? ") == first
+    cache.embed_query("Where is Nortal?")
+    cache.embed_query("What does Nortal do?")  # refresh, so "Where" is now least recent
+    cache.embed_query("Who is the CEO?")
+    cache.embed_query("Where is Nortal?")
+
+    assert underlying.queries == ["What does Nortal do?", "Where is Nortal?", "Who is the CEO?", "Where is Nortal?"]
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_embedding_and_chat_share_one_connection():
+    """Both clients go through the shared keep-alive pool against the stub server."""
+    server, base_url = run_in_thread(free_port())
+    try:
+        embeddings = make_embeddings(base_url=base_url, api_key="stub", check_embedding_ctx_length=False)
+        llm = make_chat_model(base_url=base_url, api_key="stub")
+        for _ in range(3):
+            assert len(embeddings.embed_query("Nortal services")) == 256
+            assert llm.invoke("What does Nortal do?").content
+
+        stats = httpx.get(base_url.rsplit("/v1", 1)[0] + "/stats").json()
+        assert stats["requests"] == {"/v1/embeddings": 3, "/v1/chat/completions": 3}
+        assert stats["connections"] == 1
+        assert embeddings.http_client is llm.http_client is get_http_client()
+    finally:
+        server.should_exit = True
+
+
+def test_async_pool_survives_separate_event_loops(tmp_path):
+    """Two sharded ingests (one asyncio.run each) in one process both embed over the shared client."""
+    from app.sharded_ingest import ingest_sharded
+
+    pages = [{"url": f"https://nortal.com/page-{i}", "title": f"Page {i}", "source_type": "html",
+              "content": f"Page {i} covers digital government and healthcare services. " * 20} for i in range(4)]
+    server, base_url = run_in_thread(free_port())
+    try:
+        for run in range(2):
+            embeddings = make_embeddings(base_url=base_url, api_key="stub", check_embedding_ctx_length=False)
+            vectorstore = ingest_sharded(pages, embeddings, str(tmp_path / f"chroma_db_{run}"), workers=1,
+                                         chunk_size=500, chunk_overlap=50)
+            assert vectorstore._collection.count() > 0
+            vectorstore.delete_collection()
+    finally:
+        server.should_exit = True
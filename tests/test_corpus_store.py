@@ -0,0 +1,50 @@
+import os
+
+from app.corpus_store import CorpusStore
+
+PAGES = [
+    {"url": f"https://nortal.com/page-{i}", "title": f"Page {i}", "source_type": "html",
+     "content": f"Nortal is a strategic change and technology company. Page {i} describes service {i}. " * 20}
+    for i in range(30)
+]
+
+
+def test_round_trip_and_random_access(tmp_path):
+    """A version loads back identical, and a single page is readable by URL."""
+    store = CorpusStore(str(tmp_path))
+    store.save_version("v1", PAGES)
+
+    store = CorpusStore(str(tmp_path))
+    assert store.load_version("v1") == PAGES
+    version = store.open_version("v1")
+    assert version.get("https://nortal.com/page-7") == PAGES[7]
+    assert version.get("https://nortal.com/missing") is None
+    assert store.disk_usage() < sum(len(p["content"]) for p in PAGES)
+
+
+def test_second_version_stores_only_changed_content(tmp_path):
+    """Unchanged pages are shared between versions; new objects are written only for changes."""
+    store = CorpusStore(str(tmp_path))
+    store.save_version("v1", PAGES)
+    changed = [dict(p) for p in PAGES]
+    changed[3]["content"] = "Updated page content."
+    manifest = store.save_version("v2", changed)
+
+    assert manifest["stats"]["new_objects"] == 1
+    assert store.load_version("v2")[3]["content"] == "Updated page content."
+    assert store.load_version("v1") == PAGES
+
+
+def test_objects_remain_readable_after_retraining(tmp_path):
+    """Objects written under an older dictionary still decode after a new one is trained, and files round trip."""
+    pdf = tmp_path / "report.pdf"
+    pdf.write_bytes(b"%PDF-1.4 binary" * 50)
+    store = CorpusStore(str(tmp_path / "corpus"))
+    store.save_version("v1", PAGES, files={"scraped_pdfs/report.pdf": str(pdf)})
+    store.train_dictionary([p["content"].replace("Nortal", "Acme").encode() for p in PAGES])
+    store.save_version("v2", [{**p, "title": p["title"].upper()} for p in PAGES])
+
+    assert CorpusStore(str(tmp_path / "corpus")).load_version("v1") == PAGES
+    store.open_version("v1").export(str(tmp_path / "out"))
+    assert (tmp_path / "out" / "scraped_pdfs" / "report.pdf").read_bytes() == pdf.read_bytes()
+    assert os.path.exists(tmp_path / "out" / "scraped_data.json")
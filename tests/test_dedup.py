@@ -0,0 +1,64 @@
+from app.dedup import dedup_entries, find_near_duplicates, savings_report, strip_boilerplate
+
+BODY = ("Nortal builds digital government platforms and data exchange layers for public sector "
+        "clients across Europe and the Middle East, focusing on resilience and citizen trust. ")
+NAV = "Public Sector Healthcare Aerospace and Defence Industry Energy and Resources Retail Press pause Press play"
+
+
+def test_near_duplicate_pages_are_grouped():
+    texts = [BODY * 5, BODY * 5 + "Updated on Monday.", "Completely different text about Serbia " * 20]
+    assert find_near_duplicates(texts) == [[0, 1]]
+
+
+def test_boilerplate_kept_once():
+    """Spans repeated on many pages survive only on the first page that contains them."""
+    pages = [f"Page {i} talks about topic number {i} in detail. {NAV}" for i in range(6)]
+    cleaned, removed = strip_boilerplate(pages, min_pages=5)
+    assert NAV in cleaned[0]
+    assert all(NAV not in c and f"topic number {i}" in c for i, c in enumerate(cleaned[1:], start=1))
+    assert removed >= 5 * len(NAV.split())
+
+
+def test_dedup_entries_reports_and_keeps_citations():
+    entries = [
+        {"url": "https://nortal.com/a", "title": "A", "content": BODY * 5, "source_type": "html"},
+        {"url": "https://nortal.com/a?utm=1", "title": "A", "content": BODY * 5 + "x", "source_type": "html"},
+        {"url": "https://nortal.com/b", "title": "B", "content": "Serbia delivery centre 2006 " * 30, "source_type": "html"},
+    ]
+    deduped, stats = dedup_entries(entries)
+    assert stats["near_duplicate_pages"] == 1
+    assert [e["url"] for e in deduped] == ["https://nortal.com/a?utm=1", "https://nortal.com/b"]
+    assert deduped[0]["duplicate_urls"] == ["https://nortal.com/a"]
+
+    report = savings_report(entries, deduped, chunk_size=200, chunk_overlap=0,
+                            count_tokens=lambda text: len(text.split()))
+    assert report["chunks_saved"] > 0
+    assert report["tokens_saved"] > 0
+
+
+def test_boilerplate_is_cut_from_blocks_too():
+    """Structured blocks stay aligned with the cleaned content."""
+    entries = []
+    for i in range(6):
+        blocks = [{"type": "heading", "level": 1, "text": f"Page {i} about subject {i} here"},
+                  {"type": "paragraph", "text": NAV}]
+        entries.append({"url": f"https://nortal.com/{i}", "content": " ".join(b["text"] for b in blocks),
+                        "blocks": blocks})
+    deduped, _ = dedup_entries(entries)
+    assert deduped[0]["blocks"][1]["text"] == NAV
+    assert all(len(e["blocks"]) == 1 for e in deduped[1:])
+    assert all(e["content"] == " ".join(b["text"] for b in e["blocks"]) for e in deduped)
+
+
+def test_short_repeated_blocks_are_removed_from_structured_pages():
+    """Labels shorter than a shingle are cut when they form their own block on many pages."""
+    entries = []
+    for i in range(6):
+        blocks = [{"type": "paragraph", "text": f"Page {i} explains delivery topic for clients in area {i}"},
+                  {"type": "paragraph", "text": "Press pause Press play"}]
+        entries.append({"url": f"https://nortal.com/{i}", "content": " ".join(b["text"] for b in blocks),
+                        "blocks": blocks})
+    deduped, stats = dedup_entries(entries)
+    assert "Press pause Press play" in deduped[0]["content"]
+    assert all("Press pause" not in e["content"] and len(e["blocks"]) == 1 for e in deduped[1:])
+    assert stats["boilerplate_words_removed"] == 5 * 4
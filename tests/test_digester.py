@@ -0,0 +1,119 @@
+import json
+
+from langchain_core.runnables import RunnableLambda
+
+from app.digester import (
+    BATCH_PROMPT_VERSION, PROMPT_VERSION, DigestCache, DigestedBatch, DigestedContent, DigestedItem, digest_data,
+    digest_packed
+)
+
+PAGE = "Nortal builds digital government services. " * 5
+
+
+def fake_digester(calls):
+    def digest(inputs):
+        calls.append(inputs["content"])
+        return DigestedContent(summary=f"About {inputs['title']}.", key_facts=["A fact."], topics=["Gov"])
+    return RunnableLambda(digest)
+
+
+def run(tmp_path, pages, calls, **kwargs):
+    input_path, output_path = tmp_path / "in.json", tmp_path / "out.json"
+    input_path.write_text(json.dumps(pages))
+    digest_data(str(input_path), str(output_path), cache_path=str(tmp_path / "cache.json"),
+                digester=fake_digester(calls), **kwargs)
+    return json.loads(output_path.read_text())
+
+
+def test_recrawl_only_digests_changed_pages(tmp_path, monkeypatch):
+    """A second run with one changed page calls the LLM once."""
+    monkeypatch.setattr("app.digester.count_tokens", lambda text: len(text.split()))
+    pages = [
+        {"url": "https://nortal.com/a", "title": "A", "content": PAGE, "source_type": "html"},
+        {"url": "https://nortal.com/b", "title": "B", "content": PAGE + "Also healthcare.", "source_type": "html"},
+    ]
+    calls = []
+    first = run(tmp_path, pages, calls)
+    assert len(calls) == 2
+
+    pages[1]["content"] += " And finance."
+    second = run(tmp_path, pages, calls)
+    assert len(calls) == 3
+    assert second[0] == first[0]
+    assert second[0]["summary"] == "About A."
+
+
+def test_prompt_or_model_change_misses(tmp_path):
+    """Entries from another prompt version or model are not reused, and prune drops them."""
+    path = str(tmp_path / "cache.json")
+    digest = DigestedContent(summary="S.", key_facts=[], topics=[])
+    old = DigestCache(path, prompt_version="v1")
+    old.set("text", "T", "html", digest)
+    old.save()
+
+    assert DigestCache(path, prompt_version="v1").get("text", "T", "html") == digest
+    assert DigestCache(path, prompt_version="v2").get("text", "T", "html") is None
+    assert DigestCache(path, model="gpt-4o-mini", prompt_version="v1").get("text", "T", "html") is None
+    assert DigestCache(path, prompt_version="v2").prune() == 1
+
+
+def test_packed_mode_batches_small_chunks_and_retries_missing(tmp_path, monkeypatch):
+    """Small chunks share requests; a chunk the batch response skips is retried on its own."""
+    monkeypatch.setattr("app.digester.count_tokens", lambda text: len(text.split()))
+    pages = [{"url": f"https://nortal.com/{i}", "title": f"P{i}", "content": PAGE + f"Page {i}.", "source_type": "html"}
+             for i in range(5)]
+    batches, calls = [], []
+
+    def batch(inputs):
+        items = inputs["items"].split("### Item ")[1:]
+        batches.append(len(items))
+        # Drop the item for page 3 to force an individual retry
+        return DigestedBatch(digests=[
+            DigestedItem(item_id=n, summary=f"Batch {item.split('Title: ')[1].split()[0]}.", key_facts=["F."], topics=["T"])
+            for n, item in enumerate(items, start=1) if "Title: P3" not in item
+        ])
+
+    output = run(tmp_path, pages, calls, packed=True, pack_tokens=170, batch_digester=RunnableLambda(batch))
+
+    assert batches == [3, 2]
+    assert calls == [pages[3]["content"]]
+    assert [e["summary"] for e in output] == ["Batch P0.", "Batch P1.", "Batch P2.", "About P3.", "Batch P4."]
+
+
+def test_packed_toggle_reuses_cache_and_keys_entries_by_producing_prompt(tmp_path, monkeypatch):
+    """Digests are cached under the prompt that made them, and switching --packed hits them all."""
+    monkeypatch.setattr("app.digester.count_tokens", lambda text: len(text.split()))
+    pages = [{"url": f"https://nortal.com/{i}", "title": f"P{i}", "content": PAGE + f"Page {i}.", "source_type": "html"}
+             for i in range(3)]
+
+    def batch(inputs):
+        items = inputs["items"].split("### Item ")[1:]
+        return DigestedBatch(digests=[DigestedItem(item_id=n, summary="Batch.", key_facts=["F."], topics=["T"])
+                                      for n in range(1, len(items) + 1)])
+
+    calls = []
+    # Budget fits two pages per request: P0+P1 are packed, P2 is packed alone and digested singly
+    run(tmp_path, pages, calls, packed=True, pack_tokens=120, batch_digester=RunnableLambda(batch))
+    versions = sorted(e["prompt_version"] for e in json.loads((tmp_path / "cache.json").read_text()).values())
+    assert versions == sorted([BATCH_PROMPT_VERSION, BATCH_PROMPT_VERSION, PROMPT_VERSION])
+
+    run(tmp_path, pages, calls)
+    assert len(calls) == 1
+
+
+def test_rejected_batch_digest_is_dropped_when_its_retry_fails(monkeypatch):
+    """A batch digest rejected by `accept` never survives a failed individual retry."""
+    monkeypatch.setattr("app.digester.count_tokens", lambda text: len(text.split()))
+    items = [{"title": f"P{i}", "content": PAGE, "source_type": "html"} for i in range(2)]
+    batch = RunnableLambda(lambda inputs: DigestedBatch(digests=[
+        DigestedItem(item_id=n, summary="" if n == 2 else "Batch.", key_facts=[], topics=[]) for n in (1, 2)
+    ]))
+
+    def failing(inputs):
+        raise RuntimeError("upstream error")
+
+    results, batched = digest_packed(items, batch, RunnableLambda(failing), budget=1000,
+                                     accept=lambda digest: digest is not None and bool(digest.summary))
+
+    assert results[0].summary == "Batch." and results[1] is None
+    assert batched == [True, False]
@@ -0,0 +1,84 @@
+import time
+
+from langchain_core.documents import Document
+
+from app.embeddings import LocalHashEmbeddings
+from app.faq import FAQService, build_faq_index
+from app.ingest import write_index_version
+
+QUESTIONS = ["How many offices does Nortal have worldwide?", "Who is the founder and CEO of Nortal?"]
+
+
+def answerer(label):
+    calls = []
+
+    def answer(question):
+        calls.append(question)
+        return {"answer": f"{label}: {question}", "source_documents": [Document(page_content="ctx", metadata={"source": "u"})]}
+    answer.calls = calls
+    return answer
+
+
+def test_faq_serves_exact_and_near_matches(tmp_path):
+    """Normalized exact matches and close paraphrases are answered from the index, quickly."""
+    embeddings = LocalHashEmbeddings()
+    write_index_version(str(tmp_path))
+    build_faq_index(QUESTIONS, answerer("v1"), embeddings, str(tmp_path))
+    faq = FAQService(str(tmp_path), embeddings.embed_query, threshold=0.8)
+
+    start = time.perf_counter()
+    result = faq.lookup("how many offices does Nortal have worldwide")
+    assert time.perf_counter() - start < 0.01
+    assert result["answer"] == "v1: How many offices does Nortal have worldwide?"
+    assert result["source_documents"][0].metadata == {"source": "u"}
+
+    assert faq.lookup("How many offices does Nortal have worldwide today?") is not None
+    assert faq.lookup("What is the X-Road data exchange layer?") is None
+
+
+def test_faq_rebuilds_when_index_version_changes(tmp_path, monkeypatch):
+    """A new vector store version stops the stale answers and triggers a background rebuild."""
+    monkeypatch.setattr("app.faq.VERSION_CHECK_SECONDS", 0)
+    embeddings = LocalHashEmbeddings()
+    write_index_version(str(tmp_path))
+    build_faq_index(QUESTIONS, answerer("v1"), embeddings, str(tmp_path))
+
+    rebuild_answer = answerer("v2")
+    faq = FAQService(str(tmp_path), embeddings.embed_query,
+                     rebuild=lambda qs: build_faq_index(qs, rebuild_answer, embeddings, str(tmp_path)))
+    assert faq.lookup(QUESTIONS[1])["answer"].startswith("v1")
+
+    write_index_version(str(tmp_path))
+    assert faq.lookup(QUESTIONS[1]) is None
+    for _ in range(100):
+        if rebuild_answer.calls and not faq._rebuilding:
+            break
+        time.sleep(0.01)
+    assert rebuild_answer.calls == QUESTIONS
+    assert faq.lookup(QUESTIONS[1])["answer"].startswith("v2")
+
+
+def test_failed_rebuild_keeps_stale_index_offline_and_backs_off(tmp_path, monkeypatch):
+    """After a failed rebuild the stale answers stay unserved, and retries wait for the backoff."""
+    monkeypatch.setattr("app.faq.VERSION_CHECK_SECONDS", 0)
+    embeddings = LocalHashEmbeddings()
+    write_index_version(str(tmp_path))
+    build_faq_index(QUESTIONS, answerer("v1"), embeddings, str(tmp_path))
+
+    attempts = []
+
+    def failing_rebuild(questions):
+        attempts.append(questions)
+        raise RuntimeError("LLM unavailable")
+
+    faq = FAQService(str(tmp_path), embeddings.embed_query, rebuild=failing_rebuild)
+    write_index_version(str(tmp_path))
+    assert faq.lookup(QUESTIONS[1]) is None
+    for _ in range(100):
+        if attempts and not faq._rebuilding:
+            break
+        time.sleep(0.01)
+
+    for _ in range(5):
+        assert faq.lookup(QUESTIONS[1]) is None
+    assert len(attempts) == 1
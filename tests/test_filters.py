@@ -0,0 +1,61 @@
+import pytest
+from langchain_chroma import Chroma
+
+from app.embeddings import LocalHashEmbeddings
+from app.filters import build_filter, normalize_prefix, url_paths
+from app.ingest import entries_to_documents
+
+
+def test_url_paths_and_prefix_normalization():
+    """Stored URL prefixes and user-supplied prefixes normalize to the same form."""
+    assert url_paths("https://nortal.com/industries/healthcare/") == ["/", "/industries/", "/industries/healthcare/"]
+    assert url_paths("https://nortal.com") == ["/"]
+    assert normalize_prefix("industries") == normalize_prefix("https://nortal.com/industries") == "/industries/"
+
+
+def test_build_filter():
+    """Filters combine with $and; several topics match any of them."""
+    assert build_filter() is None
+    assert build_filter(source_type="pdf") == {"source_type": "pdf"}
+    assert build_filter(url_prefix="/industries", topics=["AI", "Cloud"]) == {"$and": [
+        {"url_paths": {"$contains": "/industries/"}},
+        {"$or": [{"topics": {"$contains": "ai"}}, {"topics": {"$contains": "cloud"}}]},
+    ]}
+    with pytest.raises(ValueError):
+        build_filter(source_type="docx")
+
+
+def test_prefix_deeper_than_stored_paths_is_rejected():
+    """A 4-segment prefix could never match the stored url_paths, so it is refused (422 on /chat)."""
+    from fastapi.testclient import TestClient
+
+    import app.api as api
+
+    deep = "/industries/healthcare/estonia/hospitals/"
+    assert build_filter(url_prefix="/industries/healthcare/estonia/") is not None
+    with pytest.raises(ValueError):
+        build_filter(url_prefix=deep)
+
+    response = TestClient(api.app).post("/chat", json={"question": "Hi", "filters": {"url_prefix": deep}})
+    assert response.status_code == 422
+
+
+def test_filters_are_pushed_down_into_the_search():
+    """Only the filtered subset is searched, even when better matches exist outside it."""
+    entries = [
+        {"url": "https://nortal.com/industries/healthcare/", "content": "Nortal healthcare platforms", "topics": ["Healthcare"]},
+        {"url": "https://nortal.com/about/", "content": "Nortal healthcare platforms and more"},
+        {"url": "https://nortal.com/report.pdf", "content": "Annual report", "source_type": "pdf"},
+    ]
+    embeddings = LocalHashEmbeddings()
+    vectorstore = Chroma.from_documents(entries_to_documents(entries), embeddings, collection_name="filters")
+    query = embeddings.embed_query("Nortal healthcare platforms and more")
+
+    def sources(**filters):
+        docs = vectorstore.similarity_search_by_vector(query, k=3, filter=build_filter(**filters))
+        return [d.metadata["source"] for d in docs]
+
+    assert sources(url_prefix="/industries/") == ["https://nortal.com/industries/healthcare/"]
+    assert sources(topics=["healthcare"]) == ["https://nortal.com/industries/healthcare/"]
+    assert sources(source_type="pdf") == ["https://nortal.com/report.pdf"]
+    vectorstore.delete_collection()
@@ -0,0 +1,63 @@
+import json
+
+from app.frontier import CrawlFrontier, canonicalize_url
+from app.scraper import CRAWL_STATE_FILE, NortalScraper
+
+SITEMAP_INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://nortal.com/page-sitemap.xml</loc></sitemap>
+</sitemapindex>"""
+PAGE_SITEMAP = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://nortal.com/about/</loc><lastmod>2025-01-01</lastmod></url>
+  <url><loc>https://nortal.com/services/</loc><lastmod>2025-03-01</lastmod></url>
+  <url><loc>https://nortal.com/tag/news/</loc><lastmod>2025-03-01</lastmod></url>
+</urlset>"""
+
+
+def test_canonicalize_url_collapses_variants():
+    """Case, trailing slash, fragment, tracking parameters and parameter order map to one URL."""
+    variants = [
+        "https://nortal.com/Services/?utm_source=x&b=2&a=1",
+        "HTTPS://NORTAL.COM:443/services?a=1&b=2#top",
+        "https://nortal.com//services/?a=1&gclid=abc&b=2",
+    ]
+    assert {canonicalize_url(u) for u in variants} == {"https://nortal.com/services?a=1&b=2"}
+    assert canonicalize_url("https://nortal.com/") == "https://nortal.com/"
+    assert canonicalize_url("https://nortal.com/wp-content/Report.PDF") == "https://nortal.com/wp-content/Report.PDF"
+
+
+def test_frontier_orders_by_priority_and_skips_duplicates():
+    """Higher scores pop first, equal scores in insertion order, and variants are enqueued once."""
+    frontier = CrawlFrontier()
+    assert frontier.push("https://nortal.com/", 0)
+    assert frontier.push("https://nortal.com/tag/news", 1)
+    assert frontier.push("https://nortal.com/blog/post", 1)
+    assert frontier.push("https://nortal.com/services", 1)
+    assert not frontier.push("https://nortal.com/Services/?utm_campaign=x", 1)
+
+    order = [frontier.pop()[0] for _ in range(len(frontier))]
+    assert order == ["https://nortal.com/", "https://nortal.com/services",
+                     "https://nortal.com/blog/post", "https://nortal.com/tag/news"]
+
+
+def test_sitemap_seeding_skips_unchanged_pages(tmp_path):
+    """Pages whose sitemap lastmod matches the previous crawl are carried over, not refetched."""
+    (tmp_path / "scraped_data.json").write_text(json.dumps([
+        {"url": "https://nortal.com/about", "title": "About", "content": "old", "source_type": "html"},
+        {"url": "https://nortal.com/services", "title": "Services", "content": "old", "source_type": "html"},
+    ]))
+    (tmp_path / CRAWL_STATE_FILE).write_text(json.dumps({"lastmod": {
+        "https://nortal.com/about": "2025-01-01", "https://nortal.com/services": "2025-01-01",
+    }}))
+    pages = {"https://nortal.com/robots.txt": "Sitemap: https://nortal.com/sitemap_index.xml",
+             "https://nortal.com/sitemap_index.xml": SITEMAP_INDEX,
+             "https://nortal.com/page-sitemap.xml": PAGE_SITEMAP}
+    scraper = NortalScraper(output_dir=str(tmp_path))
+    scraper.fetch_text = pages.get
+
+    scraper.seed_from_sitemap()
+
+    assert [e["url"] for e in scraper.data] == ["https://nortal.com/about"]
+    queued = [scraper.frontier.pop()[0] for _ in range(len(scraper.frontier))]
+    assert queued == ["https://nortal.com/services", "https://nortal.com/", "https://nortal.com/tag/news"]
@@ -0,0 +1,53 @@
+from app.ingest import split_structured
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_structured_chunks_follow_headings():
+    """Chunks never cross a heading and carry their heading trail."""
+    entry = {
+        "url": "https://nortal.com/about", "title": "About", "source_type": "html",
+        "blocks": [
+            {"type": "heading", "level": 1, "text": "About Nortal"},
+            {"type": "paragraph", "text": "Nortal has 30 offices worldwide."},
+            {"type": "heading", "level": 2, "text": "Leadership"},
+            {"type": "paragraph", "text": "Priit Alamäe is the founder and CEO."},
+            {"type": "paragraph", "text": "He founded the company in Estonia."},
+        ],
+    }
+    chunks = split_structured([entry], chunk_tokens=50, length_function=words)
+
+    assert [c.page_content for c in chunks] == [
+        "About Nortal\nNortal has 30 offices worldwide.",
+        "About Nortal > Leadership\nPriit Alamäe is the founder and CEO.\nHe founded the company in Estonia.",
+    ]
+    assert chunks[1].metadata == {
+        "source": "https://nortal.com/about", "title": "About", "source_type": "html",
+        "url_paths": ["/", "/about/"], "section": "About Nortal > Leadership",
+    }
+
+
+def test_structured_chunks_respect_budget_and_pdf_pages():
+    """Blocks are packed up to the budget and a chunk never spans two PDF pages."""
+    entry = {
+        "url": "https://nortal.com/x.pdf", "title": "X", "source_type": "pdf",
+        "blocks": [
+            {"type": "paragraph", "text": "one two three", "page": 1},
+            {"type": "paragraph", "text": "four five six", "page": 1},
+            {"type": "paragraph", "text": "seven eight nine", "page": 1},
+            {"type": "paragraph", "text": "ten", "page": 2},
+        ],
+    }
+    chunks = split_structured([entry], chunk_tokens=6, length_function=words)
+
+    assert [c.page_content for c in chunks] == ["one two three\nfour five six", "seven eight nine", "ten"]
+    assert [c.metadata["page"] for c in chunks] == [1, 1, 2]
+
+
+def test_entries_without_blocks_fall_back_to_content():
+    entry = {"url": "https://nortal.com", "title": "Home", "content": " ".join(["word"] * 25)}
+    chunks = split_structured([entry], chunk_tokens=10, length_function=words)
+    assert len(chunks) == 3
+    assert all(words(c.page_content) <= 10 for c in chunks)
@@ -0,0 +1,99 @@
+import json
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from scripts.local_evaluate import (
+    Grade, Judge, JudgeCache, evaluate_examples, make_evaluator, score_factual, summarize
+)
+
+
+def test_score_factual_contains_and_exact():
+    assert score_factual("Nortal was founded 25 years ago.", "25 years ago")["score"] == 1
+    assert score_factual("X-Road", "x-road", match_type="exact")["score"] == 1
+    assert score_factual("", "2018")["comment"] == "Empty prediction"
+
+
+def test_judge_reuses_cached_verdicts(tmp_path):
+    """An unchanged (question, reference, prediction) is graded once, even across runs."""
+    calls = []
+    chain = RunnableLambda(lambda inputs: calls.append(inputs) or Grade(score=4, explanation="ok"))
+    cache_path = tmp_path / "judge_cache.json"
+
+    judge = Judge(cache=JudgeCache(str(cache_path)), chain=chain)
+    first = judge.grade("q", "ref", "answer")
+    second = judge.grade("q", "ref", "answer")
+    judge.cache.save()
+
+    assert first == second == {"key": "quality", "score": 0.8, "comment": "ok"}
+    assert len(calls) == 1
+
+    reloaded = Judge(cache=JudgeCache(str(cache_path)), chain=chain)
+    reloaded.grade("q", "ref", "answer")
+    reloaded.grade("q", "ref", "a different answer")
+    assert len(calls) == 2
+    assert reloaded.cache.hits == 1
+
+
+def test_evaluate_examples_runs_in_parallel():
+    """Examples are processed concurrently and shaped like eval_results_digested.json."""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def target(question):
+        barrier.wait()  # deadlocks unless two examples are in flight at once
+        return {"answer": f"The answer is {question}",
+                "source_documents": [Document(page_content="", metadata={"source": "https://nortal.com"})]}
+
+    examples = [
+        {"question": "2018", "expected_answer": "2018", "match_type": "contains"},
+        {"question": "3DOT", "expected_answer": "X-Road", "match_type": "contains"},
+    ]
+    results = evaluate_examples(examples, target, make_evaluator("factual"), max_workers=2)
+    summary = summarize("test", "factual", "stub", results)
+
+    assert summary["score"] == "1/2"
+    assert summary["accuracy"] == 0.5
+    assert results[0]["passed"] and not results[1]["passed"]
+    assert results[0]["sources"] == ["https://nortal.com"]
+    json.dumps(summary)
+
+
+def test_judge_cache_is_keyed_by_judge_model_and_prompt(tmp_path):
+    """Verdicts from another judge model or judge prompt are not reused."""
+    path = str(tmp_path / "judge_cache.json")
+    verdict = {"key": "quality", "score": 0.8, "comment": "ok"}
+    cache = JudgeCache(path, model="gpt-4o")
+    cache.set("q", "ref", "answer", verdict)
+    cache.save()
+
+    assert JudgeCache(path, model="gpt-4o").get("q", "ref", "answer") == verdict
+    assert JudgeCache(path, model="gpt-4o-mini").get("q", "ref", "answer") is None
+    assert JudgeCache(path, model="gpt-4o", prompt_version="other").get("q", "ref", "answer") is None
+
+
+def test_concurrent_judge_cache_saves_do_not_collide(tmp_path):
+    """Writers of the same cache file never rename each other's temporary file away."""
+    path = str(tmp_path / "judge_cache.json")
+    caches = [JudgeCache(path) for _ in range(4)]
+    for i, cache in enumerate(caches):
+        cache.set("q", "ref", f"answer {i}", {"key": "quality", "score": 1.0, "comment": ""})
+
+    errors = []
+
+    def save_many(cache):
+        try:
+            for _ in range(20):
+                cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save_many, args=(c,)) for c in caches]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(json.load(open(path, encoding="utf-8"))) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["judge_cache.json"]
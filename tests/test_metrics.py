@@ -0,0 +1,39 @@
+import pytest
+from app.metrics import Registry, timed, ERRORS, STAGE_SECONDS
+
+
+def test_histogram_prometheus_format():
+    """Histogram buckets are rendered cumulatively with sum and count."""
+    registry = Registry()
+    hist = registry.histogram("test_latency_seconds", "Test latency.", ("stage",), buckets=(0.1, 1.0))
+    hist.observe(0.05, stage="embed")
+    hist.observe(0.5, stage="embed")
+    hist.observe(2.0, stage="embed")
+
+    text = registry.render()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{stage="embed",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="embed",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{stage="embed",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{stage="embed"} 3' in text
+    assert 'test_latency_seconds_sum{stage="embed"} 2.55' in text
+
+
+def test_counter_label_escaping():
+    """Label values are escaped per the Prometheus text format."""
+    registry = Registry()
+    counter = registry.counter("test_total", "Test counter.", ("name",))
+    counter.inc(name='say "hi"')
+    counter.inc(2, name='say "hi"')
+    assert 'test_total{name="say \\"hi\\""} 3' in registry.render()
+
+
+def test_timed_records_errors():
+    """A failing stage is still timed and counted as an error."""
+    before_errors = ERRORS.value(stage="test_stage")
+    before_count = STAGE_SECONDS.count(stage="test_stage")
+    with pytest.raises(RuntimeError):
+        with timed("test_stage"):
+            raise RuntimeError("boom")
+    assert ERRORS.value(stage="test_stage") == before_errors + 1
+    assert STAGE_SECONDS.count(stage="test_stage") == before_count + 1
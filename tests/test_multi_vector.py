@@ -0,0 +1,72 @@
+from app.digester import DigestedContent, format_digest, parse_inline_digest
+from app.embeddings import LocalHashEmbeddings
+from app.multi_vector import build_documents, build_multi_vector_index, load_parents, search_parents
+
+ENTRIES = [
+    {
+        "url": "https://nortal.com/about", "title": "About", "source_type": "html", "chunk_index": 0,
+        "content": "Nortal was founded in 2000 and employs people in many countries.",
+        "summary": "Nortal is a digital transformation company.",
+        "key_facts": ["Nortal was founded in 2000.", "Priit Alamäe is the CEO of Nortal."],
+        "topics": ["Company", "Leadership"],
+    },
+    {
+        "url": "https://nortal.com/health", "title": "Health", "source_type": "html", "chunk_index": 0,
+        "content": "Electronic health records and hospital systems for national health services.",
+        "summary": "Nortal builds healthcare platforms.",
+        "key_facts": ["Nortal delivers electronic health record systems."],
+        "topics": ["Healthcare"],
+    },
+]
+
+
+def test_inline_digest_round_trip():
+    """Legacy inline digests parse back into the raw chunk and structured fields."""
+    digest = DigestedContent(summary="Short.", key_facts=["A fact.", "Another fact."], topics=["AI", "Cloud"])
+    chunk, parsed = parse_inline_digest("Raw chunk text." + format_digest(digest))
+    assert chunk == "Raw chunk text."
+    assert parsed == digest
+    assert parse_inline_digest("No digest here.") == ("No digest here.", None)
+
+
+def test_children_point_to_parents():
+    """Summary, each key fact and the chunk become children; the parent keeps only raw text."""
+    parents, children, ids = build_documents(ENTRIES)
+    assert len(parents) == 2
+    assert [c.metadata["kind"] for c in children[:4]] == ["chunk", "summary", "fact", "fact"]
+    assert len(set(ids)) == len(ids) == 7
+    pid = children[0].metadata["parent_id"]
+    assert parents[pid]["page_content"] == ENTRIES[0]["content"]
+    assert children[0].metadata["topics"] == ["company", "leadership"]
+
+
+def test_fact_hit_resolves_to_unique_parent(tmp_path):
+    """A query matching a key fact returns its raw parent chunk, once."""
+    embeddings = LocalHashEmbeddings()
+    vectorstore = build_multi_vector_index(ENTRIES, embeddings, str(tmp_path))
+    parents = load_parents(str(tmp_path))
+
+    docs = search_parents(vectorstore, parents, embeddings.embed_query("Who is the CEO of Nortal?"), k=2)
+
+    assert docs[0].page_content == ENTRIES[0]["content"]
+    assert len({d.page_content for d in docs}) == len(docs) == 2
+    vectorstore.delete_collection()
+
+
+def test_plain_ingest_replaces_multi_vector_index(tmp_path):
+    """Re-ingesting plain chunks into a multi-vector directory drops the stale parent docstore."""
+    import json
+
+    from app.ingest import ingest_data
+    from app.multi_vector import is_multi_vector
+
+    persist_directory = str(tmp_path / "chroma_db")
+    build_multi_vector_index(ENTRIES, LocalHashEmbeddings(), persist_directory)
+    assert is_multi_vector(persist_directory)
+
+    json_path = tmp_path / "scraped_data.json"
+    json_path.write_text(json.dumps([{k: e[k] for k in ("url", "title", "source_type", "content")} for e in ENTRIES]))
+    vectorstore = ingest_data(str(json_path), persist_directory=persist_directory, embeddings=LocalHashEmbeddings())
+
+    assert not is_multi_vector(persist_directory)
+    vectorstore.delete_collection()
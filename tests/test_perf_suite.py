@@ -0,0 +1,44 @@
+import random
+import socket
+
+from app.clients import make_chat_model
+from app.digester import DigestedBatch, DigestedContent
+from scripts.perf_suite import compare
+from scripts.stub_openai import parse_latency, run_in_thread
+
+
+def test_latency_distributions_are_seeded():
+    """The same spec and seed give the same latency sequence."""
+    for spec in ("0.02", "uniform:0.01,0.05", "lognormal:0.02,0.5"):
+        sample = parse_latency(spec)
+        first = [sample(random.Random(7)) for _ in range(3)]
+        assert first == [sample(random.Random(7)) for _ in range(3)]
+    assert parse_latency(0.5)(random.Random()) == 0.5
+
+
+def test_stub_answers_structured_output_deterministically(monkeypatch):
+    """Digest schemas parse from the stub, and packed batches get one digest per item."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server, base_url = run_in_thread(port)
+    monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    try:
+        llm = make_chat_model("gpt-4o-mini", temperature=0)
+        single = llm.with_structured_output(DigestedContent)
+        assert single.invoke("Digest this page.") == single.invoke("Digest this page.")
+
+        batch = llm.with_structured_output(DigestedBatch).invoke("### Item 1\nA\n\n### Item 2\nB\n\n### Item 3\nC")
+        assert [d.item_id for d in batch.digests] == [1, 2, 3]
+    finally:
+        server.should_exit = True
+
+
+def test_compare_flags_only_real_regressions():
+    """Throughput drops and latency rises beyond the tolerance are reported; small noise is not."""
+    baseline = {"chat": {"requests_per_s": 10.0, "latency_p95_ms": 100.0, "latency_p50_ms": 2.0}}
+    assert compare({"chat": {"requests_per_s": 9.0, "latency_p95_ms": 110.0, "latency_p50_ms": 4.0}}, baseline, 0.2) == []
+
+    regressions = compare({"chat": {"requests_per_s": 7.0, "latency_p95_ms": 130.0, "latency_p50_ms": 2.0}}, baseline, 0.2)
+    assert [r.split(":")[0] for r in regressions] == ["chat.requests_per_s", "chat.latency_p95_ms"]
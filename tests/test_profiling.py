@@ -0,0 +1,75 @@
+import time
+
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+import app.api as api
+from app.metrics import timed
+from app.profiling import span, trace
+from app.resilience import call_with_deadline
+
+client = TestClient(api.app)
+
+
+def busy_answer(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return "Nortal builds digital government services."
+
+
+def fake_qa(question, session_id=None, filters=None):
+    with timed("llm"):
+        answer = busy_answer(0.05)
+    return {"answer": answer, "source_documents": [Document(page_content="Nortal.", metadata={"url": "https://nortal.com"})]}
+
+
+def test_span_tree_follows_stages_across_threads():
+    """Timed stages nest under the request trace, including work run on upstream worker threads."""
+    def embed():
+        with timed("embed"):
+            return [0.0]
+
+    with span("outside") as outside:
+        assert outside is None
+
+    with trace("request") as root:
+        with timed("retrieve"):
+            call_with_deadline(embed, "embed", hedge=False)
+        with timed("llm"):
+            pass
+
+    assert [c.name for c in root.children] == ["retrieve", "llm"]
+    assert [c.name for c in root.children[0].children] == ["embed"]
+    assert root.to_dict()["ms"] >= root.children[0].to_dict()["ms"]
+
+
+def test_slow_responses_carry_span_tree(monkeypatch):
+    """Above the threshold, /chat returns its stage timings; below it (or disabled) it does not."""
+    monkeypatch.setattr(api, "qa_func", fake_qa)
+    assert client.post("/chat", json={"question": "Hi"}).json()["spans"] is None
+
+    monkeypatch.setattr(api, "SLOW_REQUEST_MS", 10.0)
+    spans = client.post("/chat", json={"question": "Hi"}).json()["spans"]
+    assert spans["name"] == "/chat" and spans["ms"] >= 50
+    assert [c["name"] for c in spans["children"]] == ["llm", "serialize"]
+
+
+def test_profile_endpoint_samples_armed_requests(monkeypatch):
+    """Profiling needs the token, covers the next N requests and returns collapsed stacks."""
+    monkeypatch.setattr(api, "qa_func", fake_qa)
+    monkeypatch.delenv("RAG_PROFILE_TOKEN", raising=False)
+    assert client.post("/debug/profile").status_code == 404
+
+    monkeypatch.setenv("RAG_PROFILE_TOKEN", "secret")
+    assert client.post("/debug/profile", headers={"X-Profile-Token": "wrong"}).status_code == 403
+    assert client.post("/debug/profile?requests=2", headers={"X-Profile-Token": "secret"}).json() == {"armed": 2}
+
+    client.post("/chat", json={"question": "Hi"})
+    assert client.get("/debug/profile", headers={"X-Profile-Token": "secret"}).status_code == 409
+    client.post("/chat", json={"question": "Hi"})
+
+    profile = client.get("/debug/profile", headers={"X-Profile-Token": "secret"}).text
+    busy = [line for line in profile.splitlines() if "busy_answer (tests/test_profiling.py" in line]
+    assert busy and all(line.rsplit(" ", 1)[1].isdigit() for line in busy)
+    assert any("fake_qa" in line.split(";busy_answer")[0] for line in busy)
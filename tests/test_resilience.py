@@ -0,0 +1,134 @@
+import socket
+import threading
+import time
+
+import httpx
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from app.clients import make_embeddings
+from app.embeddings import LocalHashEmbeddings
+from app.faq import build_faq_index
+from app.ingest import write_index_version
+from app.metrics import DEGRADED, HEDGED_REQUESTS
+from app.rag import get_qa_chain
+from app.resilience import DEGRADED_ANSWER, LatencyTracker, StageTimeout, call_with_deadline, deadline_scope
+from scripts.stub_openai import run_in_thread
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server, base_url = run_in_thread(port, latency=0.01)
+    monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    admin = base_url.rsplit("/v1", 1)[0]
+    yield base_url, lambda latency, count=1: httpx.post(f"{admin}/inject", json={"latency": latency, "count": count})
+    server.should_exit = True
+
+
+def test_slow_call_is_hedged(stub):
+    """A call slower than the recent p95 gets a duplicate, and the fast duplicate's result is used."""
+    base_url, inject = stub
+    embeddings = make_embeddings(base_url=base_url, api_key="stub", check_embedding_ctx_length=False)
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(5):
+        call_with_deadline(lambda: embeddings.embed_query("Nortal"), "embed", tracker=tracker)
+
+    inject(2.0)
+    before = HEDGED_REQUESTS.value(stage="embed")
+    start = time.perf_counter()
+    vector = call_with_deadline(lambda: embeddings.embed_query("Nortal"), "embed", tracker=tracker)
+
+    assert len(vector) == 256
+    assert time.perf_counter() - start < 1.0
+    assert HEDGED_REQUESTS.value(stage="embed") == before + 1
+
+
+def test_deadline_degrades_to_sources(stub, tmp_path):
+    """An answer that misses the request deadline returns the retrieved sources without an answer."""
+    _, inject = stub
+    embeddings = LocalHashEmbeddings()
+    Chroma.from_documents([Document(page_content="Nortal was founded in 2000.", metadata={"source": "u"})],
+                          embeddings, persist_directory=str(tmp_path))
+    qa = get_qa_chain(persist_directory=str(tmp_path), k=1, embeddings=embeddings, routing=False, faq=False)
+
+    inject(3.0, count=10)
+    before = DEGRADED.value(stage="llm")
+    start = time.perf_counter()
+    with deadline_scope(0.5):
+        result = qa("When was Nortal founded?")
+
+    assert time.perf_counter() - start < 1.5
+    assert result["degraded"] and result["answer"] == DEGRADED_ANSWER
+    assert [d.page_content for d in result["source_documents"]] == ["Nortal was founded in 2000."]
+    assert DEGRADED.value(stage="llm") == before + 1
+
+    with deadline_scope(0.01), pytest.raises(StageTimeout):
+        time.sleep(0.02)
+        call_with_deadline(lambda: "never runs", "embed")
+
+
+def test_faq_lookup_embedding_respects_deadline(stub, tmp_path):
+    """With an FAQ index, the question's first embedding is still bounded by the request deadline."""
+    base_url, inject = stub
+    embeddings = make_embeddings(base_url=base_url, api_key="stub", check_embedding_ctx_length=False)
+    Chroma.from_documents([Document(page_content="Nortal was founded in 2000.", metadata={"source": "u"})],
+                          embeddings, persist_directory=str(tmp_path))
+    write_index_version(str(tmp_path))
+    build_faq_index(["Who founded Nortal?"], lambda q: {"answer": "Priit Alamäe.", "source_documents": []},
+                    embeddings, str(tmp_path))
+    qa = get_qa_chain(persist_directory=str(tmp_path), k=1, embeddings=embeddings, routing=False)
+
+    inject(3.0, count=10)
+    start = time.perf_counter()
+    with deadline_scope(0.5), pytest.raises(StageTimeout):
+        qa("When was Nortal founded?")
+    assert time.perf_counter() - start < 1.5
+
+
+def test_abandoned_call_stops_at_the_stage_budget(stub):
+    """A timed-out call's HTTP request gives up with the stage instead of waiting out client timeouts and retries."""
+    base_url, inject = stub
+    embeddings = make_embeddings(base_url=base_url, api_key="stub", check_embedding_ctx_length=False)
+    embeddings.embed_query("warm-up")
+    admin = base_url.rsplit("/v1", 1)[0]
+    httpx.post(f"{admin}/reset")
+    finished = threading.Event()
+
+    def embed():
+        try:
+            return embeddings.embed_query("Nortal")
+        finally:
+            finished.set()
+
+    inject(5.0, count=10)
+    with deadline_scope(0.3), pytest.raises(StageTimeout):
+        call_with_deadline(embed, "embed", hedge=False)
+
+    assert finished.wait(1.0)
+    assert httpx.get(f"{admin}/stats").json()["requests"] == {"/v1/embeddings": 1}
+
+
+def test_answer_stage_is_not_hedged_by_default():
+    """A slow answer is not duplicated (double token spend); a slow embedding is."""
+    tracker = LatencyTracker(min_samples=5)
+    calls = {"llm": 0, "embed": 0}
+
+    def slow(stage):
+        def call():
+            calls[stage] += 1
+            time.sleep(0.3)
+            return stage
+        return call
+
+    for stage in calls:
+        for _ in range(5):
+            tracker.observe(stage, 0.01)
+        with deadline_scope(2.0):
+            assert call_with_deadline(slow(stage), stage, tracker=tracker) == stage
+
+    assert calls == {"llm": 1, "embed": 2}
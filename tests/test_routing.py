@@ -0,0 +1,65 @@
+import json
+import socket
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from app.digester import DigestedContent
+from app.embeddings import LocalHashEmbeddings
+from app.metrics import ESCALATIONS, ROUTE_DECISIONS, TIER_SECONDS
+from app.rag import get_qa_chain
+from app.routing import FAST, STRONG, create_routed_digester, route_chunk, route_question
+from scripts.stub_openai import run_in_thread
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return [q["question"] for q in json.load(f)]
+
+
+def test_questions_route_by_difficulty():
+    """Factual lookups go to the fast tier; explanation questions mostly to the strong tier."""
+    assert all(route_question(q)[0] == FAST for q in load("data/factual_questions.json"))
+    abstract = [route_question(q)[0] for q in load("data/abstract_questions.json")]
+    assert abstract.count(STRONG) >= len(abstract) / 2
+    assert route_question("When was Nortal founded?", context="x" * 20000) == (STRONG, "long_context")
+
+
+def test_chunks_route_by_size_and_type():
+    assert route_chunk("Nortal builds digital services.") == (FAST, "simple_chunk")
+    assert route_chunk("Annual report", source_type="pdf") == (STRONG, "pdf")
+    assert route_chunk("Revenue 2023: 123 456 789; 2024: 234 567 891") == (STRONG, "number_dense")
+
+
+def test_thin_fast_digest_is_escalated():
+    """A fast digest with too few key facts is redone on the strong tier."""
+    thin = DigestedContent(summary="S.", key_facts=["one"], topics=["t"])
+    full = DigestedContent(summary="S.", key_facts=["one", "two", "three"], topics=["t"])
+    digester = create_routed_digester(RunnableLambda(lambda _: thin), RunnableLambda(lambda _: full))
+
+    before = ESCALATIONS.value(target="digest")
+    assert digester.invoke({"content": "Nortal builds digital services.", "title": "T", "source_type": "html"}) == full
+    assert ESCALATIONS.value(target="digest") == before + 1
+
+
+def test_rag_routes_lookup_to_fast_tier(tmp_path, monkeypatch):
+    """With routing on, a factual question is answered by the fast tier and its latency recorded."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server, base_url = run_in_thread(port)
+    monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    try:
+        embeddings = LocalHashEmbeddings()
+        Chroma.from_documents([Document(page_content="Nortal was founded in 2000.", metadata={"source": "u"})],
+                              embeddings, persist_directory=str(tmp_path))
+        qa = get_qa_chain(persist_directory=str(tmp_path), k=1, embeddings=embeddings, routing=True)
+
+        before = ROUTE_DECISIONS.value(target="answer", tier=FAST, reason="lookup")
+        assert qa("When was Nortal founded?")["answer"]
+        assert ROUTE_DECISIONS.value(target="answer", tier=FAST, reason="lookup") == before + 1
+        assert TIER_SECONDS.count(target="answer", tier=FAST) >= 1
+    finally:
+        server.should_exit = True
@@ -0,0 +1,128 @@
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage
+
+from app.sessions import ConversationMemory, MemorySessionStore, conversational
+
+
+def words(text):
+    return len(text.split())
+
+
+class FakeLLM:
+    """Answers rewrite prompts with a fixed standalone question and summary prompts with 'summary'."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        if "Latest question" in messages[-1].content:
+            return AIMessage(content="What does Nortal do in healthcare?")
+        return AIMessage(content="summary " * 500)
+
+
+def fake_qa(question):
+    return {"answer": f"Answer to: {question} " + "detail " * 40, "source_documents": [Document(page_content="x")]}
+
+
+def test_session_ttl_and_capacity():
+    """Sessions expire after the TTL (sliding on save) and the oldest is evicted past capacity."""
+    now = [0.0]
+    store = MemorySessionStore(ttl_seconds=10, max_sessions=2, clock=lambda: now[0])
+    store.save("a", {"summary": "", "turns": []})
+    now[0] = 5
+    store.save("b", {"summary": "", "turns": []})
+    store.save("c", {"summary": "", "turns": []})
+    assert store.get("a") is None  # over capacity
+    now[0] = 14
+    assert store.get("b") is not None
+    now[0] = 15
+    assert store.get("b") is None and store.get("c") is None
+
+
+def test_follow_up_is_rewritten_first_question_is_not():
+    """Only follow-ups cost a rewrite call; retrieval sees the standalone question."""
+    llm = FakeLLM()
+    chat = conversational(fake_qa, ConversationMemory(MemorySessionStore(), llm, count_tokens=words))
+
+    first = chat("What services does Nortal offer?")
+    assert first["standalone_question"] == "What services does Nortal offer?"
+    assert llm.prompts == []
+
+    follow_up = chat("and in healthcare?", first["session_id"])
+    assert follow_up["session_id"] == first["session_id"]
+    assert follow_up["answer"].startswith("Answer to: What does Nortal do in healthcare?")
+    assert "What services does Nortal offer?" in llm.prompts[0]
+
+
+def test_history_stays_bounded():
+    """Older turns are folded into a capped summary so history tokens stop growing."""
+    store = MemorySessionStore()
+    memory = ConversationMemory(store, FakeLLM(), count_tokens=words, max_history_tokens=200, keep_turns=4)
+    chat = conversational(fake_qa, memory)
+
+    session_id = chat("What services does Nortal offer?")["session_id"]
+    sizes = []
+    for i in range(20):
+        chat(f"Tell me more about topic {i}", session_id)
+        memory.wait()
+        sizes.append(memory.history_tokens(store.get(session_id)))
+
+    session = store.get(session_id)
+    assert len(session["turns"]) <= 4 + 2
+    assert session["summary"]
+    assert max(sizes[5:]) == max(sizes[-5:])
+    assert max(sizes) < 400
+
+
+def test_upstream_errors_fall_back_to_raw_question_and_history():
+    """A failing rewrite/summary model degrades to the question as asked and the uncompacted history."""
+    class FailingLLM:
+        def invoke(self, messages):
+            raise ConnectionError("upstream unavailable")
+
+    store = MemorySessionStore()
+    memory = ConversationMemory(store, FailingLLM(), count_tokens=words, max_history_tokens=10, keep_turns=2)
+    chat = conversational(fake_qa, memory)
+
+    session_id = chat("What services does Nortal offer?")["session_id"]
+    follow_up = chat("and in healthcare?", session_id)
+    memory.wait()
+
+    assert follow_up["standalone_question"] == "and in healthcare?"
+    assert len(store.get(session_id)["turns"]) == 4
+
+
+def test_compaction_runs_off_the_request_path_and_ignores_kept_turns():
+    """Long recent turns alone never trigger a summary; a due summary does not block the turn."""
+    started, release = threading.Event(), threading.Event()
+
+    class SlowLLM(FakeLLM):
+        def invoke(self, messages):
+            started.set()
+            release.wait(5)
+            return super().invoke(messages)
+
+    llm = SlowLLM()
+    store = MemorySessionStore()
+    memory = ConversationMemory(store, llm, count_tokens=words, max_history_tokens=60, keep_turns=4)
+    session = memory.load("s")
+    for i in range(2):  # the kept turns alone are well over the budget
+        memory.append("s", session, f"Question {i}", "detail " * 100)
+        session = store.get("s")
+    memory.wait()
+    assert llm.prompts == []
+
+    memory.append("s", session, "Question 2", "detail " * 100)  # returns while the summary is pending
+    assert len(store.get("s")["turns"]) == 6
+    assert started.wait(5)
+    memory.append("s", store.get("s"), "Question 3", "short")  # arrives while the summary is generated
+
+    release.set()
+    memory.wait()
+    session = store.get("s")
+    assert len(llm.prompts) == 1
+    assert session["summary"] and [t["content"] for t in session["turns"][-2:]] == ["Question 3", "short"]
+    assert len(session["turns"]) == 6
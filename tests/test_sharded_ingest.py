@@ -0,0 +1,32 @@
+from app.embeddings import LocalHashEmbeddings
+from app.ingest import entries_to_documents, split_documents
+from app.sharded_ingest import ingest_sharded, partition
+
+PAGES = [
+    {"url": f"https://nortal.com/page-{i}", "title": f"Page {i}", "source_type": "html",
+     "content": f"Page {i} covers digital government, healthcare and cloud services. " * 30}
+    for i in range(12)
+]
+
+
+def test_partition_keeps_every_entry_in_order():
+    """Shards are contiguous, non-empty and cover the corpus exactly once."""
+    shards = partition(list(range(10)), 4)
+    assert [len(s) for s in shards] == [3, 3, 2, 2]
+    assert [x for s in shards for x in s] == list(range(10))
+    assert partition([1, 2], 4) == [[1], [2]]
+
+
+def test_sharded_ingest_matches_serial_split_and_is_idempotent(tmp_path):
+    """All chunks land in one index under stable ids; a re-run upserts instead of duplicating."""
+    expected = split_documents(entries_to_documents(PAGES), 500, 50)
+    embeddings = LocalHashEmbeddings()
+
+    vectorstore = ingest_sharded(PAGES, embeddings, str(tmp_path), workers=2, chunk_size=500, chunk_overlap=50)
+    first = vectorstore._collection.get()
+    assert len(first["ids"]) == len(expected)
+    assert sorted(first["documents"]) == sorted(c.page_content for c in expected)
+
+    vectorstore = ingest_sharded(PAGES + PAGES[:3], embeddings, str(tmp_path), workers=2, chunk_size=500, chunk_overlap=50)
+    assert sorted(vectorstore._collection.get()["ids"]) == sorted(first["ids"])
+    vectorstore.delete_collection()
@@ -0,0 +1,67 @@
+from langchain_core.documents import Document
+
+import scripts.run_sweep as sweep
+from app.embeddings import CachedEmbeddings, LocalHashEmbeddings
+
+
+class CountingEmbeddings(LocalHashEmbeddings):
+    def __init__(self):
+        super().__init__(dimensions=16)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_expand_grid_skips_invalid_overlap():
+    grid = sweep.expand_grid([500, 1000], [200, 600], [3])
+    assert {(v["chunk_size"], v["chunk_overlap"]) for v in grid} == {(500, 200), (1000, 200), (1000, 600)}
+
+
+def test_cached_embeddings_embed_each_text_once(tmp_path):
+    """Texts shared between experiments hit the model once, even after reopening the cache."""
+    base = CountingEmbeddings()
+    cache_path = str(tmp_path / "embeddings.sqlite")
+
+    first = CachedEmbeddings(base, cache_path, "test").embed_documents(["alpha", "beta"])
+    reopened = CachedEmbeddings(base, cache_path, "test")
+    second = reopened.embed_documents(["beta", "gamma", "alpha"])
+
+    assert base.embedded == ["alpha", "beta", "gamma"]
+    assert second[0] == first[1] and second[2] == first[0]
+    assert (reopened.hits, reopened.misses) == (2, 1)
+
+
+def test_chunk_cache_is_reused(tmp_path, monkeypatch):
+    """The same (corpus, chunking) prefix is split once."""
+    monkeypatch.setattr(sweep, "CACHE_DIR", str(tmp_path))
+    calls = []
+    real_split = sweep.split_documents
+    monkeypatch.setattr(sweep, "split_documents", lambda *a: calls.append(a) or real_split(*a))
+
+    docs = [Document(page_content="word " * 300, metadata={"source": "https://nortal.com"})]
+    first = sweep.get_chunks(docs, "corpus", 500, 50)
+    second = sweep.get_chunks(docs, "corpus", 500, 50)
+
+    assert len(calls) == 1
+    assert [c.page_content for c in first] == [c.page_content for c in second]
+    assert second[0].metadata == {"source": "https://nortal.com"}
+
+
+def test_index_is_rebuilt_for_new_corpus_or_interrupted_build(tmp_path, monkeypatch):
+    """A recrawl gets its own index; a build without the completion marker is redone, not reused."""
+    monkeypatch.setattr(sweep, "CACHE_DIR", str(tmp_path / "cache"))
+    embeddings = LocalHashEmbeddings(dimensions=16)
+    docs = [Document(page_content="word " * 300, metadata={"source": "https://nortal.com"})]
+
+    first = sweep.build_variant_index(str(tmp_path), docs, "corpus-a", 500, 50, embeddings, "local")
+    recrawl = sweep.build_variant_index(str(tmp_path), docs + docs, "corpus-b", 500, 50, embeddings, "local")
+    assert first["persist_directory"] != recrawl["persist_directory"]
+
+    marker = tmp_path / first["index_id"] / sweep.INDEX_MARKER
+    marker.unlink()
+    rebuilt = sweep.build_variant_index(str(tmp_path), docs, "corpus-a", 500, 50, embeddings, "local")
+    assert marker.exists()
+    assert sweep.Chroma(persist_directory=rebuilt["persist_directory"],
+                        embedding_function=embeddings)._collection.count() == first["num_chunks"]